@@ -0,0 +1,95 @@
+import random
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+
+
+def frame(n):
+    """
+    Generates the atoms of a frame of discernment of size `n`.
+
+    Args:
+        - n (int): The number of atoms.
+
+    Returns:
+        list: The atoms 'x0', 'x1', ..., in a fixed order so that generated evidences are reproducible.
+    """
+    return ['x%d' % i for i in range(n)]
+
+
+def focal_count_from_density(n, density, ordered=False):
+    """
+    Converts a density into a number of focal elements.
+
+    Args:
+        - n (int): The size of the frame.
+        - density (float): The fraction of all possible non-empty events that carry mass.
+        - ordered (bool, optional): Whether events are permutations (as in `permutation_set`) rather than
+                                    subsets (as in `powerset`). Defaults to False.
+
+    Returns:
+        int: The number of focal elements, at least 1.
+    """
+    return max(1, int(round(density * _event_count(n, ordered))))
+
+
+def _event_count(n, ordered):
+    if not ordered:
+        return 2 ** n - 1
+    total, cur = 0, 1
+    for k in range(1, n + 1):
+        cur *= n - k + 1
+        total += cur
+    return total
+
+
+def random_evidence(n, focal_count, seed=None, ordered=False, rng=None):
+    """
+    Generates a random basic belief assignment with a fixed number of focal elements.
+
+    Args:
+        - n (int): The size of the frame of discernment.
+        - focal_count (int): The number of focal elements. It is capped by the number of possible events.
+        - seed (int, optional): The seed used when `rng` is not given. Defaults to None.
+        - ordered (bool, optional): Whether the focal elements are ordered tuples (random permutation set)
+                                    instead of sets. Defaults to False.
+        - rng (random.Random, optional): A random generator to draw from, so that several evidences can be
+                                         generated from one seeded stream. Defaults to None.
+
+    Returns:
+        Evidence: A random evidence whose masses follow a flat Dirichlet distribution.
+
+    Example Usage:
+        >>> ev = random_evidence(4, 5, seed=0)
+    """
+    rng = rng or random.Random(seed)
+    atoms = frame(n)
+    focal_count = min(focal_count, _event_count(n, ordered))
+    events = set()
+    while len(events) < focal_count:
+        event = rng.sample(atoms, rng.randint(1, n))
+        events.add(tuple(event) if ordered else frozenset(event))
+    weights = [rng.gammavariate(1.0, 1.0) for _ in events]
+    total = sum(weights)
+    res = Evidence()
+    for event, weight in zip(sorted(events, key=lambda e: (sorted(e), list(e))), weights):
+        res[Element(event if ordered else set(event))] = weight / total
+    return res
+
+
+def random_sources(n, focal_count, sources, seed=None, ordered=False):
+    """
+    Generates several random evidences from a single seeded stream.
+
+    Args:
+        - n (int): The size of the frame of discernment.
+        - focal_count (int): The number of focal elements of each evidence.
+        - sources (int): The number of evidences to generate.
+        - seed (int, optional): The seed of the stream. Defaults to None.
+        - ordered (bool, optional): Whether the focal elements are ordered tuples. Defaults to False.
+
+    Returns:
+        list: A list of `sources` Evidence instances.
+    """
+    rng = random.Random(seed)
+    return [random_evidence(n, focal_count, ordered=ordered, rng=rng) for _ in range(sources)]
@@ -0,0 +1,101 @@
+import argparse
+import ast
+import subprocess
+import sys
+
+# Modules that must import without NumPy and without printing anything.
+PURE_MODULES = [
+    'dstz',
+    'dstz.cli',
+    'dstz.core.atom',
+    'dstz.core.distribution',
+    'dstz.core.cache',
+    'dstz.core.instrument',
+    'dstz.core.lazy',
+    'dstz.core.precision',
+    'dstz.element.combination',
+    'dstz.element.permutation',
+    'dstz.evpiece.decision',
+    'dstz.evpiece.dispatch',
+    'dstz.evpiece.dual',
+    'dstz.evpiece.kernel',
+    'dstz.evpiece.single',
+    'dstz.evpiece.state',
+    'dstz.evpiece.stream',
+    'dstz.math.func',
+    'dstz.math.ordered',
+    'dstz.math.stat.distribution',
+    'dstz.math.stat.moment',
+    'dstz.network.jointree',
+    'dstz.network.valuation',
+]
+
+# Modules that use NumPy, which must still defer importing it until first use.
+LAZY_MODULES = [
+    'dstz.math.matrix.const',
+    'dstz.math.matrix.dual',
+    'dstz.element.encoding',
+    'dstz.element.generator',
+    'dstz.element.frame',
+    'dstz.element.shared',
+    'dstz.core.structured',
+    'dstz.math.matrix.transform',
+    'dstz.math.matrix.lattice',
+    'dstz.math.stat.measures',
+    'dstz.math.stat.montecarlo',
+    'dstz.classify.knn',
+]
+
+HEAVY = ['numpy']
+
+_PROBE = '''
+import sys, time
+start = time.perf_counter()
+for name in %r:
+    __import__(name)
+elapsed = time.perf_counter() - start
+sys.stderr.write(repr(([name for name in %r if name in sys.modules], elapsed)) + '\\n')
+'''
+
+
+def check(modules=None, budget=None):
+    """
+    Imports modules in a fresh interpreter and checks that the import has no side effects.
+
+    Args:
+        - modules (list, optional): The modules to import. Defaults to `PURE_MODULES + LAZY_MODULES`.
+        - budget (float, optional): The maximum allowed import time in seconds. Defaults to None (no limit).
+
+    Returns:
+        list: A list of problems, empty if the import printed nothing, loaded none of the `HEAVY`
+              dependencies and stayed within the budget.
+    """
+    modules = modules or PURE_MODULES + LAZY_MODULES
+    proc = subprocess.run([sys.executable, '-c', _PROBE % (modules, HEAVY)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode:
+        return ['import failed:\n' + proc.stderr]
+    loaded, elapsed = ast.literal_eval(proc.stderr.strip().splitlines()[-1])
+    problems = []
+    if proc.stdout:
+        problems.append('import printed output: %r' % proc.stdout)
+    if loaded:
+        problems.append('import loaded optional dependencies eagerly: %s' % ', '.join(loaded))
+    if budget is not None and elapsed > budget:
+        problems.append('import took %.4f s, budget is %.4f s' % (elapsed, budget))
+    sys.stderr.write('imported %d modules in %.4f s\n' % (len(modules), elapsed))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check that importing dstz is fast and side-effect free.')
+    parser.add_argument('--budget', type=float, help='Maximum import time in seconds.')
+    args = parser.parse_args(argv)
+    problems = check(budget=args.budget)
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
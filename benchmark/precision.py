@@ -0,0 +1,129 @@
+import argparse
+import functools
+import math
+import random
+import sys
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.core.precision import precision, ACCUMULATION
+from dstz.element.generator import random_evidences
+from dstz.evpiece.dual import ds_rule
+from dstz.evpiece.kernel import combine_batch, combine_python
+
+# Largest allowed errors, as (float32 storage against float64, compensated chain against exact sums).
+BOUNDS = {'float32': 1e-5, 'chain': 1e-15}
+
+
+def chain_error(terms=10 ** 4, n=60, engine='numpy', seed=0):
+    """
+    Measures the drift of merging many small masses into the same focal element, per accumulation mode.
+
+    Args:
+        - terms (int, optional): The number of tiny focal elements of the first evidence. Defaults to 10000.
+        - n (int, optional): The frame size, at most `MAX_FRAME_SIZE` for the NumPy kernels. Defaults to 60.
+        - engine (str, optional): 'numpy' combines with `ds_rule`, which encodes the evidences as bitmasks,
+                                  'python' with the dictionary loops of `combine_python`. Defaults to 'numpy'.
+        - seed (int, optional): The seed. Defaults to 0.
+
+    Returns:
+        dict: The absolute error of the merged mass against `math.fsum`, for every mode of `ACCUMULATION`.
+
+    Description:
+        The first evidence holds one large mass and many tiny ones on distinct random sets that all contain
+        atom 0, the second one is categorical on {0}, so that every product lands on {0} and is added to one
+        running sum, which is where naive summation loses the low-order bits.
+    """
+    rng = random.Random(seed)
+    tiny = [rng.random() * 1e-12 for _ in range(terms)]
+    masses = [1.0 - math.fsum(tiny)] + tiny
+    sets = {frozenset({0})}
+    while len(sets) < len(masses):
+        sets.add(frozenset({0} | {atom for atom in range(1, n) if rng.random() < 0.5}))
+    ev1 = Evidence({Element(set(atoms)): mass for atoms, mass in zip(sorted(sets, key=sorted), masses)})
+    ev2 = Evidence({Element({0}): 1.0})
+    exact = math.fsum(masses)
+    res = {}
+    for mode in ACCUMULATION:
+        with precision(accumulation=mode):
+            if engine == 'numpy':
+                combined = ds_rule(ev1, ev2, structure='general')
+            else:
+                combined = combine_python(ev1, ev2, 'and')
+            res[mode] = abs(combined[Element({0})] - exact)
+    return res
+
+
+def storage_error(count=500, n=8, focal=8, sources=6, seed=0):
+    """
+    Measures the error of fusing batches stored in float32 against the float64 reference.
+
+    Args:
+        - count (int, optional): The number of independent fusions. Defaults to 500.
+        - n (int, optional): The frame size. Defaults to 8.
+        - focal (int, optional): The number of focal elements per evidence. Defaults to 8.
+        - sources (int, optional): The number of evidences fused by Dempster's rule in every chain. Defaults to 6.
+        - seed (int, optional): The seed. Defaults to 0.
+
+    Returns:
+        dict: The largest absolute mass error for every accumulation mode under float32 storage.
+    """
+    frame = tuple(range(n))
+    chains = [random_evidences(count, frame, focal, seed=seed + i) for i in range(sources)]
+
+    def fuse():
+        return functools.reduce(lambda acc, evs: combine_batch(acc, evs, 'and', normalize=True), chains[1:],
+                                chains[0])
+
+    with precision(storage='float64', accumulation='exact'):
+        reference = fuse()
+    res = {}
+    for mode in ACCUMULATION:
+        with precision(storage='float32', accumulation=mode):
+            results = fuse()
+        res[mode] = max(abs(ref.get(key, 0.0) - ev.get(key, 0.0))
+                        for ref, ev in zip(reference, results) for key in set(ref) | set(ev))
+    return res
+
+
+def check(bounds=None):
+    """
+    Checks that the precision policies stay within their error bounds.
+
+    Args:
+        - bounds (dict, optional): The bounds, see `BOUNDS`. Defaults to `BOUNDS`.
+
+    Returns:
+        list: A list of problems, empty if float32 storage and compensated accumulation are within bounds.
+    """
+    bounds = dict(BOUNDS, **(bounds or {}))
+    problems = []
+    chains = {engine: chain_error(engine=engine) for engine in ('numpy', 'python')}
+    storage = storage_error()
+    for mode in ACCUMULATION:
+        sys.stderr.write('%-6s chain error %.3e (numpy) %.3e (python)   float32 storage error %.3e\n'
+                         % (mode, chains['numpy'][mode], chains['python'][mode], storage[mode]))
+        if storage[mode] > bounds['float32']:
+            problems.append('float32 storage with %s accumulation is off by %.3e, bound is %.3e'
+                            % (mode, storage[mode], bounds['float32']))
+        for engine, chain in chains.items():
+            if mode != 'naive' and chain[mode] > bounds['chain']:
+                problems.append('%s accumulation drifts by %.3e in the %s kernels, bound is %.3e'
+                                % (mode, chain[mode], engine, bounds['chain']))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the error of float32 storage and compensated sums. Run from '
+                                                 'the repository root as `python -m benchmark.precision`.')
+    parser.add_argument('--float32', type=float, default=BOUNDS['float32'], help='Bound of the float32 error.')
+    parser.add_argument('--chain', type=float, default=BOUNDS['chain'], help='Bound of the compensated chain error.')
+    args = parser.parse_args(argv)
+    problems = check({'float32': args.float32, 'chain': args.chain})
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
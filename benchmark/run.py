@@ -0,0 +1,182 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+from benchmark.suite import get_benchmarks, QUICK, FULL
+from dstz.core.cache import disable_cache
+
+
+def time_case(func, repeat=5, min_time=0.05):
+    """
+    Times a zero-argument callable.
+
+    Args:
+        - func (callable): The operation to time.
+        - repeat (int, optional): The number of timing rounds. Defaults to 5.
+        - min_time (float, optional): The minimum duration of one round in seconds; the number of calls
+                                      per round is chosen so that a round lasts at least this long. Defaults to 0.05.
+
+    Returns:
+        dict: The per-call 'min' and 'median' times in seconds, with the 'number' of calls per round and 'repeat'.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    rounds = [t / number for t in timer.repeat(repeat, number)]
+    return {'min': min(rounds), 'median': statistics.median(rounds), 'number': number, 'repeat': repeat}
+
+
+def case_key(name, params):
+    """
+    Builds the identifier of a benchmark case used to match results against a baseline.
+
+    Args:
+        - name (str): The benchmark name.
+        - params (dict): The parameters of the case.
+
+    Returns:
+        str: A string such as 'ds_rule[focal=4,n=3,sources=2]'.
+    """
+    return '%s[%s]' % (name, ','.join('%s=%s' % item for item in sorted(params.items())))
+
+
+def run(names=None, config=QUICK, seed=0, repeat=5, min_time=0.05, log=sys.stderr):
+    """
+    Runs the benchmark sweep.
+
+    Args:
+        - names (list, optional): The benchmarks to run. Defaults to None (all).
+        - config (dict, optional): The sweep configuration. Defaults to `QUICK`.
+        - seed (int, optional): The seed of the random evidence generator. Defaults to 0.
+        - repeat (int, optional): The number of timing rounds per case. Defaults to 5.
+        - min_time (float, optional): The minimum duration of one round in seconds. Defaults to 0.05.
+        - log (file, optional): Where progress is written. Defaults to stderr.
+
+    Returns:
+        dict: A machine-readable report with 'meta' (environment and configuration) and 'results'.
+    """
+    disable_cache()
+    results = []
+    for bench in get_benchmarks(names):
+        for params in bench.grid(config):
+            timing = time_case(bench.setup(params, seed), repeat, min_time)
+            results.append(dict(timing, bench=bench.name, params=params, key=case_key(bench.name, params)))
+            if log:
+                log.write('%-60s %12.6f s\n' % (results[-1]['key'], timing['median']))
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    meta = {'python': platform.python_version(), 'platform': platform.platform(), 'numpy': numpy_version,
+            'seed': seed, 'config': config, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'meta': meta, 'results': results}
+
+
+def compare(report, baseline, threshold=1.25):
+    """
+    Compares a report against a stored baseline.
+
+    Args:
+        - report (dict): The report returned by `run`.
+        - baseline (dict): A previously stored report.
+        - threshold (float, optional): The median time ratio above which a case counts as a regression.
+                                       Defaults to 1.25.
+
+    Returns:
+        list: One dict per case present in both reports, with the 'key', both medians, their 'ratio' and
+              a 'regression' flag.
+    """
+    old = {res['key']: res for res in baseline['results']}
+    rows = []
+    for res in report['results']:
+        if res['key'] not in old:
+            continue
+        ratio = res['median'] / old[res['key']]['median']
+        rows.append({'key': res['key'], 'baseline': old[res['key']]['median'], 'current': res['median'],
+                     'ratio': ratio, 'regression': ratio > threshold})
+    return rows
+
+
+def plot(report, path, x='n'):
+    """
+    Draws complexity curves, one panel per benchmark, of the median time against a swept parameter.
+
+    Args:
+        - report (dict): The report returned by `run`.
+        - path (str): The image file to write.
+        - x (str, optional): The parameter on the horizontal axis. Other parameters select the curves.
+                             Defaults to 'n'.
+
+    Raises:
+        ImportError: If matplotlib is not installed.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    names = []
+    for res in report['results']:
+        if res['bench'] not in names:
+            names.append(res['bench'])
+    fig, axes = plt.subplots(len(names), 1, figsize=(7, 3.5 * len(names)), squeeze=False)
+    for ax, name in zip(axes[:, 0], names):
+        curves = {}
+        for res in report['results']:
+            if res['bench'] != name or x not in res['params']:
+                continue
+            label = ','.join('%s=%s' % item for item in sorted(res['params'].items()) if item[0] != x)
+            curves.setdefault(label, []).append((res['params'][x], res['median']))
+        for label, points in sorted(curves.items()):
+            points.sort()
+            ax.plot([p[0] for p in points], [p[1] for p in points], marker='o', label=label or name)
+        ax.set_yscale('log')
+        ax.set_xlabel(x)
+        ax.set_ylabel('seconds')
+        ax.set_title(name)
+        ax.legend(fontsize='x-small')
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the rules and measures of dstz.')
+    parser.add_argument('names', nargs='*', help='Benchmarks to run (default: all).')
+    parser.add_argument('--full', action='store_true', help='Run the full sweep instead of the quick one.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random evidence generator.')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing rounds per case.')
+    parser.add_argument('--min-time', type=float, default=0.05, help='Minimum duration of a round in seconds.')
+    parser.add_argument('--output', help='Write the JSON report to this file.')
+    parser.add_argument('--baseline', help='Compare against a stored JSON report.')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Slowdown ratio reported as a regression.')
+    parser.add_argument('--plot', help='Write complexity curves to this image file (requires matplotlib).')
+    args = parser.parse_args(argv)
+
+    report = run(args.names, FULL if args.full else QUICK, args.seed, args.repeat, args.min_time)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.plot:
+        try:
+            plot(report, args.plot)
+        except ImportError:
+            sys.stderr.write('matplotlib is not installed, skipping the plot\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(report, json.load(f), args.threshold)
+        for row in rows:
+            print('%-60s %8.2fx%s' % (row['key'], row['ratio'], '  REGRESSION' if row['regression'] else ''))
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import functools
+import itertools
+
+from benchmark.generator import random_sources, focal_count_from_density
+from dstz.evpiece.dual import ds_rule, rps_left_rule, wang_orthogonal_rule
+from dstz.math.stat.distribution import max_rps_entropy_distribution
+from dstz.math.stat.moment import deng_entropy
+
+
+def _matrix_rule(ev1, ev2):
+    from dstz.math.matrix.dual import conjunctive_rule
+    return conjunctive_rule(ev1, ev2)
+
+
+def _fuse(rule, evs):
+    return functools.reduce(rule, evs)
+
+
+class Benchmark(object):
+    """
+    A benchmarked operation together with the parameter grid it is swept over.
+
+    Attributes:
+        - name (str): The name used in reports and baselines.
+        - setup (callable): Takes the parameters of one case and a seed and returns a zero-argument callable
+                            that runs the operation once.
+        - grid (callable): Takes a sweep configuration and yields the parameter dicts of every case.
+    """
+
+    def __init__(self, name, setup, grid):
+        self.name = name
+        self.setup = setup
+        self.grid = grid
+
+
+def _evidence_grid(config, ordered=False, max_n=None):
+    """
+    Yields the (frame size, focal count, source count) cases of a sweep configuration.
+
+    Args:
+        - config (dict): A sweep configuration with the keys 'frame_sizes', 'focal_counts', 'densities', 'sources'
+                         and 'max_focal'; density cases with more focal elements than 'max_focal' are skipped.
+        - ordered (bool, optional): Whether the benchmarked operation works on ordered events. Defaults to False.
+        - max_n (int, optional): The largest frame size the operation can handle. Defaults to None (no limit).
+
+    Yields:
+        dict: The parameters of one case. Cases given by density record the density they come from.
+    """
+    for n in config['frame_sizes']:
+        if max_n is not None and n > max_n:
+            continue
+        cases = [(focal, None) for focal in config['focal_counts']]
+        for density in config['densities']:
+            focal = focal_count_from_density(n, density, ordered)
+            if focal <= config['max_focal']:
+                cases.append((focal, density))
+        seen = set()
+        for (focal, density), sources in itertools.product(cases, config['sources']):
+            if (focal, sources) in seen:
+                continue
+            seen.add((focal, sources))
+            params = {'n': n, 'focal': focal, 'sources': sources}
+            if density is not None:
+                params['density'] = density
+            yield params
+
+
+def _rule_setup(rule, ordered=False):
+    def setup(params, seed):
+        evs = random_sources(params['n'], params['focal'], params['sources'], seed=seed, ordered=ordered)
+        return lambda: _fuse(rule, evs)
+
+    return setup
+
+
+def _measure_setup(measure):
+    def setup(params, seed):
+        ev = random_sources(params['n'], params['focal'], 1, seed=seed)[0]
+        return lambda: measure(ev)
+
+    return setup
+
+
+def _frame_grid(max_n):
+    def grid(config):
+        for n in config['frame_sizes']:
+            if n <= max_n:
+                yield {'n': n}
+
+    return grid
+
+
+BENCHMARKS = [
+    Benchmark('ds_rule', _rule_setup(ds_rule), _evidence_grid),
+    Benchmark('rps_left_rule', _rule_setup(rps_left_rule, ordered=True),
+              functools.partial(_evidence_grid, ordered=True)),
+    Benchmark('wang_orthogonal_rule', _rule_setup(wang_orthogonal_rule, ordered=True),
+              functools.partial(_evidence_grid, ordered=True)),
+    Benchmark('matrix_rule', _rule_setup(_matrix_rule), functools.partial(_evidence_grid, max_n=10)),
+    Benchmark('deng_entropy', _measure_setup(deng_entropy),
+              lambda config: ({'n': n, 'focal': focal, 'sources': 1}
+                              for n, focal in itertools.product(config['frame_sizes'], config['focal_counts']))),
+    Benchmark('max_rps_entropy_distribution', lambda params, seed: lambda: max_rps_entropy_distribution(params['n']),
+              _frame_grid(5)),
+]
+
+QUICK = {'frame_sizes': [3, 6], 'focal_counts': [4, 16], 'densities': [], 'sources': [2], 'max_focal': 64}
+
+FULL = {'frame_sizes': [3, 5, 8, 10, 12], 'focal_counts': [4, 16, 64], 'densities': [0.1, 0.5],
+        'sources': [2, 4, 8], 'max_focal': 256}
+
+
+def get_benchmarks(names=None):
+    """
+    Returns the registered benchmarks.
+
+    Args:
+        - names (list, optional): The names to select. Defaults to None (all benchmarks).
+
+    Returns:
+        list: The selected Benchmark instances, in registration order.
+
+    Raises:
+        KeyError: If a requested name is not registered.
+    """
+    if not names:
+        return list(BENCHMARKS)
+    registered = {bench.name: bench for bench in BENCHMARKS}
+    return [registered[name] for name in names]
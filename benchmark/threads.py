@@ -0,0 +1,132 @@
+import argparse
+import functools
+import os
+import sys
+import time
+
+import numpy as np
+
+from dstz.element.encoding import encode_batch
+from dstz.element.generator import random_evidences
+from dstz.element.shared import map_rows, map_threads
+from dstz.evpiece.kernel import combine_rows
+from dstz.math.matrix.transform import superset_sum
+from dstz.math.stat.measures import measure_batch, MEASURES
+
+MODES = ('serial', 'threads', 'processes')
+
+
+def _superset_rows(vectors):
+    # `superset_sum` of a slice of rows, the unit of work of a worker process.
+    return superset_sum(vectors)
+
+
+def _measure_rows(codes, masses):
+    # `measure_batch` of a slice of rows, as the tuple of arrays `map_rows` expects.
+    values = measure_batch(codes, masses)
+    return tuple(values[name] for name in MEASURES)
+
+
+def kernels(rows=20000, n=10, focal=8, dense=12, seed=0):
+    """
+    Builds the workloads: a pairwise combination, a dense transform and the uncertainty measures of large batches.
+
+    Args:
+        - rows (int, optional): The number of evidences per batch. Defaults to 20000.
+        - n (int, optional): The frame size of the encoded batches. Defaults to 10.
+        - focal (int, optional): The number of focal elements per evidence. Defaults to 8.
+        - dense (int, optional): The frame size of the dense vectors, of which there are rows // 16.
+                                 Defaults to 12.
+        - seed (int, optional): The seed. Defaults to 0.
+
+    Returns:
+        dict: For every kernel name, a (call, func, inputs, outputs) tuple, where call(threads) runs the public
+              entry point with its `threads` option, and func, inputs and outputs are as taken by `map_rows`.
+    """
+    frame = tuple(range(n))
+    _, codes1, masses1 = encode_batch(random_evidences(rows, frame, focal, seed=seed), frame)
+    _, codes2, masses2 = encode_batch(random_evidences(rows, frame, focal, seed=seed + 1), frame)
+    width = codes1.shape[1] * codes2.shape[1]
+    vectors = np.random.default_rng(seed).random((max(rows // 16, 1), 2 ** dense))
+    combine = functools.partial(combine_rows, normalize=True)
+    combine_outputs = [((width,), 'uint64'), ((width,), 'float64'), ((), 'float64')]
+    return {
+        'combine_rows': (lambda threads: map_threads(combine, [codes1, masses1, codes2, masses2], combine_outputs,
+                                                     threads),
+                         combine, [codes1, masses1, codes2, masses2], combine_outputs),
+        'superset_sum': (lambda threads: superset_sum(vectors, threads=threads), _superset_rows, [vectors],
+                         [((2 ** dense,), 'float64')]),
+        'measure_batch': (lambda threads: measure_batch(codes1, masses1, threads=threads), _measure_rows,
+                          [codes1, masses1], [((), 'float64')] * len(MEASURES)),
+    }
+
+
+def time_mode(mode, call, func, inputs, outputs, workers, repeat=3):
+    """
+    Times a kernel in one mode.
+
+    Args:
+        - mode (str): One of `MODES`.
+        - call (callable): Runs the public entry point with a number of threads.
+        - func (callable): The row-wise kernel, for the process pool.
+        - inputs (list): Its input arrays.
+        - outputs (list): Its outputs, as (row shape, dtype) pairs.
+        - workers (int): The number of threads or processes.
+        - repeat (int, optional): The number of runs, of which the fastest counts. Defaults to 3.
+
+    Returns:
+        float: The best time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if mode == 'serial':
+            call(1)
+        elif mode == 'threads':
+            call(workers)
+        else:
+            map_rows(func, inputs, outputs, workers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(workers=None, rows=20000, repeat=3, log=sys.stdout):
+    """
+    Compares serial, thread-parallel and process-parallel runs of the batch kernels.
+
+    Args:
+        - workers (int, optional): The number of threads and of processes. Defaults to `os.cpu_count()`.
+        - rows (int, optional): The number of evidences per batch. Defaults to 20000.
+        - repeat (int, optional): The number of runs per measurement. Defaults to 3.
+        - log (file, optional): Where the table is written. Defaults to stdout.
+
+    Returns:
+        dict: For every kernel, the best time of every mode in seconds.
+    """
+    workers = workers or os.cpu_count() or 1
+    res = {}
+    if log:
+        log.write('%d workers\n%-14s %10s %10s %10s %9s %9s\n'
+                  % (workers, 'kernel', 'serial', 'threads', 'processes', 'x threads', 'x procs'))
+    for name, (call, func, inputs, outputs) in kernels(rows).items():
+        res[name] = {mode: time_mode(mode, call, func, inputs, outputs, workers, repeat) for mode in MODES}
+        if log:
+            times = res[name]
+            log.write('%-14s %9.3fs %9.3fs %9.3fs %9.2f %9.2f\n'
+                      % (name, times['serial'], times['threads'], times['processes'],
+                         times['serial'] / times['threads'], times['serial'] / times['processes']))
+    return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare serial, thread and process runs of the batch kernels.')
+    parser.add_argument('--workers', type=int, help='Threads and processes. Defaults to all cores.')
+    parser.add_argument('--rows', type=int, default=20000, help='Evidences per batch.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement.')
+    args = parser.parse_args(argv)
+    run(args.workers, args.rows, args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import importlib
+
+# Public names and the modules defining them. They are imported on first access through the
+# module-level __getattr__, so that `import dstz` stays cheap and free of side effects.
+_EXPORTS = {
+    'Item': 'dstz.core.atom',
+    'Element': 'dstz.core.atom',
+    'Evidence': 'dstz.core.distribution',
+    'ObservableEvidence': 'dstz.core.distribution',
+    'BayesianEvidence': 'dstz.core.structured',
+    'ConsonantEvidence': 'dstz.core.structured',
+    'EvidentialKNN': 'dstz.classify.knn',
+    'enable_cache': 'dstz.core.cache',
+    'disable_cache': 'dstz.core.cache',
+    'instrument': 'dstz.core.instrument',
+    'precision': 'dstz.core.precision',
+    'set_precision': 'dstz.core.precision',
+    'get_precision': 'dstz.core.precision',
+    'simple_space': 'dstz.element.combination',
+    'powerset': 'dstz.element.combination',
+    'permutation_set': 'dstz.element.permutation',
+    'Refinement': 'dstz.element.frame',
+    'vacuous_extension': 'dstz.element.frame',
+    'align': 'dstz.element.frame',
+    'combine': 'dstz.evpiece.dispatch',
+    'ds_rule': 'dstz.evpiece.dual',
+    'disjunctive_rule': 'dstz.evpiece.dual',
+    'conjunctive_rule': 'dstz.evpiece.dual',
+    'contour_rule': 'dstz.evpiece.dual',
+    'rps_left_rule': 'dstz.evpiece.dual',
+    'wang_orthogonal_rule': 'dstz.evpiece.dual',
+    'pignistic_probability_transformation': 'dstz.evpiece.single',
+    'get_fod': 'dstz.evpiece.single',
+    'shafer_discounting': 'dstz.evpiece.single',
+    'contour_transformation': 'dstz.evpiece.single',
+    'FusionState': 'dstz.evpiece.state',
+    'pl': 'dstz.math.func',
+    'q': 'dstz.math.func',
+    'bel': 'dstz.math.func',
+    'OrderedIndex': 'dstz.math.ordered',
+    'max_deng_entropy_distribution': 'dstz.math.stat.distribution',
+    'max_rps_entropy_distribution': 'dstz.math.stat.distribution',
+    'Valuation': 'dstz.network.valuation',
+    'JoinTree': 'dstz.network.jointree',
+    'deng_entropy': 'dstz.math.stat.moment',
+    'information_var': 'dstz.math.stat.moment',
+}
+
+_SUBPACKAGES = ('classify', 'core', 'element', 'evpiece', 'math', 'network')
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    elif name in _SUBPACKAGES:
+        value = importlib.import_module('%s.%s' % (__name__, name))
+    else:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBPACKAGES))
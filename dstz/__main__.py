@@ -0,0 +1,5 @@
+import sys
+
+from dstz.cli import main
+
+sys.exit(main())
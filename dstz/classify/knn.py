@@ -0,0 +1,205 @@
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+def _squared_distances(queries, points):
+    # The (queries, points) squared Euclidean distances, clipped at 0 against rounding.
+    res = (queries ** 2).sum(axis=1)[:, None] + (points ** 2).sum(axis=1)[None, :] - 2 * queries @ points.T
+    return np.maximum(res, 0.0)
+
+
+class EvidentialKNN(object):
+    """
+    Denoeux's evidential k-nearest neighbours classifier.
+
+    Attributes:
+        - k (int): The number of neighbours.
+        - alpha (float): The largest support a neighbour can give to its class.
+        - gamma (float, sequence or None): The distance scale given to the constructor.
+        - gamma_ (numpy.ndarray): The distance scale of every class, set by `fit`.
+        - classes (list): The class labels, sorted, set by `fit`.
+        - chunk_size (int): The number of queries whose distances are computed at once.
+
+    Methods:
+        - fit(X, y): Stores the training set and the default distance scales.
+        - kneighbors(X): Returns the squared distances and indices of the nearest training points.
+        - predict_masses(X): Returns the combined masses of every class and of the whole frame.
+        - predict_evidence(X, curItem=Element): Returns the combined evidence of every query.
+        - predict_proba(X): Returns the pignistic probability of every class.
+        - predict(X): Returns the most probable class of every query.
+
+    Description:
+        Every neighbour i of class q at squared distance d gives the simple support function
+        m_i({q}) = alpha·exp(-gamma_q·d), m_i(Θ) = 1 - m_i({q}). Combining them with Dempster's rule
+        has a closed form: with P_q the product of 1 - m_i({q}) over the neighbours of class q, the
+        unnormalized masses are m({q}) = (1 - P_q)·Π_{r≠q} P_r and m(Θ) = Π_r P_r, and all the other
+        sets get nothing. The products are sums of logarithms scattered by class, so a batch of queries
+        is classified with a few array operations instead of k - 1 calls to `ds_rule` per query.
+
+    Example Usage:
+        >>> model = EvidentialKNN(k=10).fit(X_train, y_train)
+        >>> model.predict_evidence(X_test[:1])
+        [{{'setosa'}: 0.93, {'setosa', 'versicolor', 'virginica'}: 0.07}]
+    """
+
+    def __init__(self, k=5, alpha=0.95, gamma=None, chunk_size=1024):
+        """
+        Initializes the classifier.
+
+        Args:
+            - k (int, optional): The number of neighbours. Defaults to 5.
+            - alpha (float, optional): The largest support of a neighbour, in (0, 1). Defaults to 0.95.
+            - gamma (float or sequence, optional): The distance scale, for all classes or per class in the
+                                                   order of `classes`. Defaults to the inverse mean squared
+                                                   distance between training points of every class.
+            - chunk_size (int, optional): The number of queries processed at once. Defaults to 1024.
+
+        Raises:
+            ValueError: If alpha is not in (0, 1).
+        """
+        if not 0 < alpha < 1:
+            raise ValueError('alpha must be in (0, 1), got %r' % (alpha,))
+        self.k = k
+        self.alpha = alpha
+        self.gamma = gamma
+        self.chunk_size = chunk_size
+        self.gamma_ = None
+        self.classes = None
+        self._points = None
+        self._labels = None
+
+    def fit(self, X, y):
+        """
+        Stores the training set.
+
+        Args:
+            - X (array): The (n, features) training points.
+            - y (sequence): The class of every training point.
+
+        Returns:
+            EvidentialKNN: The classifier itself.
+
+        Raises:
+            ValueError: If X and y do not have the same length or there are fewer than k points.
+        """
+        points = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        classes, labels = np.unique(np.asarray(y), return_inverse=True)
+        if len(points) != len(labels):
+            raise ValueError('X has %d points but y has %d labels' % (len(points), len(labels)))
+        if len(points) < self.k:
+            raise ValueError('At least k = %d training points are needed, got %d' % (self.k, len(points)))
+        self.classes = classes.tolist()
+        self._points = points
+        self._labels = labels.ravel()
+        if self.gamma is None:
+            gamma = np.ones(len(classes))
+            for q in range(len(classes)):
+                members = points[self._labels == q]
+                if len(members) > 1:
+                    mean = _squared_distances(members, members).sum() / (len(members) * (len(members) - 1))
+                    gamma[q] = 1 / mean if mean > 0 else 1.0
+            self.gamma_ = gamma
+        else:
+            self.gamma_ = np.broadcast_to(np.asarray(self.gamma, dtype=np.float64), (len(classes),)).copy()
+        return self
+
+    def kneighbors(self, X):
+        """
+        Finds the nearest training points of every query.
+
+        Args:
+            - X (array): The (m, features) queries.
+
+        Returns:
+            tuple: (distances, indices), two (m, k) arrays holding the squared distances and the indices of
+                   the k nearest training points, nearest first.
+        """
+        queries = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        distances = np.empty((len(queries), self.k))
+        indices = np.empty((len(queries), self.k), dtype=np.intp)
+        for start in range(0, len(queries), self.chunk_size):
+            block = _squared_distances(queries[start:start + self.chunk_size], self._points)
+            nearest = np.argpartition(block, self.k - 1, axis=1)[:, :self.k]
+            near = np.take_along_axis(block, nearest, axis=1)
+            order = np.argsort(near, axis=1, kind='stable')
+            distances[start:start + len(block)] = np.take_along_axis(near, order, axis=1)
+            indices[start:start + len(block)] = np.take_along_axis(nearest, order, axis=1)
+        return distances, indices
+
+    @timed()
+    def predict_masses(self, X):
+        """
+        Combines the simple support functions of the neighbours of every query with Dempster's rule.
+
+        Args:
+            - X (array): The (m, features) queries.
+
+        Returns:
+            tuple: (singletons, ignorance), an (m, classes) array holding the mass of every singleton class
+                   and an (m,) array holding the mass of the whole frame.
+        """
+        distances, indices = self.kneighbors(X)
+        labels = self._labels[indices]
+        support = self.alpha * np.exp(-self.gamma_[labels] * distances)
+        # log P_q per query and class, as a sum of log(1 - support) over the neighbours of the class.
+        log_rest = np.zeros((len(labels), len(self.classes)))
+        np.add.at(log_rest, (np.arange(len(labels))[:, None], labels), np.log1p(-support))
+        log_all = log_rest.sum(axis=1)
+        ignorance = np.exp(log_all)
+        singletons = -np.expm1(log_rest) * np.exp(log_all[:, None] - log_rest)
+        total = singletons.sum(axis=1) + ignorance
+        if enabled():
+            count('classify.knn.queries', len(labels))
+        return singletons / total[:, None], ignorance / total
+
+    def predict_evidence(self, X, curItem=Element):
+        """
+        Returns the combined evidence of every query.
+
+        Args:
+            - X (array): The (m, features) queries.
+            - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                          Defaults to the Element class.
+
+        Returns:
+            list: One Evidence per query over the frame of classes, holding the singleton classes with
+                  a positive mass and the whole frame.
+        """
+        singletons, ignorance = self.predict_masses(X)
+        frame = curItem(set(self.classes))
+        res = []
+        for row, rest in zip(singletons.tolist(), ignorance.tolist()):
+            ev = Evidence({curItem({label}): mass for label, mass in zip(self.classes, row) if mass > 0})
+            # With a single class the frame is that class's singleton.
+            ev[frame] = ev.get(frame, 0.0) + rest
+            res.append(ev)
+        return res
+
+    def predict_proba(self, X):
+        """
+        Returns the pignistic probability of every class.
+
+        Args:
+            - X (array): The (m, features) queries.
+
+        Returns:
+            numpy.ndarray: The (m, classes) probabilities, columns in the order of `classes`.
+        """
+        singletons, ignorance = self.predict_masses(X)
+        return singletons + ignorance[:, None] / len(self.classes)
+
+    def predict(self, X):
+        """
+        Returns the most probable class of every query.
+
+        Args:
+            - X (array): The (m, features) queries.
+
+        Returns:
+            list: The class labels. The pignistic and plausibility decisions agree for this model.
+        """
+        return [self.classes[i] for i in self.predict_proba(X).argmax(axis=1)]
@@ -0,0 +1,290 @@
+import argparse
+import functools
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Rules that fold the sources of a record, as attributes of `dstz.evpiece.dual`. Only rules on set-valued
+# evidences are offered, since `load_evidence` builds sets.
+RULES = ('ds_rule', 'conjunctive_rule', 'disjunctive_rule', 'contour_rule')
+
+# Transformations applied to the fused evidence of a record, see `transform`.
+TRANSFORMATIONS = ('pignistic_probability_transformation', 'contour_transformation')
+
+# Lines sent to a worker at a time.
+CHUNK_SIZE = 1000
+
+
+def load_evidence(pairs):
+    """
+    Builds an evidence from its JSON form.
+
+    Args:
+        - pairs (list): [atoms, mass] pairs, where atoms is a list of JSON values. Nested lists are read as
+                        tuples so that they can be atoms.
+
+    Returns:
+        Evidence: The evidence, with one Element per focal set.
+    """
+    from dstz.core.atom import Element
+    from dstz.core.distribution import Evidence
+
+    def atom(value):
+        return tuple(atom(item) for item in value) if isinstance(value, list) else value
+
+    return Evidence((Element({atom(value) for value in atoms}), float(mass)) for atoms, mass in pairs)
+
+
+def dump_evidence(ev):
+    """
+    Returns the JSON form of an evidence, the inverse of `load_evidence`.
+
+    Args:
+        - ev (Evidence): An evidence whose focal elements hold sets.
+
+    Returns:
+        list: [atoms, mass] pairs, with the atoms of every set sorted by their representation.
+    """
+    return [[sorted(key.value, key=repr), mass] for key, mass in ev.items()]
+
+
+def transform(ev, transformation):
+    """
+    Applies a transformation to an evidence.
+
+    Args:
+        - ev (Evidence): An evidence whose focal elements hold sets.
+        - transformation (str): One of `TRANSFORMATIONS`. The pignistic probability is computed with
+                                `dstz.math.stat.measures.pignistic_batch`, the contour function with
+                                `dstz.evpiece.single.contour_transformation`.
+
+    Returns:
+        Evidence: The transformed evidence, over singletons.
+    """
+    from dstz.core.atom import Element
+    from dstz.core.distribution import Evidence
+
+    if transformation == 'pignistic_probability_transformation':
+        from dstz.element.encoding import encode_evidence
+        from dstz.math.stat.measures import pignistic_batch
+        frame, codes, masses = encode_evidence(ev)
+        probs = pignistic_batch(codes[None], masses[None], len(frame))[0]
+        return Evidence((Element({atom}), float(prob)) for atom, prob in zip(frame, probs) if prob > 0)
+    return getattr(importlib.import_module('dstz.evpiece.single'), transformation)(ev)
+
+
+def process_record(record, rule=None, transformation=None):
+    """
+    Fuses the sources of one record and applies a transformation to the result.
+
+    Args:
+        - record (dict): A record with either 'sources', a list of evidences in JSON form, or 'bba', a single one.
+        - rule (str, optional): One of `RULES`, required when a record has more than one source. Defaults to None.
+        - transformation (str, optional): One of `TRANSFORMATIONS`. Defaults to None.
+
+    Returns:
+        tuple: The resulting evidence and the number of sources.
+
+    Raises:
+        ValueError: If the record has no evidence, or several and no rule.
+    """
+    sources = record['sources'] if 'sources' in record else [record['bba']] if 'bba' in record else []
+    if not sources:
+        raise ValueError('A record needs a "bba" or a non-empty "sources" list')
+    if len(sources) > 1 and rule is None:
+        raise ValueError('A record with %d sources needs a rule' % len(sources))
+    evs = [load_evidence(pairs) for pairs in sources]
+    res = evs[0]
+    if len(evs) > 1:
+        res = functools.reduce(getattr(importlib.import_module('dstz.evpiece.dual'), rule), evs)
+    if hasattr(res, 'to_evidence'):
+        # Compact results, such as the ConsonantEvidence of `contour_rule`.
+        res = res.to_evidence()
+    if transformation is not None:
+        res = transform(res, transformation)
+    return res, len(evs)
+
+
+def process_lines(lines, rule=None, transformation=None, measures=()):
+    """
+    Processes a chunk of input lines; this is the unit of work of a worker process.
+
+    Args:
+        - lines (list): (location, line) pairs, where location is a (path, line number) pair.
+        - rule (str, optional): See `process_record`.
+        - transformation (str, optional): See `process_record`.
+        - measures (sequence, optional): Names among `dstz.math.stat.measures.MEASURES`, computed in one batch
+                                         per chunk. Defaults to none.
+
+    Returns:
+        tuple: The output lines, and the numbers of sources and of failed records.
+    """
+    records, results = [], []
+    sources = failed = 0
+    for (path, number), line in lines:
+        try:
+            record = json.loads(line)
+            ev, used = process_record(record, rule, transformation)
+            out = {'id': record.get('id', '%s:%d' % (path, number)), 'bba': dump_evidence(ev)}
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            sys.stderr.write('%s:%d: %s\n' % (path, number, error))
+            failed += 1
+            continue
+        sources += used
+        records.append(out)
+        results.append(ev)
+    if measures and results:
+        from dstz.math.stat.measures import measures as batch_measures
+        values = batch_measures(results, measures)
+        for i, record in enumerate(records):
+            record['measures'] = {name: float(values[name][i]) for name in measures}
+    return [json.dumps(record) for record in records], sources, failed
+
+
+def iter_paths(inputs):
+    """
+    Lists the input files.
+
+    Args:
+        - inputs (list): Files, directories, whose '*.jsonl' files are read in name order, or '-' for stdin.
+
+    Returns:
+        list: The paths.
+    """
+    paths = []
+    for name in inputs:
+        if os.path.isdir(name):
+            paths.extend(os.path.join(name, entry) for entry in sorted(os.listdir(name)) if entry.endswith('.jsonl'))
+        else:
+            paths.append(name)
+    return paths
+
+
+def iter_chunks(paths, chunk_size=CHUNK_SIZE, stats=None):
+    """
+    Streams the non-blank lines of the input files in chunks.
+
+    Args:
+        - paths (list): The files; '-' stands for stdin.
+        - chunk_size (int, optional): The number of lines per chunk. Defaults to `CHUNK_SIZE`.
+        - stats (dict, optional): Updated with the 'bytes' and 'files' read.
+
+    Yields:
+        list: (location, line) pairs, see `process_lines`.
+    """
+    stats = {} if stats is None else stats
+    chunk = []
+    for path in paths:
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for number, line in enumerate(stream, 1):
+                stats['bytes'] = stats.get('bytes', 0) + len(line.encode('utf-8'))
+                if line.strip():
+                    chunk.append(((path, number), line))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        stats['files'] = stats.get('files', 0) + 1
+    if chunk:
+        yield chunk
+
+
+def run(inputs, output=None, rule=None, transformation=None, measures=(), processes=None,
+        chunk_size=CHUNK_SIZE):
+    """
+    Processes the records of many evidence files, in parallel and in input order.
+
+    Args:
+        - inputs (list): See `iter_paths`.
+        - output (file, optional): Where the JSON Lines results are written. Defaults to stdout.
+        - rule (str, optional): See `process_record`.
+        - transformation (str, optional): See `process_record`.
+        - measures (sequence, optional): See `process_lines`.
+        - processes (int, optional): The number of worker processes; 1 processes the chunks in this process.
+                                     Defaults to `os.cpu_count()`.
+        - chunk_size (int, optional): The number of lines per chunk. Defaults to `CHUNK_SIZE`.
+
+    Returns:
+        dict: The statistics: 'files', 'bytes', 'records', 'sources', 'failed', 'seconds' and the throughput
+              in 'records_per_second' and 'megabytes_per_second'.
+
+    Description:
+        Chunks are read lazily and at most two per worker are in flight, so memory stays bounded however
+        large the inputs are; results are written as soon as the oldest pending chunk is done.
+    """
+    output = output or sys.stdout
+    processes = processes or os.cpu_count() or 1
+    stats = {'files': 0, 'bytes': 0, 'records': 0, 'sources': 0, 'failed': 0}
+    work = functools.partial(process_lines, rule=rule, transformation=transformation, measures=tuple(measures))
+    start = time.perf_counter()
+
+    def collect(res):
+        lines, sources, failed = res
+        for line in lines:
+            output.write(line + '\n')
+        stats['records'] += len(lines)
+        stats['sources'] += sources
+        stats['failed'] += failed
+
+    chunks = iter_chunks(iter_paths(inputs), chunk_size, stats)
+    if processes == 1:
+        for chunk in chunks:
+            collect(work(chunk))
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            pending = []
+            for chunk in chunks:
+                pending.append(pool.submit(work, chunk))
+                if len(pending) >= 2 * processes:
+                    collect(pending.pop(0).result())
+            for future in pending:
+                collect(future.result())
+    output.flush()
+    seconds = time.perf_counter() - start
+    stats['seconds'] = seconds
+    stats['records_per_second'] = stats['records'] / seconds if seconds else 0.0
+    stats['megabytes_per_second'] = stats['bytes'] / 1e6 / seconds if seconds else 0.0
+    return stats
+
+
+def main(argv=None):
+    from dstz.math.stat.measures import MEASURES
+
+    parser = argparse.ArgumentParser(
+        prog='dstz', description='Fuse, transform and measure evidences read from JSON Lines files. Every line is '
+                                 'a record {"id": ..., "sources": [bba, ...]} or {"id": ..., "bba": bba}, where a '
+                                 'bba is a list of [atoms, mass] pairs.')
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help='Files or directories of *.jsonl files; "-" reads stdin (the default).')
+    parser.add_argument('-r', '--rule', choices=RULES, help='The rule folding the sources of every record.')
+    parser.add_argument('-t', '--transformation', choices=TRANSFORMATIONS,
+                        help='A transformation applied to the fused evidence.')
+    parser.add_argument('-m', '--measure', action='append', default=[], choices=MEASURES,
+                        help='A measure of the resulting evidence; may be repeated.')
+    parser.add_argument('-o', '--output', help='The output file. Defaults to stdout.')
+    parser.add_argument('-p', '--processes', type=int, help='The number of worker processes. Defaults to all cores.')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Lines per unit of work.')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print the statistics.')
+    args = parser.parse_args(argv)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        stats = run(args.inputs, output, args.rule, args.transformation, args.measure, args.processes,
+                    args.chunk_size)
+    finally:
+        if args.output:
+            output.close()
+    if not args.quiet:
+        sys.stderr.write('%(records)d records (%(sources)d sources, %(failed)d failed) from %(files)d files in '
+                         '%(seconds).3f s: %(records_per_second).1f records/s, %(megabytes_per_second).2f MB/s\n'
+                         % stats)
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Hashable
+from collections.abc import Hashable
 
 
 class Item(ABC):
@@ -0,0 +1,300 @@
+import copy
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from dstz.core.atom import Item
+
+
+def _canonical(value):
+    """
+    Builds a canonical string for the value of an Item, independent of set iteration order.
+
+    Args:
+        - value (Any): The value to canonicalize. Sets are sorted, tuples and lists keep their order
+                       and nested Items are expanded through their idattr.
+
+    Returns:
+        str: A string that is equal for equal values across interpreter sessions.
+    """
+    if isinstance(value, Item):
+        return '%s<%s>' % (type(value).__name__,
+                           ','.join(_canonical(getattr(value, attr)) for attr in value.idattr))
+    if isinstance(value, (set, frozenset)):
+        return '{%s}' % ','.join(sorted(_canonical(v) for v in value))
+    if isinstance(value, tuple):
+        return '(%s)' % ','.join(_canonical(v) for v in value)
+    if isinstance(value, list):
+        return '[%s]' % ','.join(_canonical(v) for v in value)
+    return '%s:%r' % (type(value).__name__, value)
+
+
+def fingerprint(ev):
+    """
+    Computes a stable content fingerprint of an evidence distribution.
+
+    Args:
+        - ev (Evidence): The evidence distribution to fingerprint.
+
+    Returns:
+        str: A hexadecimal digest that only depends on the focal elements and their masses,
+             not on insertion order or on the process that computed it.
+
+    Description:
+        Every focal element is canonicalized with `_canonical`, paired with the exact hexadecimal
+        representation of its mass, and the sorted pairs are hashed with BLAKE2b. Two evidences
+        with the same content therefore share a fingerprint, which makes it usable as a cache key.
+    """
+    lines = sorted('%s=%s' % (_canonical(key), float(mass).hex()) for key, mass in ev.items())
+    digest = hashlib.blake2b(digest_size=16)
+    for line in lines:
+        digest.update(line.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _sizeof(value):
+    """
+    Estimates the memory footprint of a cached value in bytes.
+
+    Args:
+        - value (Any): A cached value, typically an Evidence, a set or a NumPy array.
+
+    Returns:
+        int: The estimated number of bytes held by the value.
+    """
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + sys.getsizeof(item)
+            if isinstance(key, Item):
+                size += sys.getsizeof(getattr(key, 'value', None))
+    elif isinstance(value, (set, frozenset, tuple, list)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+class LRUCache(object):
+    """
+    A thread-safe least-recently-used cache bounded by an estimated memory budget.
+
+    Attributes:
+        - max_bytes (int): The memory budget in bytes; least recently used entries are evicted beyond it.
+        - max_entries (int or None): An optional bound on the number of entries.
+        - hits (int): The number of successful lookups.
+        - misses (int): The number of failed lookups.
+        - evictions (int): The number of entries dropped to respect the budget.
+
+    Methods:
+        - get(key, default=None): Returns the cached value for key and marks it as recently used.
+        - put(key, value): Stores a value, evicting old entries when the budget is exceeded.
+        - clear(): Drops all entries and resets the counters.
+        - stats(): Returns the counters and current usage as a dict.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=None):
+        """
+        Initializes an empty cache.
+
+        Args:
+            - max_bytes (int, optional): The memory budget in bytes. Defaults to 64 MiB.
+            - max_entries (int, optional): The maximum number of entries. Defaults to None (unbounded).
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key and marks it as recently used.
+
+        Args:
+            - key (Hashable): The cache key.
+            - default (Any, optional): The value returned on a miss. Defaults to None.
+
+        Returns:
+            Any: The cached value, or `default` if the key is not cached.
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting least recently used entries when the budget is exceeded.
+
+        Args:
+            - key (Hashable): The cache key.
+            - value (Any): The value to store. Values larger than the whole budget are not stored.
+        """
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (self._bytes > self.max_bytes or
+                                  (self.max_entries is not None and len(self._data) > self.max_entries)):
+                _, (_, old_size) = self._data.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drops all entries and resets the counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the counters and current usage of the cache.
+
+        Returns:
+            dict: A dict with the keys 'hits', 'misses', 'evictions', 'entries', 'bytes' and 'max_bytes'.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._data), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+_cache = None
+
+
+def enable_cache(max_bytes=64 * 1024 * 1024, max_entries=None):
+    """
+    Turns on memoization of combination rules and per-frame artifacts.
+
+    Args:
+        - max_bytes (int, optional): The memory budget of the cache in bytes. Defaults to 64 MiB.
+        - max_entries (int, optional): The maximum number of cached entries. Defaults to None (unbounded).
+
+    Returns:
+        LRUCache: The active cache, whose `stats()` reports hit and miss counters.
+    """
+    global _cache
+    _cache = LRUCache(max_bytes, max_entries)
+    return _cache
+
+
+def disable_cache():
+    """
+    Turns off memoization and drops the active cache.
+    """
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    """
+    Returns the active cache.
+
+    Returns:
+        LRUCache or None: The active cache, or None if caching is disabled.
+    """
+    return _cache
+
+
+def _name(obj):
+    return '%s.%s' % (getattr(obj, '__module__', ''), getattr(obj, '__qualname__', repr(obj)))
+
+
+def _fingerprint_of(ev):
+    method = getattr(ev, 'fingerprint', None)
+    return method() if method is not None else fingerprint(ev)
+
+
+def _frozen(value):
+    if hasattr(value, 'setflags'):
+        value.setflags(write=False)
+    return value
+
+
+def memoize_rule(func):
+    """
+    Decorates a combination rule so that its results are cached by content when caching is enabled.
+
+    Args:
+        - func (callable): A rule taking two evidences followed by optional extra arguments.
+
+    Returns:
+        callable: The wrapped rule. The cache key is (rule, fingerprint of ev1, fingerprint of ev2,
+                  extra arguments); a copy of the cached result is returned on a hit so callers may
+                  mutate it freely.
+    """
+    name = _name(func)
+
+    @wraps(func)
+    def wrapper(ev1, ev2, *args, **kwargs):
+        cache = _cache
+        if cache is None:
+            return func(ev1, ev2, *args, **kwargs)
+        key = (name, _fingerprint_of(ev1), _fingerprint_of(ev2),
+               tuple(_name(arg) if callable(arg) else arg for arg in args),
+               tuple(sorted((k, _name(v) if callable(v) else v) for k, v in kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(ev1, ev2, *args, **kwargs)
+        res = cache.get(key)
+        if res is None:
+            res = func(ev1, ev2, *args, **kwargs)
+            cache.put(key, copy.copy(res))
+            return res
+        return copy.copy(res)
+
+    return wrapper
+
+
+def memoize_frame(func):
+    """
+    Decorates a function of a frame size (or other hashable arguments) whose result is a per-frame artifact.
+
+    Args:
+        - func (callable): A function such as `get_qfrm` whose result only depends on its arguments.
+
+    Returns:
+        callable: The wrapped function. When caching is enabled, NumPy results are cached and returned
+                  read-only, so they are shared between callers without copying.
+    """
+    name = _name(func)
+
+    @wraps(func)
+    def wrapper(*args):
+        cache = _cache
+        if cache is None:
+            return func(*args)
+        key = (name,) + args
+        res = cache.get(key)
+        if res is None:
+            res = _frozen(func(*args))
+            cache.put(key, res)
+        return res
+
+    return wrapper
+
@@ -1,4 +1,5 @@
 from dstz.core.atom import Item
+from dstz.core.cache import fingerprint
 
 
 class Evidence(dict):
@@ -15,6 +16,10 @@ class Evidence(dict):
 
         - __getitem__(item): Retrieves an item from the dictionary, ensuring that the key is an
                            instance of Item.
+
+        - fingerprint(): Returns a stable content fingerprint, cached until the evidence is modified.
+
+    See `ObservableEvidence` for an evidence that also maintains its frame and total mass.
     """
 
     def __init__(self, *args, **kwargs):
@@ -26,6 +31,7 @@ class Evidence(dict):
             TypeError: If any key is not an instance of Item or any value is not a float.
         """
         super(Evidence, self).__init__(*args, **kwargs)
+        self._fingerprint = None
         for key, value in self.items():
             if not isinstance(key, Item):
                 raise TypeError('Key must be an instance of Item')
@@ -48,6 +54,7 @@ class Evidence(dict):
             raise TypeError('Key must be an instance of Item')
         if not isinstance(value, float):
             raise TypeError('Value must be a float')
+        self._fingerprint = None
         super(Evidence, self).__setitem__(key, value)
 
     def __getitem__(self, item):
@@ -66,3 +73,188 @@ class Evidence(dict):
         if not isinstance(item, Item):
             raise TypeError('Key must be an instance of Item')
         return super(Evidence, self).__getitem__(item)
+
+    def __delitem__(self, key):
+        self._fingerprint = None
+        super(Evidence, self).__delitem__(key)
+
+    def pop(self, *args):
+        self._fingerprint = None
+        return super(Evidence, self).pop(*args)
+
+    def popitem(self):
+        self._fingerprint = None
+        return super(Evidence, self).popitem()
+
+    def clear(self):
+        self._fingerprint = None
+        super(Evidence, self).clear()
+
+    def update(self, *args, **kwargs):
+        """
+        Updates the dictionary through `__setitem__`, so that keys and values are validated.
+        """
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def fingerprint(self):
+        """
+        Returns a stable content fingerprint of the evidence.
+
+        Returns:
+            str: A hexadecimal digest computed by `dstz.core.cache.fingerprint`. It is cached on the
+                 instance and recomputed only after the evidence has been modified.
+        """
+        if getattr(self, '_fingerprint', None) is None:
+            self._fingerprint = fingerprint(self)
+        return self._fingerprint
+
+
+class ObservableEvidence(Evidence):
+    """
+    An Evidence that maintains its frame, its total mass and cached measures as it is modified.
+
+    Methods:
+        - atoms(): Returns the atoms of the focal elements, without scanning them.
+        - total(): Returns the sum of the masses, without scanning them.
+        - cached(name, func): Returns `func(self)`, computed once until the evidence is modified.
+
+    Description:
+        Every change goes through `__setitem__` (also for `update`, `setdefault` and `|=`), `__delitem__`,
+        `pop`, `popitem` or `clear`, which update a reference count per atom and a running sum of the
+        masses, and drop the cached measures. Reading the frame or the total mass then costs O(|frame|)
+        and O(1) instead of a scan of all the focal elements, which pays off for large evidences that
+        are read more often than they change.
+        `get_fod` and `frame_of` use these aggregates. The focal elements must hold iterables of atoms.
+
+    Example Usage:
+        >>> ev = ObservableEvidence({Element({'a'}): 0.6, Element({'a', 'b'}): 0.4})
+        >>> ev.atoms()
+        frozenset({'a', 'b'})
+        >>> ev.cached('deng_entropy', deng_entropy)  # computed once until the next change
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes the evidence and its aggregates.
+
+        Raises:
+            TypeError: If any key is not an instance of Item or any value is not a float.
+        """
+        super(ObservableEvidence, self).__init__(*args, **kwargs)
+        self._counts = {}
+        self._atoms = None
+        self._total = 0.0
+        self._measures = {}
+        for key, value in self.items():
+            self._add(key)
+            self._total += value
+
+    def _add(self, key):
+        for atom in key.value:
+            if atom in self._counts:
+                self._counts[atom] += 1
+            else:
+                self._counts[atom] = 1
+                self._atoms = None
+
+    def _remove(self, key, value):
+        for atom in key.value:
+            if self._counts[atom] == 1:
+                del self._counts[atom]
+                self._atoms = None
+            else:
+                self._counts[atom] -= 1
+        self._total -= value
+        self._measures = {}
+
+    def __setitem__(self, key, value):
+        old = dict.get(self, key) if isinstance(key, Item) else None
+        super(ObservableEvidence, self).__setitem__(key, value)
+        if old is None:
+            self._add(key)
+            self._total += value
+        else:
+            self._total += value - old
+        self._measures = {}
+
+    def __delitem__(self, key):
+        value = dict.__getitem__(self, key)
+        super(ObservableEvidence, self).__delitem__(key)
+        self._remove(key, value)
+
+    def pop(self, key, *args):
+        if key not in self:
+            return super(ObservableEvidence, self).pop(key, *args)
+        value = super(ObservableEvidence, self).pop(key)
+        self._remove(key, value)
+        return value
+
+    def popitem(self):
+        key, value = super(ObservableEvidence, self).popitem()
+        self._remove(key, value)
+        return key, value
+
+    def clear(self):
+        super(ObservableEvidence, self).clear()
+        self._counts = {}
+        self._atoms = None
+        self._total = 0.0
+        self._measures = {}
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        res = self.__class__(self)
+        res.update(other)
+        return res
+
+    def __reduce__(self):
+        # Copies and pickles rebuild the aggregates instead of sharing them.
+        return self.__class__, (dict(self),)
+
+    def atoms(self):
+        """
+        Returns the atoms of the focal elements.
+
+        Returns:
+            frozenset: The atoms, cached until an atom appears or disappears.
+        """
+        if self._atoms is None:
+            self._atoms = frozenset(self._counts)
+        return self._atoms
+
+    def total(self):
+        """
+        Returns the sum of the masses.
+
+        Returns:
+            float: The running sum, which may differ from a fresh sum by rounding after many changes.
+        """
+        return self._total
+
+    def cached(self, name, func):
+        """
+        Returns a measure of the evidence, computed once until the evidence is modified.
+
+        Args:
+            - name (str): The name under which the measure is cached.
+            - func (callable): A function of one evidence, e.g. `dstz.math.stat.moment.deng_entropy`.
+
+        Returns:
+            Any: The value of `func(self)`.
+        """
+        if name not in self._measures:
+            self._measures[name] = func(self)
+        return self._measures[name]
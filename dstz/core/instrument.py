@@ -0,0 +1,177 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+_recorders = []
+_lock = threading.Lock()
+
+
+class Recorder(object):
+    """
+    Collects counters and timers while instrumentation is active.
+
+    Attributes:
+        - counters (dict): Maps a counter name to its accumulated value.
+        - timers (dict): Maps a timer name to a [calls, seconds] pair.
+        - sink (callable or dict or None): Where the statistics go. A dict is updated live with flat keys
+                                          (counter names, and '<timer>.calls' / '<timer>.seconds'), so that
+                                          an exporter can scrape it at any time; a callable receives the
+                                          snapshot of `stats()` when the recorder is closed.
+
+    Methods:
+        - add(name, value): Adds a value to a counter.
+        - record(name, seconds): Records one timed call.
+        - stats(): Returns a flat snapshot of all counters and timers.
+        - close(): Delivers the statistics to a callable sink.
+    """
+
+    def __init__(self, sink=None):
+        """
+        Initializes an empty recorder.
+
+        Args:
+            - sink (callable or dict, optional): Where the statistics are delivered. Defaults to None.
+        """
+        self.counters = {}
+        self.timers = {}
+        self.sink = sink
+
+    def add(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+        if isinstance(self.sink, dict):
+            self.sink[name] = self.sink.get(name, 0) + value
+
+    def record(self, name, seconds):
+        timer = self.timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+        if isinstance(self.sink, dict):
+            self.sink[name + '.calls'] = self.sink.get(name + '.calls', 0) + 1
+            self.sink[name + '.seconds'] = self.sink.get(name + '.seconds', 0.0) + seconds
+
+    def stats(self):
+        """
+        Returns a flat snapshot of the statistics.
+
+        Returns:
+            dict: Counter values under their names, and for every timer the number of calls under
+                  '<timer>.calls' and the total time in seconds under '<timer>.seconds'.
+        """
+        res = dict(self.counters)
+        for name, (calls, seconds) in self.timers.items():
+            res[name + '.calls'] = calls
+            res[name + '.seconds'] = seconds
+        return res
+
+    def close(self):
+        if callable(self.sink):
+            self.sink(self.stats())
+
+
+def enabled():
+    """
+    Tells whether instrumentation is active.
+
+    Returns:
+        bool: True if at least one recorder is collecting statistics.
+    """
+    return bool(_recorders)
+
+
+def count(name, value=1):
+    """
+    Adds a value to a counter of every active recorder. Does nothing when instrumentation is disabled.
+
+    Args:
+        - name (str): The counter name, e.g. 'evpiece.dual.ds_rule.pairs'.
+        - value (int or float, optional): The amount to add. Defaults to 1.
+    """
+    if not _recorders:
+        return
+    with _lock:
+        for recorder in _recorders:
+            recorder.add(name, value)
+
+
+@contextmanager
+def timer(name):
+    """
+    Times the enclosed block and records it under `name`. Does not read the clock when instrumentation is disabled.
+
+    Args:
+        - name (str): The timer name.
+    """
+    if not _recorders:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+def _record(name, seconds):
+    with _lock:
+        for recorder in _recorders:
+            recorder.record(name, seconds)
+
+
+def timed(name=None):
+    """
+    Decorates a function so that every call is timed while instrumentation is active.
+
+    Args:
+        - name (str, optional): The timer name. Defaults to the module path below `dstz` followed by the
+                                function name, e.g. 'evpiece.dual.ds_rule'.
+
+    Returns:
+        callable: A decorator. When instrumentation is disabled the wrapper only checks one global
+                  before calling the function.
+    """
+
+    def decorator(func):
+        label = name or '%s.%s' % (func.__module__.replace('dstz.', '', 1), func.__name__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _recorders:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(label, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def instrument(sink=None):
+    """
+    Collects counters and timers of the rules and measures called inside the block.
+
+    Args:
+        - sink (callable or dict, optional): A callable receiving the statistics when the block exits, or a
+                                            dict updated live while the block runs. Defaults to None.
+
+    Yields:
+        Recorder: The recorder of this block; `stats()` can be read inside or after the block.
+
+    Example Usage:
+        >>> with instrument() as rec:
+        ...     ds_rule(ev1, ev2)
+        >>> rec.stats()['evpiece.dual.ds_rule.pairs']
+    """
+    recorder = Recorder(sink)
+    with _lock:
+        _recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        with _lock:
+            _recorders.remove(recorder)
+        recorder.close()
@@ -0,0 +1,52 @@
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    A placeholder module that imports the real module on first attribute access.
+
+    Methods:
+        - __getattr__(item): Imports the real module, copies its namespace into the placeholder and
+                             returns the requested attribute. Later lookups hit the copied namespace
+                             directly, so the placeholder costs nothing once loaded.
+    """
+
+    def __getattr__(self, item):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, item)
+
+
+def lazy_import(name):
+    """
+    Returns a module that is only imported when one of its attributes is first used.
+
+    Args:
+        - name (str): The absolute name of the module, e.g. 'numpy'.
+
+    Returns:
+        module: The module itself if it is already imported, otherwise a LazyModule placeholder.
+
+    Example Usage:
+        >>> np = lazy_import('numpy')
+        >>> np.zeros(3)  # numpy is imported here
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def available(name):
+    """
+    Tells whether an optional dependency can be imported, without importing it.
+
+    Args:
+        - name (str): The absolute name of the module, e.g. 'numpy'.
+
+    Returns:
+        bool: True if the module is already imported or can be found on the path.
+    """
+    return name in sys.modules or importlib.util.find_spec(name) is not None
@@ -0,0 +1,239 @@
+import math
+from contextlib import contextmanager
+
+from dstz.core.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+# Floating types for the masses of encoded batches and archives.
+STORAGE = ('float64', 'float32')
+
+# Ways of summing masses: plain running sums, Neumaier's compensated sums, or exactly rounded sums (`math.fsum`).
+ACCUMULATION = ('naive', 'kahan', 'exact')
+
+_policy = {'storage': 'float64', 'accumulation': 'naive'}
+
+
+def get_precision():
+    """
+    Returns the active precision policy.
+
+    Returns:
+        dict: 'storage' (one of `STORAGE`) and 'accumulation' (one of `ACCUMULATION`).
+    """
+    return dict(_policy)
+
+
+def set_precision(storage=None, accumulation=None):
+    """
+    Changes the precision policy of the batched kernels and of the combination loops.
+
+    Args:
+        - storage (str, optional): 'float64' or 'float32', the type of the masses of encoded batches. float32
+                                   halves the memory traffic of memory-bound kernels. Defaults to None (unchanged).
+        - accumulation (str, optional): 'naive', 'kahan' or 'exact', how masses are summed when equal focal
+                                        elements are merged and when evidences are normalized. Defaults to None
+                                        (unchanged). 'naive' uses plain running sums, and `np.bincount` or
+                                        `np.add.reduceat` in the array kernels. 'kahan' uses Neumaier's
+                                        compensated sums, 'exact' the exactly rounded sums of `math.fsum`, in
+                                        the combination loops and in the array kernels alike, see
+                                        `group_fsum`. Under both, float32 arrays are summed in float64.
+
+    Returns:
+        dict: The previous policy, which can be passed back as keyword arguments.
+
+    Raises:
+        ValueError: If a storage type or an accumulation mode is unknown.
+    """
+    if storage is not None and storage not in STORAGE:
+        raise ValueError('Unknown storage %r, expected one of %s' % (storage, ', '.join(STORAGE)))
+    if accumulation is not None and accumulation not in ACCUMULATION:
+        raise ValueError('Unknown accumulation %r, expected one of %s' % (accumulation, ', '.join(ACCUMULATION)))
+    previous = get_precision()
+    if storage is not None:
+        _policy['storage'] = storage
+    if accumulation is not None:
+        _policy['accumulation'] = accumulation
+    return previous
+
+
+@contextmanager
+def precision(storage=None, accumulation=None):
+    """
+    Applies a precision policy inside a block.
+
+    Args:
+        - storage (str, optional): See `set_precision`.
+        - accumulation (str, optional): See `set_precision`.
+
+    Example Usage:
+        >>> with precision(storage='float32', accumulation='kahan'):
+        ...     res = combine_batch(evs1, evs2, normalize=True)
+    """
+    previous = set_precision(storage, accumulation)
+    try:
+        yield
+    finally:
+        set_precision(**previous)
+
+
+def compensated():
+    """
+    Tells whether the active policy asks for compensated accumulation.
+
+    Returns:
+        bool: True unless the accumulation is 'naive'.
+    """
+    return _policy['accumulation'] != 'naive'
+
+
+def storage_dtype():
+    """
+    Returns the NumPy type of the masses of encoded batches under the active policy.
+
+    Returns:
+        numpy.dtype: float64 or float32.
+    """
+    return np.dtype(_policy['storage'])
+
+
+def accumulation_dtype(dtype):
+    """
+    Returns the type in which arrays of masses of a given type are summed under the active policy.
+
+    Args:
+        - dtype (dtype): The storage type of the masses.
+
+    Returns:
+        numpy.dtype: float64 when the accumulation is compensated, the storage type otherwise.
+    """
+    return np.dtype(np.float64) if compensated() else np.dtype(dtype)
+
+
+def fsum(values):
+    """
+    Sums floats according to the active accumulation mode.
+
+    Args:
+        - values (iterable): The floats.
+
+    Returns:
+        float: The plain, Neumaier-compensated or exactly rounded (`math.fsum`) sum.
+    """
+    mode = _policy['accumulation']
+    if mode == 'exact':
+        return math.fsum(values)
+    if mode == 'naive':
+        return sum(values, 0.0)
+    total = correction = 0.0
+    for value in values:
+        temp = total + value
+        if abs(total) >= abs(value):
+            correction += (total - temp) + value
+        else:
+            correction += (value - temp) + total
+        total = temp
+    return total + correction
+
+
+def group_fsum(values, starts):
+    """
+    Sums the groups of an array according to the active accumulation mode.
+
+    Args:
+        - values (array): A one-dimensional array whose groups are contiguous, e.g. sorted by key.
+        - starts (array): The index of the first value of every group, in increasing order, starting at 0.
+
+    Returns:
+        numpy.ndarray: The sum of every group, computed with `np.add.reduceat`, with Neumaier's compensated
+                       summation (in float64) or with `math.fsum`.
+
+    Description:
+        The compensated sums run over all the groups at once: step k adds the k-th value of every group
+        that has one, so the number of NumPy calls is the size of the largest group, not the number of
+        values.
+    """
+    mode = _policy['accumulation']
+    if not len(starts):
+        return np.zeros(0, dtype=values.dtype)
+    if mode == 'naive':
+        return np.add.reduceat(values, starts)
+    bounds = np.append(starts, len(values))
+    if mode == 'exact':
+        flat = values.tolist()
+        return np.array([math.fsum(flat[start:stop]) for start, stop in zip(bounds[:-1], bounds[1:])])
+    values = np.asarray(values, dtype=np.float64)
+    lengths = np.diff(bounds)
+    total = values[starts]
+    correction = np.zeros(len(starts))
+    for k in range(1, int(lengths.max())):
+        active = np.flatnonzero(lengths > k)
+        value = values[starts[active] + k]
+        current = total[active]
+        temp = current + value
+        correction[active] += np.where(np.abs(current) >= np.abs(value), (current - temp) + value,
+                                       (value - temp) + current)
+        total[active] = temp
+    return total + correction
+
+
+class Accumulator(object):
+    """
+    Sums masses per key, with compensation when the active policy asks for it.
+
+    Methods:
+        - add(key, value): Adds a mass to a key.
+        - items(): Returns the (key, sum) pairs, in order of first insertion.
+
+    Description:
+        A naive accumulator is a plain dict of running sums. A compensated one also keeps, per key, the
+        running error of Neumaier's summation, so that long chains of `+=` on the same focal element do not
+        drift; in 'exact' mode the terms are kept and summed with `math.fsum`. The mode is read once,
+        when the accumulator is created.
+    """
+
+    def __init__(self):
+        self.mode = _policy['accumulation']
+        self._sums = {}
+        self._errors = {}
+
+    def add(self, key, value):
+        """
+        Adds a mass to a key.
+
+        Args:
+            - key (Hashable): The key, typically an Item.
+            - value (float): The mass.
+        """
+        sums = self._sums
+        if self.mode == 'naive':
+            sums[key] = sums[key] + value if key in sums else value
+        elif self.mode == 'exact':
+            if key in sums:
+                sums[key].append(value)
+            else:
+                sums[key] = [value]
+        elif key in sums:
+            total = sums[key]
+            temp = total + value
+            if abs(total) >= abs(value):
+                self._errors[key] += (total - temp) + value
+            else:
+                self._errors[key] += (value - temp) + total
+            sums[key] = temp
+        else:
+            sums[key] = value
+            self._errors[key] = 0.0
+
+    def items(self):
+        """
+        Returns the accumulated sums.
+
+        Returns:
+            list: The (key, sum) pairs, in order of first insertion.
+        """
+        if self.mode == 'naive':
+            return list(self._sums.items())
+        if self.mode == 'exact':
+            return [(key, math.fsum(terms)) for key, terms in self._sums.items()]
+        return [(key, total + self._errors[key]) for key, total in self._sums.items()]
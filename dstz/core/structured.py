@@ -0,0 +1,351 @@
+import hashlib
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.core.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+STRUCTURES = ('bayesian', 'consonant')
+
+
+def is_bayesian(ev):
+    """
+    Tells whether an evidence distribution is Bayesian, i.e. only singletons carry mass.
+
+    Args:
+        - ev (Evidence): An evidence distribution whose focal elements hold sets.
+
+    Returns:
+        bool: True if every focal element with non-zero mass is a singleton.
+    """
+    if isinstance(ev, BayesianEvidence):
+        return True
+    if isinstance(ev, ConsonantEvidence):
+        return False
+    return all(len(key.value) == 1 for key, mass in ev.items() if mass)
+
+
+def is_consonant(ev):
+    """
+    Tells whether an evidence distribution is consonant, i.e. its focal elements are nested.
+
+    Args:
+        - ev (Evidence): An evidence distribution whose focal elements hold sets.
+
+    Returns:
+        bool: True if the focal elements with non-zero mass form a chain under inclusion.
+    """
+    if isinstance(ev, ConsonantEvidence):
+        return True
+    if isinstance(ev, BayesianEvidence):
+        return len(ev) <= 1
+    chain = sorted((key.value for key, mass in ev.items() if mass), key=len)
+    return all(small.issubset(large) for small, large in zip(chain, chain[1:]))
+
+
+def detect_structure(*evs):
+    """
+    Finds the structure shared by several evidence distributions.
+
+    Args:
+        - \\*evs (Evidence): The evidence distributions.
+
+    Returns:
+        str or None: 'bayesian' if any of them is Bayesian (which is enough for the Bayesian fast path of
+                     Dempster's rule), 'consonant' if all of them are consonant, and None otherwise.
+    """
+    if any(is_bayesian(ev) for ev in evs):
+        return 'bayesian'
+    if all(is_consonant(ev) for ev in evs):
+        return 'consonant'
+    return None
+
+
+def contour(ev, frame):
+    """
+    Computes the contour function (plausibility of every singleton) of an evidence over a frame.
+
+    Args:
+        - ev (Evidence, BayesianEvidence or ConsonantEvidence): The evidence distribution.
+        - frame (sequence): The atoms at which the contour is evaluated.
+
+    Returns:
+        numpy.ndarray: Entry i is the plausibility of the i-th atom of `frame`; atoms unknown to `ev` get 0.
+    """
+    if isinstance(ev, (BayesianEvidence, ConsonantEvidence)):
+        values = dict(zip(ev.frame, (ev.probs if isinstance(ev, BayesianEvidence) else ev.contour).tolist()))
+        return np.array([values.get(atom, 0.0) for atom in frame], dtype=np.float64)
+    index = {atom: i for i, atom in enumerate(frame)}
+    res = [0.0] * len(frame)
+    for key, mass in ev.items():
+        for atom in key.value:
+            i = index.get(atom)
+            if i is not None:
+                res[i] += mass
+    return np.array(res, dtype=np.float64)
+
+
+def doubt(ev, frame):
+    """
+    Computes the mass of the focal elements that miss every singleton of a frame, the complement of `contour`.
+
+    Args:
+        - ev (Evidence, BayesianEvidence or ConsonantEvidence): The evidence distribution.
+        - frame (sequence): The atoms at which the doubt is evaluated.
+
+    Returns:
+        numpy.ndarray: Entry i is the total mass of the focal elements, the empty set included, that do not
+                       contain the i-th atom of `frame`.
+
+    Description:
+        The masses are summed directly rather than subtracting the contour from the total mass, so the
+        entry of an atom that every focal element contains is exactly 0.
+    """
+    if isinstance(ev, ConsonantEvidence):
+        peak = float(ev.contour[0]) if len(ev.frame) else 0.0
+        return peak - contour(ev, frame)
+    if not len(frame):
+        return np.zeros(0)
+    if isinstance(ev, BayesianEvidence):
+        known = set(frame)
+        probs = contour(ev, frame)
+        rest = sum((prob for atom, prob in zip(ev.frame, ev.probs.tolist()) if atom not in known), 0.0)
+        before = np.append(0.0, np.cumsum(probs)[:-1])
+        after = np.append(np.cumsum(probs[::-1])[::-1][1:], 0.0)
+        return before + after + rest
+    index = {atom: i for i, atom in enumerate(frame)}
+    rows, columns = [], []
+    for row, key in enumerate(ev.keys()):
+        for atom in key.value:
+            if atom in index:
+                rows.append(row)
+                columns.append(index[atom])
+    inside = np.zeros((len(ev), len(frame)), dtype=bool)
+    inside[rows, columns] = True
+    return np.fromiter(ev.values(), np.float64, len(ev)) @ ~inside
+
+
+def _atom_bits(atoms, frame):
+    # The single-bit mask of every atom of `atoms` over `frame`.
+    index = {atom: i for i, atom in enumerate(frame)}
+    positions = np.array([index[atom] for atom in atoms], dtype=np.uint64)
+    return np.left_shift(np.uint64(1), positions)
+
+
+class BayesianEvidence(object):
+    """
+    A compact Bayesian evidence: a probability vector over an ordered frame.
+
+    Attributes:
+        - frame (tuple): The atoms of the frame.
+        - probs (numpy.ndarray): The mass of every singleton, aligned with `frame`.
+
+    Methods:
+        - from_evidence(ev): Builds a BayesianEvidence from an Evidence whose focal elements are singletons.
+        - to_evidence(curItem=Element): Expands the vector into an Evidence over singletons.
+        - encode(frame): Encodes the singletons as bitmasks over a frame.
+        - fingerprint(): Returns a stable content fingerprint, usable as a cache key.
+    """
+
+    def __init__(self, frame, probs):
+        """
+        Initializes a Bayesian evidence.
+
+        Args:
+            - frame (sequence): The atoms of the frame.
+            - probs (array): The mass of every singleton, aligned with `frame`.
+
+        Raises:
+            ValueError: If `probs` does not have one entry per atom.
+        """
+        self.frame = tuple(frame)
+        self.probs = np.asarray(probs, dtype=np.float64)
+        if self.probs.shape != (len(self.frame),):
+            raise ValueError('Expected %d probabilities, got shape %s' % (len(self.frame), self.probs.shape))
+
+    @classmethod
+    def from_evidence(cls, ev, frame=None):
+        """
+        Builds a BayesianEvidence from an Evidence whose focal elements are singletons.
+
+        Args:
+            - ev (Evidence): The evidence to convert.
+            - frame (sequence, optional): The atoms of the frame. Defaults to the atoms of `ev`.
+
+        Returns:
+            BayesianEvidence: The compact representation.
+
+        Raises:
+            ValueError: If a focal element with non-zero mass is not a singleton.
+        """
+        if not is_bayesian(ev):
+            raise ValueError('The evidence has non-singleton focal elements')
+        masses = {}
+        for key, mass in ev.items():
+            for atom in key.value:
+                masses[atom] = masses.get(atom, 0.0) + mass
+        if frame is None:
+            frame = list(masses)
+            try:
+                frame.sort()
+            except TypeError:
+                frame.sort(key=repr)
+        return cls(frame, [masses.get(atom, 0.0) for atom in frame])
+
+    def to_evidence(self, curItem=Element):
+        """
+        Expands the vector into an Evidence over singletons.
+
+        Args:
+            - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                          Defaults to the Element class.
+
+        Returns:
+            Evidence: The singletons with non-zero mass.
+        """
+        return Evidence((curItem({atom}), mass) for atom, mass in zip(self.frame, self.probs.tolist()) if mass)
+
+    def encode(self, frame):
+        """
+        Encodes the singletons with non-zero mass as bitmasks over a frame.
+
+        Args:
+            - frame (sequence): The atoms of the frame, which must contain the atoms of this evidence.
+
+        Returns:
+            tuple: (codes, masses), a uint64 array of bitmasks and a float64 array, as in `encode_evidence`.
+        """
+        keep = self.probs != 0
+        return _atom_bits(self.frame, frame)[keep], self.probs[keep]
+
+    def fingerprint(self):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(self.frame).encode('utf-8'))
+        digest.update(self.probs.tobytes())
+        return 'bayesian-' + digest.hexdigest()
+
+    def __len__(self):
+        return int(np.count_nonzero(self.probs))
+
+    def __eq__(self, other):
+        return isinstance(other, BayesianEvidence) and self.to_evidence() == other.to_evidence()
+
+    def __repr__(self):
+        return 'BayesianEvidence(%r)' % dict(zip(self.frame, self.probs.tolist()))
+
+
+class ConsonantEvidence(object):
+    """
+    A compact consonant evidence: a possibility distribution (contour function) over an ordered frame.
+
+    Attributes:
+        - frame (tuple): The atoms, ordered so that every focal element is a prefix of the frame.
+        - contour (numpy.ndarray): The plausibility of every singleton, non-increasing along `frame`.
+
+    Methods:
+        - from_evidence(ev): Builds a ConsonantEvidence from an Evidence with nested focal elements.
+        - masses(): Returns the mass of every prefix of the frame.
+        - to_evidence(curItem=Element): Expands the contour into an Evidence over nested sets.
+        - encode(frame): Encodes the nested focal elements as bitmasks over a frame.
+        - fingerprint(): Returns a stable content fingerprint, usable as a cache key.
+
+    Description:
+        A consonant mass function is determined by its contour function: with the atoms sorted by
+        decreasing plausibility, the mass of the prefix of length k is contour[k - 1] - contour[k].
+    """
+
+    def __init__(self, frame, contour):
+        """
+        Initializes a consonant evidence.
+
+        Args:
+            - frame (sequence): The atoms of the frame.
+            - contour (array): The plausibility of every atom, aligned with `frame`. The atoms are reordered
+                               by decreasing plausibility.
+        """
+        contour = np.asarray(contour, dtype=np.float64)
+        if contour.shape != (len(frame),):
+            raise ValueError('Expected %d plausibilities, got shape %s' % (len(frame), contour.shape))
+        order = np.argsort(-contour, kind='stable')
+        self.frame = tuple(frame[i] for i in order.tolist())
+        self.contour = contour[order]
+
+    @classmethod
+    def from_evidence(cls, ev):
+        """
+        Builds a ConsonantEvidence from an Evidence with nested focal elements.
+
+        Args:
+            - ev (Evidence): The evidence to convert.
+
+        Returns:
+            ConsonantEvidence: The compact representation.
+
+        Raises:
+            ValueError: If the focal elements are not nested.
+        """
+        if not is_consonant(ev):
+            raise ValueError('The focal elements of the evidence are not nested')
+        contour = {}
+        for key, mass in ev.items():
+            for atom in key.value:
+                contour[atom] = contour.get(atom, 0.0) + mass
+        frame = list(contour)
+        return cls(frame, [contour[atom] for atom in frame])
+
+    def masses(self):
+        """
+        Returns the mass of every prefix of the frame.
+
+        Returns:
+            numpy.ndarray: Entry k - 1 is the mass of the set of the first k atoms.
+        """
+        return self.contour - np.append(self.contour[1:], 0.0)
+
+    def to_evidence(self, curItem=Element):
+        """
+        Expands the contour into an Evidence over nested sets.
+
+        Args:
+            - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                          Defaults to the Element class.
+
+        Returns:
+            Evidence: The prefixes of the frame with non-zero mass.
+        """
+        res = Evidence()
+        for k, mass in enumerate(self.masses().tolist()):
+            if mass > 0:
+                res[curItem(set(self.frame[:k + 1]))] = mass
+        return res
+
+    def encode(self, frame):
+        """
+        Encodes the prefixes with non-zero mass as bitmasks over a frame.
+
+        Args:
+            - frame (sequence): The atoms of the frame, which must contain the atoms of this evidence.
+
+        Returns:
+            tuple: (codes, masses), a uint64 array of bitmasks and a float64 array, as in `encode_evidence`.
+                   The bitmasks are cumulative ORs of the atom bits, so no set is built in Python.
+        """
+        masses = self.masses()
+        keep = masses > 0
+        return np.bitwise_or.accumulate(_atom_bits(self.frame, frame))[keep], masses[keep]
+
+    def fingerprint(self):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(self.frame).encode('utf-8'))
+        digest.update(self.contour.tobytes())
+        return 'consonant-' + digest.hexdigest()
+
+    def __len__(self):
+        return int(np.count_nonzero(self.masses() > 0))
+
+    def __eq__(self, other):
+        return isinstance(other, ConsonantEvidence) and self.to_evidence() == other.to_evidence()
+
+    def __repr__(self):
+        return 'ConsonantEvidence(%r)' % dict(zip(self.frame, self.contour.tolist()))
@@ -0,0 +1,274 @@
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence, ObservableEvidence
+from dstz.core.lazy import lazy_import
+from dstz.core.precision import storage_dtype
+
+np = lazy_import('numpy')
+
+MAX_FRAME_SIZE = 64
+
+
+def sort_frame(atoms):
+    """
+    Orders a collection of atoms into a frame.
+
+    Args:
+        - atoms (iterable): The atoms.
+
+    Returns:
+        tuple: The distinct atoms, sorted when they are comparable and sorted by their repr otherwise, so
+               that the same atoms always yield the same frame.
+    """
+    atoms = set(atoms)
+    try:
+        return tuple(sorted(atoms))
+    except TypeError:
+        return tuple(sorted(atoms, key=repr))
+
+
+def frame_of(*evs):
+    """
+    Collects the atoms of one or several evidence distributions into an ordered frame.
+
+    Args:
+        - \\*evs (Evidence): The evidence distributions whose focal elements span the frame. Compact evidences
+                          such as `BayesianEvidence` contribute the atoms of their own frame, and an
+                          `ObservableEvidence` its maintained atoms.
+
+    Returns:
+        tuple: The atoms, ordered by `sort_frame`.
+    """
+    atoms = set()
+    for ev in evs:
+        if hasattr(ev, 'encode'):
+            atoms.update(ev.frame)
+            continue
+        if isinstance(ev, ObservableEvidence):
+            atoms.update(ev.atoms())
+            continue
+        for key in ev:
+            atoms.update(key.value)
+    return sort_frame(atoms)
+
+
+def frame_index(frame):
+    """
+    Maps every atom of a frame to its bit position.
+
+    Args:
+        - frame (sequence): The atoms of the frame.
+
+    Returns:
+        dict: A dict from atom to bit position.
+
+    Raises:
+        ValueError: If the frame has more than `MAX_FRAME_SIZE` atoms and does not fit in a 64-bit mask.
+    """
+    if len(frame) > MAX_FRAME_SIZE:
+        raise ValueError('A frame of %d atoms does not fit in a %d-bit mask' % (len(frame), MAX_FRAME_SIZE))
+    return {atom: i for i, atom in enumerate(frame)}
+
+
+def encode_set(value, index):
+    """
+    Encodes a set of atoms as an integer bitmask.
+
+    Args:
+        - value (iterable): The atoms of the set.
+        - index (dict): The bit position of every atom, as returned by `frame_index`.
+
+    Returns:
+        int: The bitmask with bit i set when the i-th atom of the frame belongs to the set.
+    """
+    code = 0
+    for atom in value:
+        code |= 1 << index[atom]
+    return code
+
+
+def decode_set(code, frame):
+    """
+    Decodes an integer bitmask into the set of atoms it represents.
+
+    Args:
+        - code (int): The bitmask.
+        - frame (sequence): The atoms of the frame.
+
+    Returns:
+        set: The atoms whose bits are set.
+    """
+    code = int(code)
+    return {atom for i, atom in enumerate(frame) if code >> i & 1}
+
+
+def encode_evidence(ev, frame=None):
+    """
+    Encodes an evidence distribution over sets as parallel arrays of bitmasks and masses.
+
+    Args:
+        - ev (Evidence): An evidence distribution whose focal elements hold sets, or a compact evidence
+                         with an `encode(frame)` method such as `ConsonantEvidence`.
+        - frame (sequence, optional): The atoms of the frame. Defaults to `frame_of(ev)`.
+
+    Returns:
+        tuple: (frame, codes, masses), where codes is a uint64 array of bitmasks and masses a float64 array.
+    """
+    frame = tuple(frame) if frame is not None else frame_of(ev)
+    index = frame_index(frame)
+    if hasattr(ev, 'encode'):
+        return (frame,) + tuple(ev.encode(frame))
+    codes = np.fromiter((encode_set(key.value, index) for key in ev), dtype=np.uint64, count=len(ev))
+    masses = np.fromiter(ev.values(), dtype=np.float64, count=len(ev))
+    return frame, codes, masses
+
+
+def decode_evidence(frame, codes, masses, curItem=Element, keep_zero=False):
+    """
+    Decodes parallel arrays of bitmasks and masses into an evidence distribution.
+
+    Args:
+        - frame (sequence): The atoms of the frame.
+        - codes (array): The bitmasks of the focal elements.
+        - masses (array): The masses of the focal elements.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+        - keep_zero (bool, optional): Whether entries with zero mass are kept. Defaults to False, so that
+                                      the padding of batches is skipped.
+
+    Returns:
+        Evidence: The decoded evidence. Masses of repeated bitmasks are summed.
+    """
+    res = Evidence()
+    for code, mass in zip(np.asarray(codes).tolist(), np.asarray(masses, dtype=np.float64).tolist()):
+        if not mass and not keep_zero:
+            continue
+        key = curItem(decode_set(code, frame))
+        res[key] = res[key] + mass if key in res else mass
+    return res
+
+
+def encode_batch(evs, frame=None, width=None, dtype=None):
+    """
+    Encodes several evidence distributions into padded two-dimensional arrays.
+
+    Args:
+        - evs (list): The evidence distributions.
+        - frame (sequence, optional): The common frame. Defaults to `frame_of(*evs)`.
+        - width (int, optional): The number of columns. Defaults to the largest number of focal elements.
+        - dtype (dtype, optional): The floating type of the masses. Defaults to the storage type of the
+                                   precision policy, float64 unless changed with `set_precision`.
+
+    Returns:
+        tuple: (frame, codes, masses) with codes a uint64 array and masses an array of shape
+               (len(evs), width). Unused cells hold code 0 with mass 0 and are ignored when decoding.
+    """
+    frame = tuple(frame) if frame is not None else frame_of(*evs)
+    index = frame_index(frame)
+    width = width if width is not None else max([len(ev) for ev in evs] + [1])
+    codes = np.zeros((len(evs), width), dtype=np.uint64)
+    masses = np.zeros((len(evs), width), dtype=dtype or storage_dtype())
+    for row, ev in enumerate(evs):
+        if len(ev) > width:
+            raise ValueError('Evidence %d has %d focal elements, more than the width %d' % (row, len(ev), width))
+        codes[row, :len(ev)] = [encode_set(key.value, index) for key in ev]
+        masses[row, :len(ev)] = list(ev.values())
+    return frame, codes, masses
+
+
+def decode_batch(frame, codes, masses, curItem=Element):
+    """
+    Decodes padded two-dimensional arrays into a list of evidence distributions.
+
+    Args:
+        - frame (sequence): The atoms of the frame.
+        - codes (array): The bitmasks, one row per evidence.
+        - masses (array): The masses, one row per evidence.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        list: One Evidence per row.
+    """
+    return [decode_evidence(frame, row_codes, row_masses, curItem) for row_codes, row_masses in zip(codes, masses)]
+
+
+def encode_orders(ev, frame=None):
+    """
+    Encodes an evidence distribution over ordered events (tuples) as padded arrays of atom indices.
+
+    Args:
+        - ev (Evidence): An evidence distribution whose focal elements hold tuples, as in `permutation_set`.
+        - frame (sequence, optional): The atoms of the frame. Defaults to `frame_of(ev)`.
+
+    Returns:
+        tuple: (frame, orders, masses), where orders is an int16 array of shape (len(ev), len(frame))
+               holding the atom indices of every event in order, padded with -1.
+    """
+    frame = tuple(frame) if frame is not None else frame_of(ev)
+    index = {atom: i for i, atom in enumerate(frame)}
+    orders = np.full((len(ev), len(frame)), -1, dtype=np.int16)
+    for row, key in enumerate(ev):
+        orders[row, :len(key.value)] = [index[atom] for atom in key.value]
+    masses = np.fromiter(ev.values(), dtype=np.float64, count=len(ev))
+    return frame, orders, masses
+
+
+def decode_orders(frame, orders, masses, curItem=Element, keep_zero=False):
+    """
+    Decodes padded arrays of atom indices into an evidence distribution over ordered events.
+
+    Args:
+        - frame (sequence): The atoms of the frame.
+        - orders (array): The atom indices of every event, padded with -1.
+        - masses (array): The masses of the events.
+        - curItem (callable, optional): A callable that takes a tuple and returns an instance of Item.
+                                      Defaults to the Element class.
+        - keep_zero (bool, optional): Whether entries with zero mass are kept. Defaults to False, so that
+                                      the padding of batches is skipped.
+
+    Returns:
+        Evidence: The decoded evidence. Masses of repeated events are summed.
+    """
+    res = Evidence()
+    for order, mass in zip(np.asarray(orders).tolist(), np.asarray(masses, dtype=np.float64).tolist()):
+        if not mass and not keep_zero:
+            continue
+        key = curItem(tuple(frame[i] for i in order if i >= 0))
+        res[key] = res[key] + mass if key in res else mass
+    return res
+
+
+def orders_to_codes(orders):
+    """
+    Computes the member bitmask of ordered events, forgetting the order.
+
+    Args:
+        - orders (array): Atom indices padded with -1, with events along the last axis.
+
+    Returns:
+        array: A uint64 array of bitmasks with one dimension less than `orders`.
+    """
+    orders = np.asarray(orders)
+    bits = np.where(orders >= 0, np.left_shift(np.uint64(1), np.maximum(orders, 0).astype(np.uint64)),
+                    np.uint64(0))
+    return np.bitwise_or.reduce(bits, axis=-1)
+
+
+def popcount(codes):
+    """
+    Counts the set bits of every bitmask, i.e. the cardinality of every encoded set.
+
+    Args:
+        - codes (array): Bitmasks of any unsigned integer type.
+
+    Returns:
+        array: An integer array of the same shape holding the cardinalities.
+    """
+    codes = np.asarray(codes, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(codes).astype(np.int64)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+    res = np.zeros(codes.shape, dtype=np.int64)
+    for shift in range(0, 64, 8):
+        res += table[(codes >> np.uint64(shift)) & np.uint64(0xFF)]
+    return res
@@ -0,0 +1,281 @@
+import functools
+
+from dstz.core.atom import Element
+from dstz.core.lazy import lazy_import
+from dstz.element.encoding import decode_evidence, encode_evidence, frame_index, frame_of, sort_frame
+
+np = lazy_import('numpy')
+
+# The number of extension maps kept by `extension`, the least recently used being dropped first. A map holds
+# 256 uint64 entries per byte of the source bitmask, see `FrameMap.nbytes`.
+EXTENSION_CACHE_SIZE = 128
+
+
+def _full(size):
+    # The bitmask of a whole frame of `size` atoms.
+    return np.uint64((1 << size) - 1)
+
+
+class FrameMap(object):
+    """
+    A mapping of the subsets of a source frame to subsets of a target frame, applied to bitmasks.
+
+    Attributes:
+        - source (tuple): The atoms of the source frame.
+        - target (tuple): The atoms of the target frame.
+        - fill (int): A bitmask of the target frame added to every non-empty image.
+        - inner (bool): Whether the map is the inner (dual) form, see `__init__`.
+        - nbytes (int): The size of the lookup tables.
+
+    Methods:
+        - map_codes(codes): Maps an array of source bitmasks to target bitmasks.
+        - map_evidence(ev, curItem=Element): Maps an evidence over the source frame to the target frame.
+        - map_batch(codes, masses): Maps a padded batch of encoded evidences.
+
+    Description:
+        The map is given by the image of every source atom, and a set is mapped to the union of the images
+        of its atoms. The images are precomputed into one lookup table of 256 entries per byte of the
+        source bitmask, so mapping a batch is a handful of vectorized gathers and ORs.
+    """
+
+    def __init__(self, source, target, images, fill=0, inner=False):
+        """
+        Initializes a frame map.
+
+        Args:
+            - source (sequence): The atoms of the source frame.
+            - target (sequence): The atoms of the target frame.
+            - images (sequence): The target bitmask of every source atom.
+            - fill (int, optional): A target bitmask added to the image of every non-empty set. Defaults to 0.
+            - inner (bool, optional): Whether to map a set B to the complement of the image of the complement
+                                      of B, i.e. to the largest set whose preimage is inside B. Defaults to False.
+        """
+        self.source = tuple(source)
+        self.target = tuple(target)
+        frame_index(self.source)
+        frame_index(self.target)
+        self.fill = int(fill)
+        self.inner = inner
+        images = np.asarray(images, dtype=np.uint64)
+        images = np.concatenate([images, np.zeros(-len(images) % 8, dtype=np.uint64)]).reshape(-1, 8)
+        bits = ((np.arange(256)[:, None] >> np.arange(8)) & 1).astype(bool)
+        self._tables = np.zeros((len(images), 256), dtype=np.uint64)
+        for k, row in enumerate(images):
+            self._tables[k] = np.bitwise_or.reduce(np.where(bits, row, np.uint64(0)), axis=1)
+
+    @property
+    def nbytes(self):
+        return int(self._tables.nbytes)
+
+    def _union_image(self, codes):
+        res = np.zeros(codes.shape, dtype=np.uint64)
+        for k, table in enumerate(self._tables):
+            res |= table[((codes >> np.uint64(8 * k)) & np.uint64(0xFF)).astype(np.intp)]
+        return res
+
+    def map_codes(self, codes):
+        """
+        Maps source bitmasks to target bitmasks.
+
+        Args:
+            - codes (array): Bitmasks over the source frame, of any shape.
+
+        Returns:
+            numpy.ndarray: The target bitmasks, with the same shape. The empty set maps to the empty set.
+        """
+        codes = np.asarray(codes, dtype=np.uint64)
+        if self.inner:
+            full_source, full_target = _full(len(self.source)), _full(len(self.target))
+            res = full_target & ~self._union_image(full_source & ~codes)
+        else:
+            res = self._union_image(codes)
+        if self.fill:
+            res = np.where(codes != 0, res | np.uint64(self.fill), res)
+        return res
+
+    def map_evidence(self, ev, curItem=Element):
+        """
+        Maps an evidence distribution over the source frame to the target frame.
+
+        Args:
+            - ev (Evidence): The evidence, whose atoms must belong to the source frame.
+            - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                          Defaults to the Element class.
+
+        Returns:
+            Evidence: The mapped evidence; the masses of sets with the same image are summed.
+        """
+        _, codes, masses = encode_evidence(ev, self.source)
+        return decode_evidence(self.target, self.map_codes(codes), masses, curItem, keep_zero=True)
+
+    def map_batch(self, codes, masses):
+        """
+        Maps a padded batch of encoded evidences, as returned by `encode_batch`.
+
+        Args:
+            - codes (array): The source bitmasks, one row per evidence.
+            - masses (array): The masses, one row per evidence.
+
+        Returns:
+            tuple: (codes, masses) over the target frame. Padding stays code 0 with mass 0; equal images in
+                   a row are not merged, which `decode_batch` or `group_sum` does.
+        """
+        return self.map_codes(codes), masses
+
+
+class Refinement(object):
+    """
+    A refinement of a coarse frame into a fine frame, where every coarse atom splits into fine atoms.
+
+    Attributes:
+        - coarse (tuple): The atoms of the coarse frame.
+        - fine (tuple): The atoms of the fine frame.
+        - mapping (dict): The fine atoms of every coarse atom.
+
+    Methods:
+        - refine(ev, curItem=Element): Maps an evidence over the coarse frame to the fine frame.
+        - coarsen(ev, inner=False, curItem=Element): Maps an evidence over the fine frame to the coarse frame.
+
+    Example Usage:
+        >>> ref = Refinement({'vehicle': ['car', 'truck'], 'person': ['adult', 'child']})
+        >>> ref.refine(Evidence({Element({'vehicle'}): 1.0}))
+        {{'car', 'truck'}: 1.0}
+    """
+
+    def __init__(self, mapping):
+        """
+        Initializes a refinement.
+
+        Args:
+            - mapping (dict): Maps every coarse atom to a non-empty iterable of fine atoms. The fine atoms of
+                              different coarse atoms must be disjoint.
+
+        Raises:
+            ValueError: If a coarse atom has no fine atom or a fine atom belongs to several coarse atoms.
+        """
+        self.mapping = {atom: set(children) for atom, children in mapping.items()}
+        self.coarse = sort_frame(self.mapping)
+        self.fine = sort_frame(child for children in self.mapping.values() for child in children)
+        if sum(len(children) for children in self.mapping.values()) != len(self.fine):
+            raise ValueError('The fine atoms of different coarse atoms must be disjoint')
+        if not all(self.mapping.values()):
+            raise ValueError('Every coarse atom must have at least one fine atom')
+        fine_index = frame_index(self.fine)
+        coarse_index = frame_index(self.coarse)
+        parents = {child: atom for atom, children in self.mapping.items() for child in children}
+        self._refine = FrameMap(self.coarse, self.fine,
+                                [sum(1 << fine_index[child] for child in self.mapping[atom]) for atom in self.coarse])
+        coarse_bits = [1 << coarse_index[parents[child]] for child in self.fine]
+        self._outer = FrameMap(self.fine, self.coarse, coarse_bits)
+        self._inner = FrameMap(self.fine, self.coarse, coarse_bits, inner=True)
+
+    def refine(self, ev, curItem=Element):
+        """
+        Maps an evidence over the coarse frame to the fine frame.
+
+        Args:
+            - ev (Evidence): The evidence over the coarse frame.
+            - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                          Defaults to the Element class.
+
+        Returns:
+            Evidence: The evidence where every focal set is replaced by the union of the fine atoms of its atoms.
+        """
+        return self._refine.map_evidence(ev, curItem)
+
+    def coarsen(self, ev, inner=False, curItem=Element):
+        """
+        Maps an evidence over the fine frame to the coarse frame.
+
+        Args:
+            - ev (Evidence): The evidence over the fine frame.
+            - inner (bool, optional): Whether to use the inner reduction, keeping the coarse atoms whose fine
+                                      atoms all belong to the focal set, instead of the outer reduction,
+                                      keeping those with at least one. Defaults to False.
+            - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                          Defaults to the Element class.
+
+        Returns:
+            Evidence: The coarsened evidence. The outer reduction preserves plausibilities of coarse sets,
+                      the inner one their beliefs; with the inner reduction, mass may go to the empty set.
+        """
+        return (self._inner if inner else self._outer).map_evidence(ev, curItem)
+
+
+def extension(source, target):
+    """
+    Builds the vacuous extension map from a frame to a larger frame, or returns the one built before.
+
+    Args:
+        - source (sequence): The atoms of the source frame.
+        - target (sequence): The atoms of the target frame, which must contain the source frame.
+
+    Returns:
+        FrameMap: The map sending a non-empty set A to A together with all the atoms of the target frame
+                  that the source frame does not know about.
+
+    Raises:
+        ValueError: If an atom of the source frame is missing from the target frame.
+
+    Description:
+        The last `EXTENSION_CACHE_SIZE` maps are kept by (source, target), whether or not the global cache
+        of `dstz.core.cache` is enabled, so that repeated `vacuous_extension` and `align` calls between the
+        same frames build the tables once.
+    """
+    return _extension(tuple(source), tuple(target))
+
+
+@functools.lru_cache(maxsize=EXTENSION_CACHE_SIZE)
+def _extension(source, target):
+    index = frame_index(target)
+    missing = [atom for atom in source if atom not in index]
+    if missing:
+        raise ValueError('Atoms %r are missing from the target frame' % (missing,))
+    images = [1 << index[atom] for atom in source]
+    fill = ((1 << len(target)) - 1) & ~sum(images)
+    return FrameMap(source, target, images, fill)
+
+
+def vacuous_extension(ev, frame, source=None, curItem=Element):
+    """
+    Extends an evidence to a larger frame without adding information.
+
+    Args:
+        - ev (Evidence): The evidence.
+        - frame (sequence): The target frame.
+        - source (sequence, optional): The frame the evidence was stated on. Defaults to `frame_of(ev)`,
+                                       which misses the atoms that carry no mass.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        Evidence: The evidence over `frame`, where a source that cannot tell the new atoms apart from each
+                  other nor exclude them keeps them in every focal set.
+
+    Example Usage:
+        >>> vacuous_extension(Evidence({Element({'a'}): 0.7, Element({'a', 'b'}): 0.3}), ['a', 'b', 'c'])
+        {{'a', 'c'}: 0.7, {'a', 'b', 'c'}: 0.3}
+    """
+    source = sort_frame(source) if source is not None else frame_of(ev)
+    return extension(source, sort_frame(frame)).map_evidence(ev, curItem)
+
+
+def align(evs, frames=None, curItem=Element):
+    """
+    Brings several evidences over different frames to their common frame by vacuous extension.
+
+    Args:
+        - evs (list): The evidences.
+        - frames (list, optional): The frame every evidence was stated on. Defaults to the atoms of each one.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        tuple: (frame, evs), the union of the frames and the extended evidences. Evidences already stated
+               on the whole common frame are returned unchanged.
+    """
+    frames = [sort_frame(frame) for frame in frames] if frames is not None else [frame_of(ev) for ev in evs]
+    common = sort_frame(atom for frame in frames for atom in frame)
+    aligned = [ev if frame == common else vacuous_extension(ev, common, frame, curItem)
+               for ev, frame in zip(evs, frames)]
+    return common, aligned
@@ -0,0 +1,231 @@
+import math
+
+from dstz.core.lazy import lazy_import
+from dstz.core.precision import storage_dtype
+from dstz.element.encoding import decode_batch, decode_orders, orders_to_codes, popcount, MAX_FRAME_SIZE
+
+np = lazy_import('numpy')
+
+STRUCTURES = ('general', 'bayesian', 'consonant')
+
+# Frames up to this size draw subsets from a table of all bitmasks grouped by cardinality.
+TABLE_FRAME_SIZE = 20
+
+_subset_tables = {}
+
+
+def _event_count(n, ordered, probs=None):
+    # The number of distinct events of cardinality 1..n, only counting cardinalities of non-zero probability.
+    total = 0
+    for k in range(1, n + 1):
+        if probs is not None and not probs[k - 1] > 0:
+            continue
+        arrangements = math.factorial(n) // math.factorial(n - k)
+        total += arrangements if ordered else arrangements // math.factorial(k)
+    return total
+
+
+def _cardinality_probs(n, cardinality):
+    """
+    Builds the probability of every event cardinality 1..n.
+
+    Args:
+        - n (int): The size of the frame.
+        - cardinality (None, float or sequence): None for uniform cardinalities, a float p for a
+                                                 Binomial(n, p) conditioned on being non-zero, or n weights.
+
+    Returns:
+        array: The normalized probabilities of cardinalities 1..n.
+
+    Raises:
+        ValueError: If p is not in (0, 1], or the weights are not n non-negative numbers with a positive sum.
+    """
+    if cardinality is None:
+        probs = np.ones(n)
+    elif np.isscalar(cardinality):
+        p = float(cardinality)
+        if not 0 < p <= 1:
+            raise ValueError('The Binomial parameter must be in (0, 1], got %r' % (cardinality,))
+        # Python floats give 0.0 ** 0 == 1.0, so p = 1 puts all the probability on the full frame.
+        probs = np.array([math.exp(math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)) *
+                          p ** k * (1.0 - p) ** (n - k) for k in range(1, n + 1)])
+    else:
+        probs = np.asarray(cardinality, dtype=np.float64)
+        if probs.shape != (n,):
+            raise ValueError('Expected %d cardinality weights, got %d' % (n, probs.size))
+        if (probs < 0).any() or not probs.sum() > 0:
+            raise ValueError('Cardinality weights must be non-negative with a positive sum')
+    return probs / probs.sum()
+
+
+def _random_orders(rng, shape, n, sizes):
+    # Random permutations of the frame truncated to `sizes`, padded with -1.
+    perm = np.argsort(rng.random(shape + (n,)), axis=-1).astype(np.int16)
+    perm[np.arange(n) >= sizes[..., None]] = -1
+    return perm
+
+
+def _subset_table(n):
+    # All non-empty bitmasks over n atoms sorted by cardinality, with the offset of every cardinality.
+    if n not in _subset_tables:
+        codes = np.arange(1, 2 ** n, dtype=np.uint64)
+        sizes = popcount(codes)
+        order = np.argsort(sizes, kind='stable')
+        offsets = np.searchsorted(sizes[order], np.arange(1, n + 2))
+        _subset_tables[n] = (codes[order], offsets)
+    return _subset_tables[n]
+
+
+def _draw_events(rng, shape, n, probs, ordered):
+    # Draws random events whose cardinalities follow `probs`: bitmasks, or orders padded with -1.
+    sizes = rng.choice(np.arange(1, n + 1), size=shape, p=probs)
+    if ordered or n > TABLE_FRAME_SIZE:
+        orders = _random_orders(rng, shape, n, sizes)
+        return orders if ordered else orders_to_codes(orders)
+    table, offsets = _subset_table(n)
+    start, stop = offsets[sizes - 1], offsets[sizes]
+    return table[start + (rng.random(shape) * (stop - start)).astype(np.int64)]
+
+
+def _order_keys(orders, n):
+    # Encodes every ordered event as one integer so that duplicates can be found with sorting. The
+    # arithmetic wraps around for large frames; a collision then only causes a needless redraw.
+    weights = np.uint64(n + 1) ** np.arange(n, dtype=np.uint64)
+    return ((orders.astype(np.int64) + 1).astype(np.uint64) * weights).sum(axis=-1, dtype=np.uint64)
+
+
+def _duplicates(keys):
+    # Flags every entry of a row that repeats an earlier entry of the same row.
+    order = np.argsort(keys, axis=1, kind='stable')
+    sorted_keys = np.take_along_axis(keys, order, axis=1)
+    dup_sorted = np.zeros(keys.shape, dtype=bool)
+    dup_sorted[:, 1:] = sorted_keys[:, 1:] == sorted_keys[:, :-1]
+    dup = np.zeros(keys.shape, dtype=bool)
+    np.put_along_axis(dup, order, dup_sorted, axis=1)
+    return dup
+
+
+def random_bba(batch, n, focal, structure='general', ordered=False, cardinality=None, alpha=1.0,
+               seed=None, dtype=None):
+    """
+    Generates a batch of random basic belief assignments directly in array form.
+
+    Args:
+        - batch (int): The number of BBAs.
+        - n (int): The size of the frame of discernment.
+        - focal (int): The number of focal elements of every BBA.
+        - structure (str, optional): 'general' for arbitrary focal elements, 'bayesian' for singletons only,
+                                     or 'consonant' for nested focal elements. Defaults to 'general'.
+        - ordered (bool, optional): Whether events are permutations (as in `permutation_set`) instead of
+                                    subsets (as in `powerset`). Consonant ordered events are nested prefixes.
+                                    Defaults to False.
+        - cardinality (None, float or sequence, optional): The distribution of event cardinalities for the
+                                     'general' structure: None for uniform over 1..n, a float p for a
+                                     zero-truncated Binomial(n, p), or n weights. Defaults to None.
+        - alpha (float, optional): The concentration of the symmetric Dirichlet distribution of the masses.
+                                   Defaults to 1.0 (uniform on the simplex).
+        - seed (int or numpy.random.Generator, optional): The seed or generator. Defaults to None.
+        - dtype (dtype, optional): The floating type of the masses. Defaults to the storage type of the
+                                   precision policy, float64 unless changed with `set_precision`.
+
+    Returns:
+        tuple: (codes, masses) for unordered events, where codes is a uint64 array of bitmasks of shape
+               (batch, focal); or (orders, masses) for ordered events, where orders is an int16 array of
+               shape (batch, focal, n) holding atom indices padded with -1. Bit or index i refers to the
+               i-th atom of the frame. Within a row, focal elements are distinct; repeated draws are
+               redrawn, which slightly lowers the share of cardinalities that have few possible events.
+
+    Raises:
+        ValueError: If the structure is unknown, the cardinality distribution is invalid, or more focal
+                    elements are requested than the structure and the cardinalities of non-zero probability allow.
+
+    Example Usage:
+        >>> codes, masses = random_bba(1000, 5, 4, seed=0)
+        >>> orders, masses = random_bba(1000, 5, 4, ordered=True, seed=0)
+    """
+    if structure not in STRUCTURES:
+        raise ValueError('Unknown structure %r, expected one of %s' % (structure, ', '.join(STRUCTURES)))
+    if n > MAX_FRAME_SIZE:
+        raise ValueError('A frame of %d atoms does not fit in a %d-bit mask' % (n, MAX_FRAME_SIZE))
+    probs = _cardinality_probs(n, cardinality) if structure == 'general' else None
+    limit = {'general': _event_count(n, ordered, probs), 'bayesian': n, 'consonant': n}[structure]
+    if focal > limit:
+        raise ValueError('At most %d focal elements are possible for a %s BBA over %d atoms'
+                         % (limit, structure, n))
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+    if structure == 'general':
+        events = _draw_events(rng, (batch, focal), n, probs, ordered)
+        dup = _duplicates(_order_keys(events, n) if ordered else events)
+        while dup.any():
+            # Redraw repeated events, only looking again at the rows that had any.
+            rows = np.flatnonzero(dup.any(axis=1))
+            sub, sub_dup = events[rows], dup[rows]
+            sub[sub_dup] = _draw_events(rng, (int(sub_dup.sum()),), n, probs, ordered)
+            events[rows] = sub
+            dup = np.zeros(dup.shape, dtype=bool)
+            dup[rows] = _duplicates(_order_keys(sub, n) if ordered else sub)
+    else:
+        perm = np.argsort(rng.random((batch, n)), axis=-1).astype(np.int16)
+        if structure == 'bayesian':
+            orders = np.full((batch, focal, n), -1, dtype=np.int16)
+            orders[:, :, 0] = perm[:, :focal]
+        else:
+            # Nested events are the prefixes of one permutation, of `focal` distinct increasing lengths.
+            sizes = np.sort(np.argsort(rng.random((batch, n)), axis=-1)[:, :focal] + 1, axis=-1)
+            orders = np.repeat(perm[:, None, :], focal, axis=1)
+            orders[np.arange(n) >= sizes[..., None]] = -1
+        events = orders if ordered else orders_to_codes(orders)
+
+    masses = rng.gamma(alpha, 1.0, size=(batch, focal))
+    masses /= masses.sum(axis=1, keepdims=True)
+    masses = masses.astype(dtype or storage_dtype(), copy=False)
+    return events, masses
+
+
+def iter_random_bba(total, chunk_size, n, focal, seed=None, **kwargs):
+    """
+    Streams random basic belief assignments in chunks of bounded size.
+
+    Args:
+        - total (int): The total number of BBAs to generate.
+        - chunk_size (int): The maximum number of BBAs per chunk.
+        - n (int): The size of the frame of discernment.
+        - focal (int): The number of focal elements of every BBA.
+        - seed (int, optional): The seed. The stream is reproducible for a given seed and chunk size.
+        - \\*\\*kwargs: The remaining options of `random_bba`.
+
+    Yields:
+        tuple: The (codes, masses) or (orders, masses) arrays of one chunk.
+
+    Example Usage:
+        >>> for codes, masses in iter_random_bba(10 ** 6, 10 ** 5, 8, 6, seed=0):
+        ...     pass
+    """
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < total:
+        size = min(chunk_size, total - done)
+        yield random_bba(size, n, focal, seed=rng, **kwargs)
+        done += size
+
+
+def random_evidences(count, frame, focal, seed=None, **kwargs):
+    """
+    Generates random BBAs as Evidence instances over a given frame.
+
+    Args:
+        - count (int): The number of evidences.
+        - frame (sequence): The atoms of the frame, e.g. `sorted(simple_space(n), key=str)`.
+        - focal (int): The number of focal elements of every evidence.
+        - seed (int, optional): The seed. Defaults to None.
+        - \\*\\*kwargs: The remaining options of `random_bba`.
+
+    Returns:
+        list: A list of Evidence instances whose focal elements are sets, or tuples when `ordered=True`.
+    """
+    frame = tuple(frame)
+    arrays, masses = random_bba(count, len(frame), focal, seed=seed, **kwargs)
+    if kwargs.get('ordered'):
+        return [decode_orders(frame, orders, row) for orders, row in zip(arrays, masses)]
+    return decode_batch(frame, arrays, masses)
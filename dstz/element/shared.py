@@ -0,0 +1,320 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import available, lazy_import
+from dstz.element.encoding import encode_batch
+
+np = lazy_import('numpy')
+shared_memory = lazy_import('multiprocessing.shared_memory')
+
+# Number of chunks every worker gets by default, so that uneven chunks still balance out.
+CHUNKS_PER_PROCESS = 4
+
+
+class SharedArray(object):
+    """
+    A NumPy array stored in a named `multiprocessing.shared_memory` block.
+
+    Attributes:
+        - name (str): The name of the block, by which other processes attach to it.
+        - shape (tuple): The shape of the array.
+        - dtype (numpy.dtype): The type of the array.
+        - array (numpy.ndarray): The array itself, a view of the block; None once closed.
+
+    Methods:
+        - spec(): Returns the picklable (name, shape, dtype) triple describing the array.
+        - attach(spec): Opens an array created by another process.
+        - close(): Releases this process's view of the block.
+        - unlink(): Destroys the block, which the creating process must do once every process closed it.
+
+    Description:
+        Sending a spec to a worker costs a few bytes however large the array is, where sending the array
+        (or the Evidence dicts it encodes) would pickle all of it. Used as a context manager, an array
+        created by this process is closed and unlinked on exit, an attached one only closed.
+        Shared memory requires Python 3.8 or later.
+
+    Example Usage:
+        >>> with SharedArray.from_array(np.arange(10)) as shared:
+        ...     spec = shared.spec()  # send to a worker, which calls SharedArray.attach(spec)
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        """
+        Creates a zero-filled shared array, or attaches to an existing one.
+
+        Args:
+            - shape (tuple): The shape of the array.
+            - dtype (dtype): The type of the array.
+            - name (str, optional): The name of an existing block to attach to. Defaults to None (create one).
+
+        Raises:
+            ImportError: If shared memory is unavailable, i.e. before Python 3.8.
+        """
+        if not available('multiprocessing.shared_memory'):
+            raise ImportError('Shared memory arrays require Python 3.8 or later')
+        self.shape = tuple(int(size) for size in shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self._shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.name = self._shm.name
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        Copies an array into a new shared block.
+
+        Args:
+            - array (array): The array.
+
+        Returns:
+            SharedArray: The shared copy.
+        """
+        array = np.asarray(array)
+        res = cls(array.shape, array.dtype)
+        res.array[...] = array
+        return res
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Opens a shared array created by another process.
+
+        Args:
+            - spec (tuple): The (name, shape, dtype) triple returned by `spec()`.
+
+        Returns:
+            SharedArray: A view of the same memory; writes are seen by every process.
+        """
+        name, shape, dtype = spec
+        return cls(shape, dtype, name)
+
+    def spec(self):
+        """
+        Returns the picklable description of the array.
+
+        Returns:
+            tuple: (name, shape, dtype string).
+        """
+        return self.name, self.shape, self.dtype.str
+
+    def close(self):
+        """
+        Releases this process's view of the block. Arrays derived from `array` must not be used afterwards.
+        """
+        if self.array is not None:
+            self.array = None
+            self._shm.close()
+
+    def unlink(self):
+        """
+        Destroys the block once every process closed it.
+        """
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+    def __repr__(self):
+        return 'SharedArray(%r, shape=%r, dtype=%s)' % (self.name, self.shape, self.dtype)
+
+
+def share_batch(evs, frame=None, width=None):
+    """
+    Encodes several evidences into a padded batch held in shared memory.
+
+    Args:
+        - evs (list): The evidence distributions.
+        - frame (sequence, optional): The common frame. Defaults to `frame_of(*evs)`.
+        - width (int, optional): The number of columns. Defaults to the largest number of focal elements.
+
+    Returns:
+        tuple: (frame, codes, masses) as in `encode_batch`, with codes and masses SharedArray instances
+               that the caller closes and unlinks, e.g. with `with`.
+    """
+    frame, codes, masses = encode_batch(evs, frame, width)
+    return frame, SharedArray.from_array(codes), SharedArray.from_array(masses)
+
+
+def _split(inputs, workers, chunk_size):
+    # The common number of rows of the inputs and the row ranges of the tasks.
+    rows = {len(array.array if isinstance(array, SharedArray) else array) for array in inputs}
+    if len(rows) != 1:
+        raise ValueError('The inputs have different numbers of rows: %s' % sorted(rows))
+    rows = rows.pop()
+    chunk_size = chunk_size or max(-(-rows // (workers * CHUNKS_PER_PROCESS)), 1)
+    return rows, [(start, min(start + chunk_size, rows)) for start in range(0, rows, chunk_size)]
+
+
+def _local(inputs, outputs, rows):
+    # The inputs and outputs as arrays of this process, allocating the outputs given by their row shape.
+    arrays = [array.array if isinstance(array, SharedArray) else np.asarray(array) for array in inputs]
+    results = []
+    for out in outputs:
+        if isinstance(out, SharedArray):
+            out = out.array
+        elif not hasattr(out, 'shape'):
+            out = np.zeros((rows,) + tuple(out[0]), dtype=out[1])
+        results.append(out)
+    return arrays, results
+
+
+def _write(func, inputs, outputs, start, stop):
+    # Runs `func` on rows [start, stop) of the inputs and stores its results in the same rows of the outputs.
+    results = func(*[array[start:stop] for array in inputs])
+    if not isinstance(results, tuple):
+        results = (results,)
+    if len(results) != len(outputs):
+        raise ValueError('Expected %d results per chunk, got %d' % (len(outputs), len(results)))
+    for out, res in zip(outputs, results):
+        res = np.asarray(res)
+        if res.shape[1:] == out.shape[1:]:
+            out[start:stop] = res
+            continue
+        if res.ndim != out.ndim or any(got > size for got, size in zip(res.shape[1:], out.shape[1:])):
+            raise ValueError('A result of shape %r does not fit an output of shape %r' % (res.shape, out.shape))
+        out[start:stop] = 0
+        out[(slice(start, stop),) + tuple(slice(0, size) for size in res.shape[1:])] = res
+
+
+def _map_chunk(func, input_specs, output_specs, start, stop):
+    # The worker side of `map_rows`: attaches to the blocks by name and writes its rows in place.
+    inputs = [SharedArray.attach(spec) for spec in input_specs]
+    outputs = [SharedArray.attach(spec) for spec in output_specs]
+    try:
+        _write(func, [shared.array for shared in inputs], [shared.array for shared in outputs], start, stop)
+    finally:
+        for shared in inputs + outputs:
+            shared.close()
+    return stop - start
+
+
+@timed()
+def map_rows(func, inputs, outputs, processes=None, chunk_size=None):
+    """
+    Applies a row-wise array function in parallel worker processes that share its inputs and outputs.
+
+    Args:
+        - func (callable): A picklable function (a module-level function or a `functools.partial` of one)
+                           taking row slices of the inputs and returning an array, or a tuple of arrays,
+                           with the same number of rows, e.g. `dstz.evpiece.kernel.combine_rows`.
+        - inputs (list): The input arrays, or SharedArray instances, all with the same number of rows.
+        - outputs (list): For every result of `func`, either a SharedArray to write into in place or a
+                          (shape, dtype) pair giving the shape of one row, e.g. ((width,), 'float64').
+                          Results narrower than the output are padded with zeros, i.e. with code 0 and
+                          mass 0 in an encoded batch.
+        - processes (int, optional): The number of worker processes; 1 runs in this process without shared
+                                     memory. Defaults to `os.cpu_count()`.
+        - chunk_size (int, optional): The number of rows per task. Defaults to an even split into
+                                      `CHUNKS_PER_PROCESS` tasks per worker.
+
+    Returns:
+        list: The output arrays. Outputs given as SharedArray are returned as their (shared) `array`; the
+              others are copied out of shared memory, which is then released.
+
+    Raises:
+        ValueError: If the inputs do not have the same number of rows or a result does not fit its output.
+
+    Description:
+        Inputs are copied into shared memory once (SharedArray inputs not at all) and every task only
+        pickles `func`, the names of the blocks and its row range, so no Evidence, Element or array is
+        serialized. Workers attach to the blocks, run `func` on their slice and write the result back.
+
+    Example Usage:
+        >>> frame, codes1, masses1 = encode_batch(evs1, frame)
+        >>> frame, codes2, masses2 = encode_batch(evs2, frame)
+        >>> width = codes1.shape[1] * codes2.shape[1]
+        >>> codes, masses, conflict = map_rows(partial(combine_rows, normalize=True),
+        ...                                    [codes1, masses1, codes2, masses2],
+        ...                                    [((width,), 'uint64'), ((width,), 'float64'), ((), 'float64')])
+        >>> evs = decode_batch(frame, codes, masses)
+    """
+    processes = processes or os.cpu_count() or 1
+    rows, bounds = _split(inputs, processes, chunk_size)
+
+    if processes == 1 or len(bounds) <= 1:
+        arrays, results = _local(inputs, outputs, rows)
+        for start, stop in bounds:
+            _write(func, arrays, results, start, stop)
+        return results
+
+    created = []
+    try:
+        shared_inputs = []
+        for array in inputs:
+            if not isinstance(array, SharedArray):
+                array = SharedArray.from_array(array)
+                created.append(array)
+            shared_inputs.append(array)
+        shared_outputs = []
+        for out in outputs:
+            if not isinstance(out, SharedArray):
+                out = SharedArray((rows,) + tuple(out[0]), out[1])
+                created.append(out)
+            shared_outputs.append(out)
+        input_specs = [shared.spec() for shared in shared_inputs]
+        output_specs = [shared.spec() for shared in shared_outputs]
+        with ProcessPoolExecutor(min(processes, len(bounds))) as pool:
+            futures = [pool.submit(_map_chunk, func, input_specs, output_specs, start, stop)
+                       for start, stop in bounds]
+            done = sum(future.result() for future in futures)
+        if enabled():
+            count('element.shared.map_rows.rows', done)
+            count('element.shared.map_rows.tasks', len(bounds))
+        return [out.array.copy() if out in created else out.array for out in shared_outputs]
+    finally:
+        for shared in created:
+            shared.close()
+            shared.unlink()
+
+
+@timed()
+def map_threads(func, inputs, outputs, threads=None, chunk_size=None):
+    """
+    Applies a row-wise array function in a pool of threads.
+
+    Args:
+        - func (callable): A function taking row slices of the inputs and returning an array, or a tuple of
+                           arrays, with the same number of rows, as for `map_rows`.
+        - inputs (list): The input arrays, or SharedArray instances, all with the same number of rows.
+        - outputs (list): For every result of `func`, an array or a SharedArray to write into in place, or a
+                          (shape, dtype) pair giving the shape of one row. Narrower results are padded with zeros.
+        - threads (int, optional): The number of threads; 1 runs in the calling thread. Defaults to
+                                   `os.cpu_count()`.
+        - chunk_size (int, optional): The number of rows per task. Defaults to an even split into
+                                      `CHUNKS_PER_PROCESS` tasks per thread.
+
+    Returns:
+        list: The output arrays.
+
+    Raises:
+        ValueError: If the inputs do not have the same number of rows or a result does not fit its output.
+
+    Description:
+        Threads share the arrays, so nothing is copied or pickled, but they only run in parallel while
+        `func` is inside NumPy calls that release the GIL: element-wise operations, sorts and reductions
+        on numeric arrays do, Python loops over rows do not. The row-wise kernels of `dstz.evpiece.kernel`,
+        `dstz.math.matrix.transform` and `dstz.math.stat.measures` are written that way, so thread pools
+        suit servers that cannot fork worker processes. Every thread writes disjoint rows of the outputs.
+    """
+    threads = threads or os.cpu_count() or 1
+    rows, bounds = _split(inputs, threads, chunk_size)
+    arrays, results = _local(inputs, outputs, rows)
+    if threads == 1 or len(bounds) <= 1:
+        for start, stop in bounds:
+            _write(func, arrays, results, start, stop)
+        return results
+    with ThreadPoolExecutor(min(threads, len(bounds))) as pool:
+        for future in [pool.submit(_write, func, arrays, results, start, stop) for start, stop in bounds]:
+            future.result()
+    if enabled():
+        count('element.shared.map_threads.rows', rows)
+        count('element.shared.map_threads.tasks', len(bounds))
+    return results
@@ -0,0 +1,109 @@
+from dstz.core.atom import Element
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import lazy_import
+from dstz.element.encoding import decode_batch, encode_batch, encode_set, frame_index, frame_of
+from dstz.evpiece.kernel import condition_rows, utility_rows
+
+np = lazy_import('numpy')
+
+
+def _as_batch(evs):
+    single = not isinstance(evs, (list, tuple))
+    return ([evs] if single else list(evs)), single
+
+
+@timed()
+def condition(evs, conditions, normalize=True, frame=None, curItem=Element):
+    """
+    Conditions one or many evidences on many sets at once.
+
+    Args:
+        - evs (Evidence or list): An evidence, or a list of evidences whose focal elements hold sets.
+        - conditions (list): The conditioning sets, as iterables of atoms.
+        - normalize (bool, optional): Whether to apply Dempster's conditioning, the same as `ds_rule` against
+                                      the categorical evidence of every set. Otherwise the mass that misses a
+                                      set stays on the empty set. Defaults to True.
+        - frame (sequence, optional): The common frame. Defaults to the atoms of the evidences followed by
+                                      the other atoms of the conditions.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        list: For a single evidence, one conditioned evidence per set; for a list, one such list per evidence.
+              Under total conflict a normalized result is empty.
+
+    Description:
+        All the evidences are encoded into one padded batch, intersected with every conditioning bitmask
+        in a single broadcast, and equal intersections are merged row by row, see `condition_rows`.
+    """
+    batch, single = _as_batch(evs)
+    if frame is None:
+        frame = frame_of(*batch)
+        known = set(frame)
+        frame += tuple(atom for atom in dict.fromkeys(atom for cond in conditions for atom in cond)
+                       if atom not in known)
+    frame, codes, masses = encode_batch(batch, frame)
+    index = frame_index(frame)
+    queries = np.array([encode_set(set(cond), index) for cond in conditions], dtype=np.uint64)
+    codes, masses, _ = condition_rows(codes, masses, queries, normalize)
+    if enabled():
+        count('evpiece.decision.conditions', len(batch) * len(queries))
+    res = [decode_batch(frame, row_codes, row_masses, curItem) for row_codes, row_masses in zip(codes, masses)]
+    return res[0] if single else res
+
+
+@timed()
+def expected_utility(evs, utility, frame, criterion='pignistic'):
+    """
+    Evaluates the expected utility of every action under one or many evidences.
+
+    Args:
+        - evs (Evidence or list): An evidence, or a list of evidences whose focal elements hold sets.
+        - utility (array): The (actions, atoms) utility matrix, with one column per atom of `frame`.
+        - frame (sequence): The atoms, in the order of the columns of `utility`.
+        - criterion (str, optional): 'lower', 'pignistic' or 'upper', see `utility_rows`. Defaults to 'pignistic'.
+
+    Returns:
+        numpy.ndarray: The utility of every action, with one row per evidence for a list.
+
+    Raises:
+        ValueError: If the number of columns does not match the frame, or the criterion is unknown.
+    """
+    batch, single = _as_batch(evs)
+    utility = np.asarray(utility, dtype=np.float64)
+    if utility.ndim != 2 or utility.shape[1] != len(frame):
+        raise ValueError('Expected a utility matrix with %d columns, got shape %s' % (len(frame), utility.shape))
+    _, codes, masses = encode_batch(batch, frame)
+    res = utility_rows(codes, masses, utility, criterion)
+    if enabled():
+        count('evpiece.decision.evaluations', res.size)
+    return res[0] if single else res
+
+
+def decide(evs, utility, frame, criterion='pignistic'):
+    """
+    Chooses the action of highest expected utility under one or many evidences.
+
+    Args:
+        - evs (Evidence or list): An evidence, or a list of evidences whose focal elements hold sets.
+        - utility (array): The (actions, atoms) utility matrix.
+        - frame (sequence): The atoms, in the order of the columns of `utility`.
+        - criterion (str, optional): 'lower', 'pignistic' or 'upper', see `utility_rows`. 'lower' is the
+                                     maximin choice, 'upper' the maximax one. Defaults to 'pignistic'.
+
+    Returns:
+        tuple: (actions, values), the index of the best action and its expected utility, as integers and
+               floats for a single evidence or as arrays with one entry per evidence. Ties go to the first
+               action.
+
+    Example Usage:
+        >>> ev = Evidence({Element({'a'}): 0.6, Element({'b', 'c'}): 0.4})
+        >>> decide(ev, [[1, 0, 0], [0, 1, 1]], 'abc', 'lower')
+        (0, 0.6)
+    """
+    values = expected_utility(evs, utility, frame, criterion)
+    actions = values.argmax(axis=-1)
+    best = np.take_along_axis(values, actions[..., None], axis=-1)[..., 0]
+    if values.ndim == 1:
+        return int(actions), float(best)
+    return actions, best
@@ -0,0 +1,307 @@
+import time
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import available, lazy_import
+from dstz.element.encoding import decode_evidence, decode_set, encode_set, frame_of, MAX_FRAME_SIZE
+from dstz.element.frame import align
+from dstz.element.generator import random_evidences
+from dstz.evpiece.kernel import as_evidence, combine_python, combine_sets
+from dstz.math.matrix.transform import transform_rule
+
+np = lazy_import('numpy')
+
+# Rules understood by `combine`, with the set operation applied to every pair of focal elements.
+RULES = {
+    'dempster': 'and',
+    'intersection': 'and',
+    'union': 'or',
+}
+
+ENGINES = ('dict', 'bitmask', 'sparse', 'dense')
+
+# Cost model in seconds, as (fixed, unit) pairs. The unit is a pair of focal elements for the pairwise
+# engines and an entry update (3 transforms of n * 2 ** n updates) for 'dense'. Except for 'dict', which
+# builds its items as it goes, every engine also pays 'decode' per distinct result turned into an item.
+# The defaults are typical of a desktop machine; `calibrate` refits them on the host machine.
+COSTS = {
+    'dict': (0.0, 1.2e-5),
+    'bitmask': (1e-5, 2e-7),
+    'sparse': (5e-5, 7e-8),
+    'dense': (1.5e-4, 2e-9),
+    'decode': (0.0, 7e-6),
+}
+
+# Shortest timing used by `calibrate`, so that a coarse clock reading 0 cannot make a fit infinite.
+MIN_SECONDS = 1e-9
+
+# Frames larger than this are never dispatched to the dense engine, whatever the cost model says. It is
+# tighter than the hard limit `dstz.math.matrix.transform.MAX_DENSE_FRAME` of the dense vectors themselves.
+DENSE_DISPATCH_FRAME = 20
+
+
+def _bitmask_engine(ev1, ev2, op, frame):
+    # Pairwise combination of Python integer bitmasks, which needs no NumPy and no frame size limit.
+    index = {atom: i for i, atom in enumerate(frame)}
+    codes1 = [(encode_set(key.value, index), mass) for key, mass in ev1.items()]
+    codes2 = [(encode_set(key.value, index), mass) for key, mass in ev2.items()]
+    res = {}
+    for code1, mass1 in codes1:
+        for code2, mass2 in codes2:
+            code = code1 & code2 if op == 'and' else code1 | code2
+            res[code] = res.get(code, 0.0) + mass1 * mass2
+    return res
+
+
+def _raw(engine, ev1, ev2, op, frame):
+    # The combined bitmasks and masses of one of the encoded engines, before any item is built.
+    if engine == 'bitmask':
+        return _bitmask_engine(ev1, ev2, op, frame)
+    if engine == 'sparse':
+        return combine_sets(ev1, ev2, op, frame)[1:]
+    return transform_rule(ev1, ev2, op, frame=frame)[1:]
+
+
+def _run(engine, ev1, ev2, op, frame, curItem):
+    if engine == 'dict':
+        return combine_python(ev1, ev2, op, curItem)
+    raw = _raw(engine, ev1, ev2, op, frame)
+    if engine == 'bitmask':
+        return Evidence((curItem(decode_set(code, frame)), mass) for code, mass in raw.items())
+    return decode_evidence(frame, raw[0], raw[1], curItem, keep_zero=engine == 'sparse')
+
+
+def statistics(ev1, ev2):
+    """
+    Collects the cheap statistics from which the engine is chosen.
+
+    Args:
+        - ev1 (Evidence): The first evidence distribution.
+        - ev2 (Evidence): The second evidence distribution.
+
+    Returns:
+        dict: The frame size 'n', the focal counts 'f1' and 'f2', the number of 'pairs', and the
+              'density', i.e. the share of the 2 ** n subsets that are focal in the larger evidence.
+    """
+    n = len(frame_of(ev1, ev2))
+    f1, f2 = len(ev1), len(ev2)
+    return {
+        'n': n,
+        'f1': f1,
+        'f2': f2,
+        'pairs': f1 * f2,
+        'density': max(f1, f2) / 2.0 ** n if n else 1.0,
+    }
+
+
+def _work(engine, stats):
+    # The number of cost units an engine spends on a combination.
+    if engine == 'dense':
+        return 3 * stats['n'] * 2 ** stats['n']
+    if engine == 'decode':
+        return min(stats['pairs'], 2 ** stats['n'])
+    return stats['pairs']
+
+
+def estimate(engine, stats):
+    """
+    Estimates the time an engine takes to combine evidences with the given statistics.
+
+    Args:
+        - engine (str): One of `ENGINES`.
+        - stats (dict): The statistics returned by `statistics`.
+
+    Returns:
+        float: The estimated seconds under the cost model `COSTS`, including the decoding of the results.
+    """
+    fixed, unit = COSTS[engine]
+    cost = fixed + unit * _work(engine, stats)
+    if engine != 'dict':
+        cost += COSTS['decode'][1] * _work('decode', stats)
+    return cost
+
+
+def feasible(engine, stats):
+    """
+    Tells whether an engine can combine evidences with the given statistics in this environment.
+
+    Args:
+        - engine (str): One of `ENGINES`.
+        - stats (dict): The statistics returned by `statistics`.
+
+    Returns:
+        bool: False for the NumPy engines when NumPy is missing, for 'sparse' beyond `MAX_FRAME_SIZE`
+              atoms and for 'dense' beyond `DENSE_DISPATCH_FRAME` atoms.
+    """
+    if engine in ('dict', 'bitmask'):
+        return True
+    if not available('numpy') or not stats['pairs']:
+        return False
+    limit = MAX_FRAME_SIZE if engine == 'sparse' else DENSE_DISPATCH_FRAME
+    return stats['n'] <= limit
+
+
+def explain(ev1, ev2, rule='dempster', engine=None):
+    """
+    Shows which engine `combine` would use and why, without combining.
+
+    Args:
+        - ev1 (Evidence): The first evidence distribution.
+        - ev2 (Evidence): The second evidence distribution.
+        - rule (str, optional): One of `RULES`. Defaults to 'dempster'.
+        - engine (str, optional): An engine forced by the caller. Defaults to None (choose by cost).
+
+    Returns:
+        dict: The chosen 'engine', the 'rule', the 'stats' of `statistics`, the estimated 'costs' in
+              seconds of every feasible engine, and 'forced', whether the caller chose the engine.
+
+    Raises:
+        ValueError: If the rule or the engine is unknown, or the forced engine is not feasible.
+
+    Example Usage:
+        >>> explain(ev1, ev2)['engine']
+        'sparse'
+    """
+    if rule not in RULES:
+        raise ValueError('Unknown rule %r, expected one of %s' % (rule, ', '.join(RULES)))
+    if engine is not None and engine not in ENGINES:
+        raise ValueError('Unknown engine %r, expected one of %s' % (engine, ', '.join(ENGINES)))
+    stats = statistics(ev1, ev2)
+    costs = {}
+    for name in ENGINES:
+        if feasible(name, stats):
+            costs[name] = estimate(name, stats)
+    if engine is not None and engine not in costs:
+        raise ValueError('Engine %r cannot combine these evidences (%s)' % (engine, stats))
+    return {
+        'engine': engine if engine is not None else min(costs, key=costs.get),
+        'rule': rule,
+        'stats': stats,
+        'costs': costs,
+        'forced': engine is not None,
+    }
+
+
+@timed()
+def combine(ev1, ev2, rule='dempster', engine=None, curItem=Element, frames=None):
+    """
+    Combines two evidence distributions with the engine best suited to their size and density.
+
+    Args:
+        - ev1 (Evidence): The first evidence distribution, whose focal elements hold sets.
+        - ev2 (Evidence): The second evidence distribution.
+        - rule (str, optional): 'dempster' for Dempster's rule, 'intersection' for the unnormalized
+                                intersection rule (`dstz.evpiece.dual.disjunctive_rule`) or 'union' for the
+                                union rule (`dstz.evpiece.dual.conjunctive_rule`). Defaults to 'dempster'.
+        - engine (str, optional): Forces 'dict' (dictionary loops), 'bitmask' (Python integer bitmasks),
+                                  'sparse' (NumPy pairwise kernel) or 'dense' (fast commonality or
+                                  implicability transforms). Defaults to None (choose by cost).
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+        - frames (tuple, optional): The frames ev1 and ev2 were stated on. When given, both evidences are
+                                    first vacuously extended to the union of the frames with `align`, so
+                                    that sources with different label sets can be combined. Defaults to None
+                                    (the evidences share a frame).
+
+    Returns:
+        Evidence: The combined evidence. All engines agree up to rounding; the dense engine drops
+                  masses that are rounding noise, whereas the pairwise engines keep every reached set.
+
+    Description:
+        The choice is made by `explain` from the frame size, the focal counts and the density, using the
+        cost model in `COSTS`. Dict and bitmask loops win for very sparse inputs, the NumPy kernel for
+        many focal elements, and the transforms for dense inputs over small frames. When instrumentation
+        is enabled, the chosen engine is counted under 'evpiece.dispatch.engine.<engine>'.
+
+    Example Usage:
+        >>> combine(ev1, ev2)
+        >>> combine(ev1, ev2, rule='union', engine='bitmask')
+    """
+    ev1, ev2 = as_evidence(ev1, curItem), as_evidence(ev2, curItem)
+    if frames is not None:
+        _, (ev1, ev2) = align([ev1, ev2], frames, curItem)
+    decision = explain(ev1, ev2, rule, engine)
+    if enabled():
+        count('evpiece.dispatch.engine.%s' % decision['engine'])
+    res = _run(decision['engine'], ev1, ev2, RULES[rule], frame_of(ev1, ev2), curItem)
+    if rule == 'dempster':
+        empty_mass = res.pop(curItem(set()), 0.0)
+        if empty_mass:
+            for key in res.keys():
+                res[key] = res[key] / (1 - empty_mass)
+    return res
+
+
+def _best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func()
+        best = min(best, time.perf_counter() - start)
+    return best, res
+
+
+def _fit(rows):
+    # Fits seconds = fixed + unit * work minimizing the relative error, with non-negative coefficients.
+    work, seconds = np.array(rows, dtype=np.float64).T
+    seconds = np.maximum(seconds, MIN_SECONDS)
+    design = np.stack([np.ones_like(work), work], axis=1) / seconds[:, None]
+    (fixed, unit), _, _, _ = np.linalg.lstsq(design, np.ones_like(work), rcond=None)
+    if fixed < 0:
+        fixed, unit = 0.0, float(np.median(seconds / work))
+    elif unit < 0:
+        fixed, unit = float(np.median(seconds)), 0.0
+    return float(fixed), float(unit)
+
+
+def calibrate(grid=None, repeat=3, seed=0, max_seconds=0.5, apply=True):
+    """
+    Refits the cost model of every engine by timing it on random evidences on this machine.
+
+    Args:
+        - grid (list, optional): (n, focal) pairs to time. Defaults to frames of 4 to 14 atoms with
+                                 4 to 256 focal elements.
+        - repeat (int, optional): The number of timings per case; the fastest is kept. Defaults to 3.
+        - seed (int, optional): The seed of the random evidences. Defaults to 0.
+        - max_seconds (float, optional): Cases that the current model expects to take longer than this
+                                         are skipped for that engine. Defaults to 0.5.
+        - apply (bool, optional): Whether to store the fitted costs in `COSTS`. Defaults to True.
+
+    Returns:
+        dict: The fitted (fixed, unit) costs of every engine and of decoding, in the format of `COSTS`.
+
+    Description:
+        Every feasible engine is timed on every case without building items, decoding is timed
+        separately, and a line is fitted through the (work, seconds) points of each, minimizing the
+        relative error so that small and large cases weigh alike. NumPy is required. Thresholds between
+        engines follow from the fitted model, so they can be inspected with `explain` afterwards.
+
+    Example Usage:
+        >>> calibrate()
+        {'dict': (...), 'bitmask': (...), 'sparse': (...), 'dense': (...), 'decode': (...)}
+    """
+    grid = grid or [(n, f) for n in (4, 6, 8, 10, 12, 14) for f in (4, 16, 64, 256) if f < 2 ** n]
+    points = {name: [] for name in ENGINES + ('decode',)}
+    for i, (n, focal) in enumerate(grid):
+        frame = tuple(range(n))
+        ev1, ev2 = random_evidences(2, frame, focal, seed=seed + i)
+        stats = statistics(ev1, ev2)
+        for name in ENGINES:
+            if not feasible(name, stats) or COSTS[name][0] + COSTS[name][1] * _work(name, stats) > max_seconds:
+                continue
+            if name == 'dict':
+                seconds, _ = _best_time(lambda: combine_python(ev1, ev2, 'and'), repeat)
+            else:
+                seconds, raw = _best_time(lambda: _raw(name, ev1, ev2, 'and', frame), repeat)
+            points[name].append((_work(name, stats), seconds))
+            if name == 'sparse':
+                seconds, _ = _best_time(lambda: decode_evidence(frame, raw[0], raw[1], keep_zero=True), repeat)
+                points['decode'].append((len(raw[0]), seconds))
+    costs = dict(COSTS)
+    for name, rows in points.items():
+        if len(rows) >= 2:
+            costs[name] = _fit(rows)
+    if apply:
+        COSTS.update(costs)
+    return costs
@@ -1,11 +1,74 @@
-import itertools
-
 from dstz.core.atom import Element
-from dstz.core.distribution import Evidence
+from dstz.core.cache import memoize_rule
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import available
+from dstz.core.structured import BayesianEvidence, ConsonantEvidence, contour, doubt, is_bayesian, STRUCTURES
+from dstz.element.encoding import frame_of
 from dstz.element.permutation import order_code_intersection
+from dstz.evpiece.kernel import pairwise_expanded, pairwise_orders, pairwise_sets
+
+
+def _count_combination(rule, ev1, ev2, res):
+    # Records the number of intersected pairs and of created focal elements of one combination.
+    count('evpiece.dual.%s.pairs' % rule, len(ev1) * len(ev2))
+    count('evpiece.dual.%s.focal_created' % rule, len(res))
+
+
+def _use_bayesian(ev1, ev2, structure):
+    """
+    Decides whether the Bayesian fast path applies to a combination by intersection.
+
+    Args:
+        - ev1 (Evidence): The first evidence.
+        - ev2 (Evidence): The second evidence.
+        - structure (str or None): A structural hint, one of `STRUCTURES`, or None to detect it.
+
+    Returns:
+        bool: True if one of the evidences is Bayesian. Detection stops at the first focal element that
+              is not a singleton, so it costs little next to the combination itself.
+    """
+    if structure is not None and structure not in STRUCTURES + ('general',):
+        raise ValueError('Unknown structure %r, expected one of %s' % (structure, ', '.join(STRUCTURES)))
+    if isinstance(ev1, BayesianEvidence) or isinstance(ev2, BayesianEvidence):
+        return True
+    if not available('numpy'):
+        return False
+    if structure is not None:
+        return structure == 'bayesian'
+    return is_bayesian(ev1) or is_bayesian(ev2)
+
+
+def _bayesian_product(ev1, ev2):
+    """
+    Intersects a Bayesian evidence with any other evidence.
 
+    Args:
+        - ev1 (Evidence): The first evidence. At least one of `ev1` and `ev2` must be Bayesian.
+        - ev2 (Evidence): The second evidence.
 
-def ds_rule(ev1, ev2, curItem=Element):
+    Returns:
+        tuple: (BayesianEvidence, conflict), where the vector holds p(x) * pl(x) over the Bayesian frame,
+               pl being the plausibility (contour function) of the other evidence, and conflict is the
+               mass of the pairs with an empty intersection.
+
+    Description:
+        A singleton {x} only meets the focal elements that contain x, so the unnormalized intersection
+        of a probability vector p with a mass function m is p(x) * pl(x) on every singleton. This costs
+        O(|Θ|) vector operations plus one pass over the other evidence, instead of O(|F1|·|F2|). The conflict
+        is the sum of p(x) times the mass of the focal elements that miss x, see `doubt`, so it is exactly 0
+        when no pair conflicts.
+    """
+    if not is_bayesian(ev1):
+        ev1, ev2 = ev2, ev1
+    if not isinstance(ev1, BayesianEvidence):
+        ev1 = BayesianEvidence.from_evidence(ev1)
+    probs = ev1.probs * contour(ev2, ev1.frame)
+    return BayesianEvidence(ev1.frame, probs), float(ev1.probs @ doubt(ev2, ev1.frame))
+
+
+@timed()
+@memoize_rule
+def ds_rule(ev1, ev2, curItem=Element, structure=None):
     """
     Applies the Dempster-Shafer rule of combination on two evidences.
 
@@ -19,33 +82,50 @@ def ds_rule(ev1, ev2, curItem=Element):
         - ev2 (Evidence): The second evidence as an instance of the Evidence class.
         - curItem (callable): A callable that takes a set and returns an instance of Item. It defines
                             how to create items from set intersections.
+        - structure (str, optional): A structural hint, 'bayesian', 'consonant' or 'general', that skips the
+                                     detection. Defaults to None (detect whether one evidence is Bayesian).
 
     Returns:
         Evidence: A new instance of Evidence that represents the combined evidence after applying
-                  the Dempster-Shafer rule of combination.
+                  the Dempster-Shafer rule of combination. When one of the inputs is a `BayesianEvidence`,
+                  the result is a `BayesianEvidence` as well, so that Bayesian sources stay compact.
 
     Notes:
         - The Dempster-Shafer rule of combination deals with conflicts between pieces of evidence
           by reducing the mass of the empty set and redistributing it among non-empty sets.
         - If there is a conflict (i.e., the mass of the empty set is not zero), the masses of all
           non-empty sets are adjusted proportionally to account for the conflict.
+        - If one evidence is Bayesian, the combination is the element-wise product of its probability
+          vector and the contour function of the other one, computed in O(|Θ|).
+        - `ConsonantEvidence` inputs are encoded from their contour functions without building sets. The
+          combination of two consonant evidences is generally not consonant, so the result is an Evidence;
+          see `contour_rule` for a combination that stays consonant.
 
     """
-    res = Evidence()
-    for key1, key2 in itertools.product(ev1.keys(), ev2.keys()):
-        key = curItem(key1.value.intersection(key2.value))
-        if key in res:
-            res[key] += ev1[key1] * ev2[key2]
-        else:
-            res[key] = ev1[key1] * ev2[key2]
-    empty_mass = res.pop(curItem(set()))
+    if _use_bayesian(ev1, ev2, structure):
+        res, empty_mass = _bayesian_product(ev1, ev2)
+        if empty_mass and res.probs.any():
+            res = BayesianEvidence(res.frame, res.probs / (1 - empty_mass))
+        if enabled():
+            _count_combination('ds_rule', ev1, ev2, res)
+            count('evpiece.dual.ds_rule.conflict_mass', empty_mass)
+        if isinstance(ev1, BayesianEvidence) or isinstance(ev2, BayesianEvidence):
+            return res
+        return res.to_evidence(curItem)
+    res = pairwise_sets(ev1, ev2, 'and', curItem)
+    empty_mass = res.pop(curItem(set()), 0.0)
     if empty_mass:
         for key in res.keys():
             res[key] = res[key] / (1 - empty_mass)
+    if enabled():
+        _count_combination('ds_rule', ev1, ev2, res)
+        count('evpiece.dual.ds_rule.conflict_mass', empty_mass)
     return res
 
 
-def disjunctive_rule(ev1, ev2, curItem=Element):
+@timed()
+@memoize_rule
+def disjunctive_rule(ev1, ev2, curItem=Element, structure=None):
     """
     Combines two evidence distributions using the disjunctive rule of combination.
 
@@ -54,6 +134,7 @@ def disjunctive_rule(ev1, ev2, curItem=Element):
         - ev2 (Evidence): The second evidence distribution as an instance of the Evidence class.
         - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
                                       Defaults to the Element class.
+        - structure (str, optional): A structural hint, as in `ds_rule`. Defaults to None.
 
     Returns:
         Evidence: A new evidence distribution representing the combination of ev1 and ev2 using the
@@ -63,17 +144,25 @@ def disjunctive_rule(ev1, ev2, curItem=Element):
         The disjunctive rule of combination is applied to merge two evidence distributions by
         considering only the intersection of the focal elements of each distribution. The resulting
         distribution assigns a mass to each possible intersection of focal elements from ev1 and ev2.
+        As in `ds_rule`, a Bayesian input reduces the combination to an element-wise product; the
+        conflict then goes to the empty set.
     """
-    res = Evidence()
-    for key1, key2 in itertools.product(ev1.keys(), ev2.keys()):
-        key = curItem(key1.value.intersection(key2.value))
-        if key in res:
-            res[key] += ev1[key1] * ev2[key2]
-        else:
-            res[key] = ev1[key1] * ev2[key2]
+    if _use_bayesian(ev1, ev2, structure):
+        product, empty_mass = _bayesian_product(ev1, ev2)
+        res = product.to_evidence(curItem)
+        if empty_mass:
+            res[curItem(set())] = empty_mass
+        if enabled():
+            _count_combination('disjunctive_rule', ev1, ev2, res)
+        return res
+    res = pairwise_sets(ev1, ev2, 'and', curItem)
+    if enabled():
+        _count_combination('disjunctive_rule', ev1, ev2, res)
     return res
 
 
+@timed()
+@memoize_rule
 def conjunctive_rule(ev1, ev2, curItem=Element):
     """
     Combines two evidence distributions using the conjunctive rule of combination.
@@ -93,16 +182,50 @@ def conjunctive_rule(ev1, ev2, curItem=Element):
         considering the union of the focal elements of each distribution. The resulting distribution
         assigns a mass to each possible union of focal elements from ev1 and ev2.
     """
-    res = Evidence()
-    for key1, key2 in itertools.product(ev1.keys(), ev2.keys()):
-        key = curItem(key1.value.union(key2.value))
-        if key in res:
-            res[key] += ev1[key1] * ev2[key2]
-        else:
-            res[key] = ev1[key1] * ev2[key2]
+    res = pairwise_sets(ev1, ev2, 'or', curItem)
+    if enabled():
+        _count_combination('conjunctive_rule', ev1, ev2, res)
     return res
 
 
+@timed()
+@memoize_rule
+def contour_rule(ev1, ev2):
+    """
+    Combines two evidence distributions through their contour functions, keeping the result consonant.
+
+    Args:
+        - ev1 (Evidence, ConsonantEvidence or BayesianEvidence): The first evidence distribution.
+        - ev2 (Evidence, ConsonantEvidence or BayesianEvidence): The second evidence distribution.
+
+    Returns:
+        ConsonantEvidence: The consonant evidence whose contour function is the product of the contour
+                           functions of ev1 and ev2, divided by its maximum.
+
+    Description:
+        For consonant evidences, the contour function of Dempster's combination is proportional to the
+        product of the input contour functions, but the combined masses are in general no longer nested.
+        This rule keeps the product of the contours as a possibility distribution, normalized so that
+        the most plausible atom has plausibility 1, which costs O(|Θ|) and ranks the singletons exactly
+        as `ds_rule` does. It is the usual way to fuse consonant sources repeatedly without the number
+        of focal elements growing.
+
+    Example Usage:
+        >>> ev1 = ConsonantEvidence(['a', 'b', 'c'], [1.0, 0.6, 0.2])
+        >>> ev2 = ConsonantEvidence(['a', 'b', 'c'], [0.5, 1.0, 0.4])
+        >>> contour_rule(ev1, ev2)
+    """
+    frame = frame_of(ev1, ev2)
+    product = contour(ev1, frame) * contour(ev2, frame)
+    peak = product.max() if len(frame) else 0.0
+    res = ConsonantEvidence(frame, product / peak if peak else product)
+    if enabled():
+        _count_combination('contour_rule', ev1, ev2, res)
+    return res
+
+
+@timed()
+@memoize_rule
 def rps_left_rule(ev1, ev2, curItem=Element):
     """
     Apply the Left-Rule of combination in the context of Relative Proof Strength (RPS) Theory to combine two pieces of evidence.
@@ -129,27 +252,14 @@ def rps_left_rule(ev1, ev2, curItem=Element):
         >>> print(combined_ev)
 
     """
-    res = Evidence()
-    for key1, key2 in itertools.product(ev1.keys(), ev2.keys()):
-        def left_intersection(a, b):
-            # Local function to compute the intersection, preserving duplicates from 'a'
-            res = list(a)
-            for i in set(a) - set(b).intersection(set(a)):
-                res.remove(i)
-            return tuple(res)
-
-        # Create a new key using the intersection of values from ev1 and ev2
-        key = curItem(left_intersection(key1.value, key2.value))
-
-        # Combine the probabilities for intersecting keys
-        if key in res:
-            res[key] += ev1[key1] * ev2[key2]
-        else:
-            res[key] = ev1[key1] * ev2[key2]
-
+    res = pairwise_orders(ev1, ev2, curItem)
+    if enabled():
+        _count_combination('rps_left_rule', ev1, ev2, res)
     return res
 
 
+@timed()
+@memoize_rule
 def wang_orthogonal_rule(ev1, ev2, curItem=Element):
     """
     Applies the Wang Orthogonal Rule, as introduced in the research paper: Wang, Y., Li, Z., & Deng, Y. (2024).
@@ -181,12 +291,7 @@ def wang_orthogonal_rule(ev1, ev2, curItem=Element):
         The method provides a sophisticated tool for handling evidence fusion in contexts where permutations carry meaningful
         information about the state space, aligning with the theoretical advancements proposed in the referenced publication.
     """
-    res = Evidence()
-    for key1, key2 in itertools.product(ev1.keys(), ev2.keys()):
-        cur_keys = [curItem(key) for key in order_code_intersection(key1.value, key2.value)]
-        for key in cur_keys:
-            if key in res:
-                res[key] += ev1[key1] * ev2[key2] / len(cur_keys)
-            else:
-                res[key] = ev1[key1] * ev2[key2] / len(cur_keys)
+    res = pairwise_expanded(ev1, ev2, order_code_intersection, curItem)
+    if enabled():
+        _count_combination('wang_orthogonal_rule', ev1, ev2, res)
     return res
@@ -0,0 +1,524 @@
+import functools
+import itertools
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.core.lazy import available, lazy_import
+from dstz.core.precision import accumulation_dtype, compensated, group_fsum, Accumulator
+from dstz.element.encoding import (decode_batch, decode_evidence, decode_orders, encode_batch, encode_evidence,
+                                   encode_orders, frame_of, orders_to_codes, MAX_FRAME_SIZE)
+from dstz.element.shared import map_threads
+from dstz.math.matrix.lattice import MAX_CELLS
+
+np = lazy_import('numpy')
+
+# Set operations understood by `combine_sets`, by name.
+SET_OPS = {
+    'and': 'bitwise_and',
+    'or': 'bitwise_or',
+}
+
+# Expected utility criteria of `utility_rows`, from the most pessimistic to the most optimistic.
+CRITERIA = ('lower', 'pignistic', 'upper')
+
+_PYTHON_SET_OPS = {
+    'and': lambda a, b: [a.intersection(b)],
+    'or': lambda a, b: [a.union(b)],
+}
+
+
+def product_kernel(codes1, masses1, codes2, masses2, op):
+    """
+    Forms the outer product of two encoded evidences.
+
+    Args:
+        - codes1 (array): The codes of the first evidence, with focal elements along the last axis.
+        - masses1 (array): The masses of the first evidence, with the same shape as `codes1`.
+        - codes2 (array): The codes of the second evidence. Leading (batch) axes must broadcast with `codes1`.
+        - masses2 (array): The masses of the second evidence.
+        - op (callable): A binary NumPy function combining codes, e.g. `np.bitwise_and`.
+
+    Returns:
+        tuple: (codes, masses) of shape (..., F1 * F2), where entry i * F2 + j combines the i-th focal
+               element of the first evidence with the j-th of the second.
+    """
+    codes = op(codes1[..., :, None], codes2[..., None, :])
+    masses = masses1[..., :, None] * masses2[..., None, :]
+    return codes.reshape(codes.shape[:-2] + (-1,)), masses.reshape(masses.shape[:-2] + (-1,))
+
+
+def _bincount(ids, weights, size):
+    # np.bincount, or a sort by id and `group_fsum` when the precision policy asks for compensated sums.
+    if not compensated():
+        return np.bincount(ids, weights=weights, minlength=size)
+    order = np.argsort(ids, kind='stable')
+    ids = ids[order]
+    starts = np.flatnonzero(np.append(True, ids[1:] != ids[:-1])) if len(ids) else np.zeros(0, dtype=np.int64)
+    res = np.zeros(size)
+    res[ids[starts]] = group_fsum(np.asarray(weights, dtype=np.float64)[order], starts)
+    return res
+
+
+def group_sum(codes, masses):
+    """
+    Sums the masses of equal codes.
+
+    Args:
+        - codes (array): A one-dimensional array of codes, or a two-dimensional batch with one evidence per row.
+        - masses (array): The masses, with the same shape as `codes`.
+
+    Returns:
+        tuple: (codes, masses) with sorted distinct codes. For a batch, rows are padded with code 0 and
+               mass 0 up to the largest number of distinct codes in a row. The masses keep their type; under
+               a compensated precision policy, equal codes are summed in float64 by `group_fsum`.
+    """
+    if codes.ndim == 1:
+        unique, inverse = np.unique(codes, return_inverse=True)
+        sums = _bincount(inverse.ravel(), masses, len(unique))
+        return unique, sums.astype(masses.dtype, copy=False)
+    rows, width = codes.shape
+    order = np.argsort(codes, axis=1, kind='stable')
+    codes = np.take_along_axis(codes, order, axis=1)
+    masses = np.take_along_axis(masses, order, axis=1)
+    new = np.ones(codes.shape, dtype=bool)
+    new[:, 1:] = codes[:, 1:] != codes[:, :-1]
+    starts = np.flatnonzero(new)
+    columns = (np.cumsum(new, axis=1) - 1).ravel()[starts]
+    row_ids = starts // width
+    out_codes = np.zeros((rows, int(columns.max()) + 1 if len(columns) else 0), dtype=codes.dtype)
+    out_masses = np.zeros(out_codes.shape, dtype=masses.dtype)
+    out_codes[row_ids, columns] = codes.ravel()[starts]
+    flat = masses.ravel().astype(accumulation_dtype(masses.dtype), copy=False)
+    out_masses[row_ids, columns] = group_fsum(flat, starts)
+    return out_codes, out_masses
+
+
+def _resolve_op(op):
+    return getattr(np, SET_OPS[op]) if isinstance(op, str) else op
+
+
+def combine_sets(ev1, ev2, op='and', frame=None):
+    """
+    Combines every pair of focal elements of two set-valued evidences and aggregates equal results.
+
+    Args:
+        - ev1 (Evidence): The first evidence, whose focal elements hold sets.
+        - ev2 (Evidence): The second evidence.
+        - op (str or callable, optional): 'and' (intersection), 'or' (union), or a binary NumPy function on
+                                          uint64 bitmasks. Defaults to 'and'.
+        - frame (sequence, optional): The common frame. Defaults to `frame_of(ev1, ev2)`.
+
+    Returns:
+        tuple: (frame, codes, masses), with the distinct result bitmasks in increasing order and their masses.
+
+    Description:
+        Both evidences are encoded as bitmasks and mass arrays, the |F1|·|F2| combined bitmasks and mass
+        products are formed by broadcasting, and equal bitmasks are aggregated with `np.unique` and
+        `np.bincount` (`group_fsum` under a compensated precision policy), so that no per-pair work runs in
+        the interpreter.
+    """
+    frame = tuple(frame) if frame is not None else frame_of(ev1, ev2)
+    _, codes1, masses1 = encode_evidence(ev1, frame)
+    _, codes2, masses2 = encode_evidence(ev2, frame)
+    codes, masses = product_kernel(codes1, masses1, codes2, masses2, _resolve_op(op))
+    codes, masses = group_sum(codes, masses)
+    return frame, codes, masses
+
+
+def normalize_batch(codes, masses):
+    """
+    Removes the mass of the empty set from every row of a batch and rescales the rest, as in Dempster's rule.
+
+    Args:
+        - codes (array): The bitmasks, one row per evidence.
+        - masses (array): The masses, one row per evidence.
+
+    Returns:
+        tuple: (masses, conflict), the normalized masses and the removed mass of every row. Rows whose
+               whole mass is conflicting are left at zero. The masses keep their type; under a compensated
+               precision policy, the conflict and the scaling are computed in float64.
+    """
+    empty = codes == 0
+    dtype = accumulation_dtype(masses.dtype)
+    conflict = np.where(empty, masses, 0).sum(axis=-1, dtype=dtype)
+    scale = np.where(conflict < 1, 1 - conflict, 1)
+    res = np.where(empty, 0, masses).astype(dtype, copy=False) / scale[..., None]
+    return res.astype(masses.dtype, copy=False), conflict
+
+
+def combine_rows(codes1, masses1, codes2, masses2, op='and', normalize=False):
+    """
+    Combines two padded batches of encoded evidences row by row, without decoding.
+
+    Args:
+        - codes1 (array): The bitmasks of the first evidences, one row per evidence.
+        - masses1 (array): Their masses.
+        - codes2 (array): The bitmasks of the second evidences, with the same number of rows.
+        - masses2 (array): Their masses.
+        - op (str, optional): 'and' (intersection) or 'or' (union). Defaults to 'and'.
+        - normalize (bool, optional): Whether to remove the conflict as in Dempster's rule. Defaults to False.
+
+    Returns:
+        tuple: (codes, masses, conflict), the combined batch with at most F1·F2 columns and the mass of
+               the empty set of every row before normalization.
+
+    Description:
+        A row-wise kernel on arrays only, meant for `dstz.element.shared.map_rows`.
+    """
+    codes, masses = group_sum(*product_kernel(codes1, masses1, codes2, masses2, _resolve_op(op)))
+    if normalize:
+        masses, conflict = normalize_batch(codes, masses)
+    else:
+        conflict = np.where(codes == 0, masses, 0).sum(axis=-1)
+    return codes, masses, conflict
+
+
+def measure_rows(codes, masses, queries, measure='bel'):
+    """
+    Evaluates the belief or plausibility of query sets on every row of a padded batch.
+
+    Args:
+        - codes (array): The bitmasks, one row per evidence.
+        - masses (array): The masses.
+        - queries (array): The bitmasks of the query sets.
+        - measure (str, optional): 'bel' or 'pl'. Defaults to 'bel'.
+
+    Returns:
+        numpy.ndarray: The (rows, queries) values. Mass on the empty set counts for neither measure.
+
+    Raises:
+        ValueError: If the measure is unknown.
+    """
+    queries = np.asarray(queries, dtype=np.uint64)
+    if measure == 'bel':
+        inside = (codes[..., None] & ~queries) == 0
+    elif measure == 'pl':
+        inside = (codes[..., None] & queries) != 0
+    else:
+        raise ValueError("Unknown measure %r, expected 'bel' or 'pl'" % (measure,))
+    inside &= (codes != 0)[..., None]
+    return np.einsum('rf,rfq->rq', masses, inside.astype(masses.dtype))
+
+
+def condition_rows(codes, masses, conditions, normalize=True):
+    """
+    Conditions every row of a padded batch on every one of several sets at once.
+
+    Args:
+        - codes (array): The bitmasks, one row per evidence.
+        - masses (array): The masses.
+        - conditions (array): The bitmasks of the conditioning sets.
+        - normalize (bool, optional): Whether to remove the conflict, which gives Dempster's conditioning,
+                                      i.e. `ds_rule` against the categorical evidence of every set. Otherwise
+                                      the mass that misses a set stays on the empty set. Defaults to True.
+
+    Returns:
+        tuple: (codes, masses, conflict), where codes and masses have shape (rows, conditions, width) with
+               equal intersections merged and padded as by `group_sum`, and conflict, of shape
+               (rows, conditions), is the mass that misses every set.
+    """
+    conditions = np.asarray(conditions, dtype=np.uint64)
+    rows, width = codes.shape
+    meets = (codes[:, None, :] & conditions[None, :, None]).reshape(-1, width)
+    meets, merged = group_sum(meets, np.broadcast_to(masses[:, None, :], (rows, len(conditions), width))
+                              .reshape(-1, width))
+    if normalize:
+        merged, conflict = normalize_batch(meets, merged)
+    else:
+        conflict = np.where(meets == 0, merged, 0).sum(axis=-1)
+    shape = (rows, len(conditions), meets.shape[-1])
+    return meets.reshape(shape), merged.reshape(shape), conflict.reshape(rows, len(conditions))
+
+
+def utility_rows(codes, masses, utility, criterion='pignistic'):
+    """
+    Evaluates the expected utility of every action on every row of a padded batch.
+
+    Args:
+        - codes (array): The bitmasks, one row per evidence, over a frame of n atoms.
+        - masses (array): The masses.
+        - utility (array): The (actions, n) utility of every action under every atom of the frame.
+        - criterion (str, optional): 'lower' takes the worst utility on every focal element (the Choquet
+                                     integral against the belief), 'upper' the best one (against the
+                                     plausibility), 'pignistic' the average (against the pignistic
+                                     probability). Defaults to 'pignistic'.
+
+    Returns:
+        numpy.ndarray: The (rows, actions) expected utilities, with the masses of the non-empty sets
+                       rescaled to sum to one. Rows without such mass are left at zero.
+
+    Raises:
+        ValueError: If the criterion is unknown.
+
+    Description:
+        The utility of every action on every distinct focal element of the batch is computed once, from
+        the membership matrix of the focal elements, and shared by all the rows that hold it.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError('Unknown criterion %r, expected one of %s' % (criterion, ', '.join(CRITERIA)))
+    utility = np.asarray(utility, dtype=np.float64)
+    unique, inverse = np.unique(codes, return_inverse=True)
+    bits = ((unique[:, None] >> np.arange(utility.shape[1], dtype=np.uint64)) & np.uint64(1)) == 1
+    if criterion == 'pignistic':
+        per_set = bits @ utility.T / np.maximum(bits.sum(axis=1), 1)[:, None]
+    else:
+        per_set = np.zeros((len(unique), len(utility)))
+        step = max(1, MAX_CELLS // max(1, utility.size))
+        for start in range(0, len(unique), step):
+            inside = bits[start:start + step, None, :]
+            if criterion == 'lower':
+                per_set[start:start + step] = np.where(inside, utility, np.inf).min(axis=-1)
+            else:
+                per_set[start:start + step] = np.where(inside, utility, -np.inf).max(axis=-1)
+        per_set[unique == 0] = 0.0
+    weights = np.where(codes == 0, 0, masses).astype(np.float64)
+    total = weights.sum(axis=-1)
+    values = np.einsum('rf,rfk->rk', weights, per_set[inverse.reshape(codes.shape)])
+    return values / np.where(total > 0, total, 1)[:, None]
+
+
+def combine_batch(evs1, evs2, op='and', normalize=False, curItem=Element, threads=None):
+    """
+    Combines many pairs of set-valued evidences at once, one pair per row.
+
+    Args:
+        - evs1 (list): The first evidence of every pair.
+        - evs2 (list): The second evidence of every pair, with the same length as `evs1`.
+        - op (str, optional): 'and' (intersection) or 'or' (union). Defaults to 'and'.
+        - normalize (bool, optional): Whether to remove the conflict as in Dempster's rule. Defaults to False.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+        - threads (int, optional): The number of threads the rows are split across with `map_threads`.
+                                   Defaults to None (the calling thread only).
+
+    Returns:
+        list: The combined evidence of every pair. Focal elements with zero mass are dropped.
+
+    Description:
+        Both lists are encoded into padded batches over their common frame, all pair products are formed
+        with one broadcast of `product_kernel`, and equal results are summed row by row with `group_sum`.
+        Padding has mass 0, so it never changes a result. Pairs are combined one by one with
+        `combine_python` when NumPy cannot be used.
+    """
+    if not evs1:
+        return []
+    evs1 = [as_evidence(ev, curItem) for ev in evs1]
+    evs2 = [as_evidence(ev, curItem) for ev in evs2]
+    if not use_numpy(*evs1 + evs2):
+        res = [combine_python(ev1, ev2, op, curItem) for ev1, ev2 in zip(evs1, evs2)]
+        if normalize:
+            for ev in res:
+                empty_mass = ev.pop(curItem(set()), 0.0)
+                if empty_mass:
+                    for key in ev.keys():
+                        ev[key] = ev[key] / (1 - empty_mass)
+        return res
+    frame = frame_of(*evs1 + evs2)
+    _, codes1, masses1 = encode_batch(evs1, frame)
+    _, codes2, masses2 = encode_batch(evs2, frame)
+    if threads is not None and threads > 1:
+        width = codes1.shape[1] * codes2.shape[1]
+        codes, masses, _ = map_threads(functools.partial(combine_rows, op=op, normalize=normalize),
+                                       [codes1, masses1, codes2, masses2],
+                                       [((width,), np.uint64), ((width,), masses1.dtype), ((), np.float64)], threads)
+        return decode_batch(frame, codes, masses, curItem)
+    codes, masses = group_sum(*product_kernel(codes1, masses1, codes2, masses2, _resolve_op(op)))
+    if normalize:
+        masses, _ = normalize_batch(codes, masses)
+    return decode_batch(frame, codes, masses, curItem)
+
+
+def left_intersection_orders(orders1, orders2):
+    """
+    Computes the left intersection of every pair of ordered events.
+
+    Args:
+        - orders1 (array): The events of the first evidence as atom indices padded with -1, shape (F1, n).
+        - orders2 (array): The events of the second evidence, shape (F2, n).
+
+    Returns:
+        array: Shape (F1 * F2, n). Row i * F2 + j holds the atoms of the i-th event of `orders1` that also
+               belong to the j-th event of `orders2`, in the order of the former, padded with -1.
+    """
+    members = orders_to_codes(orders2)
+    valid = orders1 >= 0
+    shift = np.where(valid, orders1, 0).astype(np.uint64)
+    keep = ((members[None, :, None] >> shift[:, None, :]) & np.uint64(1)).astype(bool) & valid[:, None, :]
+    position = np.argsort(~keep, axis=-1, kind='stable')
+    res = np.take_along_axis(np.broadcast_to(orders1[:, None, :], keep.shape), position, axis=-1)
+    res = np.where(np.take_along_axis(keep, position, axis=-1), res, -1)
+    return res.reshape(-1, orders1.shape[-1])
+
+
+def combine_orders(ev1, ev2, op=left_intersection_orders):
+    """
+    Combines every pair of ordered focal elements of two evidences with a vectorized operation.
+
+    Args:
+        - ev1 (Evidence): The first evidence, whose focal elements hold tuples.
+        - ev2 (Evidence): The second evidence.
+        - op (callable, optional): Takes the padded orders of both evidences and returns the padded orders of
+                                   the F1 * F2 results. Defaults to `left_intersection_orders`.
+
+    Returns:
+        tuple: (frame, orders, masses), with the distinct result events and their masses.
+    """
+    frame = frame_of(ev1, ev2)
+    _, orders1, masses1 = encode_orders(ev1, frame)
+    _, orders2, masses2 = encode_orders(ev2, frame)
+    orders = op(orders1, orders2)
+    masses = np.multiply.outer(masses1, masses2).ravel()
+    unique, inverse = np.unique(orders, axis=0, return_inverse=True)
+    return frame, unique, _bincount(inverse.ravel(), masses, len(unique))
+
+
+def combine_expanded(ev1, ev2, op, curItem=Element):
+    """
+    Combines every pair of focal elements with an operation that may yield several results per pair.
+
+    Args:
+        - ev1 (Evidence): The first evidence.
+        - ev2 (Evidence): The second evidence.
+        - op (callable): Takes two focal values and returns the list of result values; the mass product of
+                         the pair is split evenly among them.
+        - curItem (callable, optional): A callable that turns a result value into an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        Evidence: The combined evidence.
+
+    Description:
+        The operation itself runs once per pair in Python, but results are interned to integer ids and
+        the mass products, splitting and aggregation are done with NumPy.
+    """
+    ids, values, counts, result_ids = {}, [], [], []
+    for key1, key2 in itertools.product(ev1.keys(), ev2.keys()):
+        results = op(key1.value, key2.value)
+        counts.append(len(results))
+        for value in results:
+            key = curItem(value)
+            if key not in ids:
+                ids[key] = len(values)
+                values.append(key)
+            result_ids.append(ids[key])
+    masses = np.multiply.outer(np.fromiter(ev1.values(), np.float64, len(ev1)),
+                               np.fromiter(ev2.values(), np.float64, len(ev2))).ravel()
+    counts = np.asarray(counts, dtype=np.int64)
+    shares = np.repeat(masses / np.maximum(counts, 1), counts)
+    sums = _bincount(np.asarray(result_ids, dtype=np.int64), shares, len(values))
+    return Evidence(zip(values, sums.tolist()))
+
+
+def combine_python(ev1, ev2, op, curItem=Element):
+    """
+    Combines every pair of focal elements with plain dictionary loops.
+
+    Args:
+        - ev1 (Evidence): The first evidence.
+        - ev2 (Evidence): The second evidence.
+        - op (str or callable): 'and', 'or', or a callable taking two focal values and returning the list of
+                                result values, among which the mass product of the pair is split evenly.
+        - curItem (callable, optional): A callable that turns a result value into an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        Evidence: The combined evidence. This is the reference implementation used when NumPy is not installed;
+                  equal results are summed as the precision policy says, see `dstz.core.precision`.
+    """
+    op = _PYTHON_SET_OPS.get(op, op)
+    sums = Accumulator()
+    for key1, key2 in itertools.product(ev1.keys(), ev2.keys()):
+        results = op(key1.value, key2.value)
+        for value in results:
+            sums.add(curItem(value), ev1[key1] * ev2[key2] / len(results))
+    return Evidence(sums.items())
+
+
+def use_numpy(*evs):
+    """
+    Tells whether the NumPy kernels can encode the given evidences.
+
+    Args:
+        - \\*evs (Evidence): The evidences to combine.
+
+    Returns:
+        bool: True if NumPy is installed and the evidences are non-empty and span at most `MAX_FRAME_SIZE` atoms.
+    """
+    if not available('numpy') or not all(evs):
+        return False
+    return len(frame_of(*evs)) <= MAX_FRAME_SIZE
+
+
+def as_evidence(ev, curItem=Element):
+    """
+    Expands a compact evidence (BayesianEvidence, ConsonantEvidence) into a plain Evidence.
+
+    Args:
+        - ev (Evidence): An Evidence, returned as is, or a compact evidence with a `to_evidence` method.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        Evidence: An evidence that the dictionary loops can iterate over.
+    """
+    return ev.to_evidence(curItem) if hasattr(ev, 'to_evidence') else ev
+
+
+def pairwise_sets(ev1, ev2, op='and', curItem=Element):
+    """
+    Combines two set-valued evidences pair by pair and returns the unnormalized result as an Evidence.
+
+    Args:
+        - ev1 (Evidence): The first evidence. Compact evidences such as `ConsonantEvidence` are encoded
+                          directly from their vectors.
+        - ev2 (Evidence): The second evidence.
+        - op (str, optional): 'and' (intersection) or 'or' (union). Defaults to 'and'.
+        - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        Evidence: The combined evidence, computed by `combine_sets` when `use_numpy` allows it and by
+                  `combine_python` otherwise.
+    """
+    if not use_numpy(ev1, ev2):
+        return combine_python(as_evidence(ev1, curItem), as_evidence(ev2, curItem), op, curItem)
+    frame, codes, masses = combine_sets(ev1, ev2, op)
+    return decode_evidence(frame, codes, masses, curItem, keep_zero=True)
+
+
+def pairwise_orders(ev1, ev2, curItem=Element):
+    """
+    Combines two evidences over ordered events by left intersection and returns the result as an Evidence.
+
+    Args:
+        - ev1 (Evidence): The first evidence, whose focal elements hold tuples.
+        - ev2 (Evidence): The second evidence.
+        - curItem (callable, optional): A callable that takes a tuple and returns an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        Evidence: The combined evidence, computed by `combine_orders` when `use_numpy` allows it.
+    """
+    if not use_numpy(ev1, ev2):
+        return combine_python(ev1, ev2, lambda a, b: [tuple(x for x in a if x in b)], curItem)
+    frame, orders, masses = combine_orders(ev1, ev2)
+    return decode_orders(frame, orders, masses, curItem, keep_zero=True)
+
+
+def pairwise_expanded(ev1, ev2, op, curItem=Element):
+    """
+    Combines two evidences pair by pair with an operation that may yield several results per pair.
+
+    Args:
+        - ev1 (Evidence): The first evidence.
+        - ev2 (Evidence): The second evidence.
+        - op (callable): Takes two focal values and returns the list of result values.
+        - curItem (callable, optional): A callable that turns a result value into an instance of Item.
+                                      Defaults to the Element class.
+
+    Returns:
+        Evidence: The combined evidence, computed by `combine_expanded` when NumPy is installed.
+    """
+    if not available('numpy') or not (ev1 and ev2):
+        return combine_python(ev1, ev2, op, curItem)
+    return combine_expanded(ev1, ev2, op, curItem)
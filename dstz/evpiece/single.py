@@ -1,9 +1,11 @@
 from dstz.core.atom import Element
-from dstz.core.distribution import Evidence
+from dstz.core.distribution import Evidence, ObservableEvidence
+from dstz.core.instrument import timed
 from dstz.evpiece.dual import disjunctive_rule
 from dstz.math.func import pl
 
 
+@timed()
 def pignistic_probability_transformation(ev):
     """
     Transforms an evidence distribution into a probability distribution using the Pignistic transformation.
@@ -32,7 +34,14 @@ def pignistic_probability_transformation(ev):
     return res
 
 
+@timed()
 def get_fod(ev):
+    if isinstance(ev, ObservableEvidence):
+        return set(ev.atoms())
+    return _scan_fod(ev)
+
+
+def _scan_fod(ev):
     res = set()
     for ele in ev.keys():
         for item in ele.value:
@@ -40,6 +49,7 @@ def get_fod(ev):
     return res
 
 
+@timed()
 def shafer_discounting(ev, alpha):
     ev_tmp = Evidence()
     ev_tmp[Element(set())] = 1 - alpha
@@ -48,16 +58,10 @@ def shafer_discounting(ev, alpha):
     return res
 
 
+@timed()
 def contour_transformation(ev):
     fod = get_fod(ev)
     res = Evidence()
     for event in fod:
         res[Element({event})] = pl(Element({event}), ev)
     return res
-
-
-ev = Evidence()
-ev[Element({'a', 'b', 'c'})] = 0.5
-ev[Element({'b', 'c'})] = 0.3
-ev[Element({'a'})] = 0.2
-print(contour_transformation(ev))
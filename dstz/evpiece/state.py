@@ -0,0 +1,297 @@
+import json
+import math
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from dstz.core.atom import Element
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import lazy_import
+from dstz.core.precision import storage_dtype
+from dstz.element.encoding import decode_evidence, encode_batch
+from dstz.math.matrix.lattice import MAX_CELLS
+from dstz.math.matrix.transform import superset_sum, MAX_DENSE_FRAME, TOLERANCE
+
+np = lazy_import('numpy')
+
+# Leading bytes of a serialized state, followed by the format version and the length of the JSON header.
+MAGIC = b'DSTZ'
+VERSION = 1
+_PREFIX = struct.Struct('<4sBI')
+
+
+class FusionState(object):
+    """
+    A mergeable partial result of the conjunctive combination of many evidences over a declared frame.
+
+    Attributes:
+        - frame (tuple): The atoms of the frame.
+        - log_q (numpy.ndarray): The logarithm of the product of the commonality functions of the sources,
+                                 indexed by bitmask, relative to its value at the empty set.
+        - log_mass (float): The logarithm of the total unnormalized mass, 0 for normalized sources.
+        - sources (int): The number of evidences combined so far.
+
+    Methods:
+        - add(ev): Combines one more evidence into the state.
+        - add_many(evs): Combines many evidences at once.
+        - merge(other): Combines another state over the same frame into this one.
+        - conflict(): Returns the mass the conjunctive combination puts on the empty set.
+        - finalize(normalize=True, curItem=Element, tol=TOLERANCE): Returns the combined evidence.
+        - to_bytes(dtype=None): Serializes the state.
+        - from_bytes(data): Deserializes a state.
+
+    Description:
+        The commonality function of a conjunctive combination is the product of the commonality functions of
+        the sources, so a state is one vector of log-commonalities: adding an evidence adds its log-commonality
+        vector, and merging two states adds theirs. Both are associative and commutative, so sources can be
+        sharded across processes or machines in any way and the partial states merged in any order. The
+        conflict is not accumulated separately: it is recovered from the vector when the state is finalized,
+        after a shift that keeps the vector in range however many sources were combined. A state with no
+        source is the vacuous evidence, the identity of the combination. The vector has 2 ** n entries, so
+        frames are limited to `MAX_DENSE_FRAME` atoms.
+
+    Example Usage:
+        >>> state = FusionState('abc')
+        >>> state.add_many(shard1)
+        >>> other = FusionState.from_bytes(received)
+        >>> state.merge(other).finalize()
+    """
+
+    def __init__(self, frame):
+        """
+        Initializes an empty state, which stands for the vacuous evidence.
+
+        Args:
+            - frame (sequence): The atoms of the frame; every added evidence must stay within it.
+
+        Raises:
+            ValueError: If the frame has more than `MAX_DENSE_FRAME` atoms.
+        """
+        self.frame = tuple(frame)
+        if len(self.frame) > MAX_DENSE_FRAME:
+            raise ValueError('A state over %d atoms is too large, the limit is %d' % (len(self.frame), MAX_DENSE_FRAME))
+        self.log_q = np.zeros(2 ** len(self.frame))
+        self.log_mass = 0.0
+        self.sources = 0
+
+    def _absorb(self, log_q, sources):
+        # Adds log-commonalities and moves their value at the empty set, the log of the total mass, out.
+        self.log_q += log_q
+        shift = self.log_q[0]
+        if np.isfinite(shift) and shift:
+            self.log_q -= shift
+            self.log_mass += float(shift)
+        self.sources += sources
+
+    def add(self, ev):
+        """
+        Combines one more evidence into the state.
+
+        Args:
+            - ev (Evidence): An evidence whose focal elements are subsets of the frame.
+
+        Returns:
+            FusionState: The state itself.
+        """
+        return self.add_many([ev])
+
+    @timed()
+    def add_many(self, evs):
+        """
+        Combines many evidences into the state, a chunk of dense vectors at a time.
+
+        Args:
+            - evs (list): Evidences whose focal elements are subsets of the frame.
+
+        Returns:
+            FusionState: The state itself.
+
+        Raises:
+            ValueError: If an evidence has an atom outside the frame.
+        """
+        size = len(self.log_q)
+        step = max(1, MAX_CELLS // size)
+        for start in range(0, len(evs), step):
+            chunk = evs[start:start + step]
+            try:
+                _, codes, masses = encode_batch(chunk, self.frame, dtype=np.float64)
+            except KeyError as error:
+                raise ValueError('Atom %r is not in the frame of the state' % (error.args[0],))
+            rows = np.arange(len(chunk), dtype=np.int64)[:, None] * size
+            dense = np.bincount((rows + codes.astype(np.int64)).ravel(), weights=masses.ravel(),
+                                minlength=len(chunk) * size).reshape(len(chunk), size)
+            with np.errstate(divide='ignore'):
+                self._absorb(np.log(superset_sum(dense)).sum(axis=0), len(chunk))
+        if enabled():
+            count('evpiece.state.sources', len(evs))
+        return self
+
+    def merge(self, other):
+        """
+        Combines another state into this one.
+
+        Args:
+            - other (FusionState): A state over the same frame, in the same order.
+
+        Returns:
+            FusionState: This state, now holding the combination of the sources of both.
+
+        Raises:
+            ValueError: If the frames differ.
+        """
+        if other.frame != self.frame:
+            raise ValueError('Cannot merge states over different frames %r and %r' % (self.frame, other.frame))
+        self._absorb(other.log_q, other.sources)
+        self.log_mass += other.log_mass
+        return self
+
+    def _masses(self):
+        # The masses of the non-empty sets, scaled by exp(-shift), with 0 on the empty set, and the shift.
+        shift = self.log_q[1:].max() if len(self.log_q) > 1 else -np.inf
+        if not np.isfinite(shift):
+            return np.zeros(len(self.log_q)), shift
+        values = np.zeros(len(self.log_q))
+        values[1:] = np.exp(self.log_q[1:] - shift)
+        masses = superset_sum(values, inverse=True)
+        masses[0] = 0.0
+        return masses, shift
+
+    def conflict(self):
+        """
+        Returns the mass the conjunctive combination of the sources puts on the empty set.
+
+        Returns:
+            float: The conflict, relative to the total mass of the sources.
+        """
+        masses, shift = self._masses()
+        total = masses.sum()
+        if total <= 0:
+            return 1.0
+        return float(-np.expm1(shift + np.log(total)))
+
+    def finalize(self, normalize=True, curItem=Element, tol=TOLERANCE):
+        """
+        Returns the combined evidence.
+
+        Args:
+            - normalize (bool, optional): Whether to apply Dempster's normalization. Otherwise the result is
+                                          the unnormalized conjunctive combination, with the conflict on the
+                                          empty set. Defaults to True.
+            - curItem (callable, optional): A callable that takes a set and returns an instance of Item.
+                                          Defaults to the Element class.
+            - tol (float, optional): Masses whose magnitude is at most this are dropped. Defaults to 1e-12.
+
+        Returns:
+            Evidence: The combination. Under total conflict the normalized result is empty.
+        """
+        masses, shift = self._masses()
+        total = masses.sum()
+        if total <= 0:
+            masses = np.zeros(len(masses))
+            if not normalize:
+                masses[0] = math.exp(self.log_mass)
+        elif normalize:
+            masses = masses / total
+        else:
+            masses = masses * math.exp(shift + self.log_mass)
+            masses[0] = -math.exp(self.log_mass) * np.expm1(shift + np.log(total))
+        keep = np.flatnonzero(np.abs(masses) > tol)
+        return decode_evidence(self.frame, keep.astype(np.uint64), masses[keep], curItem)
+
+    def to_bytes(self, dtype=None):
+        """
+        Serializes the state.
+
+        Args:
+            - dtype (dtype, optional): The floating type of the stored vector. Defaults to the storage type of
+                                       the precision policy, float64 unless changed with `set_precision`.
+
+        Returns:
+            bytes: A self-describing record: `MAGIC`, the version, a JSON header holding the frame and the
+                   scalars, and the raw little-endian vector. The atoms must be JSON values (str, int, float,
+                   bool or None); tuples come back as tuples.
+        """
+        dtype = np.dtype(dtype or storage_dtype()).newbyteorder('<')
+        header = json.dumps({'frame': list(self.frame), 'dtype': dtype.str, 'log_mass': self.log_mass,
+                             'sources': self.sources}).encode('utf-8')
+        return _PREFIX.pack(MAGIC, VERSION, len(header)) + header + self.log_q.astype(dtype).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Deserializes a state written by `to_bytes`.
+
+        Args:
+            - data (bytes): The serialized state.
+
+        Returns:
+            FusionState: The state.
+
+        Raises:
+            ValueError: If the data is not a complete serialized state of a known version.
+        """
+        data = memoryview(data)
+        if len(data) < _PREFIX.size:
+            raise ValueError('Expected at least %d bytes, got %d' % (_PREFIX.size, len(data)))
+        magic, version, length = _PREFIX.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a serialized FusionState of version %d' % VERSION)
+        try:
+            header = json.loads(bytes(data[_PREFIX.size:_PREFIX.size + length]).decode('utf-8'))
+            frame, dtype = header['frame'], np.dtype(header['dtype'])
+            log_mass, sources = float(header['log_mass']), int(header['sources'])
+        except (UnicodeDecodeError, KeyError, TypeError, ValueError) as error:
+            raise ValueError('Invalid FusionState header: %s' % error)
+        res = cls([tuple(atom) if isinstance(atom, list) else atom for atom in frame])
+        body = data[_PREFIX.size + length:]
+        if len(body) % dtype.itemsize:
+            raise ValueError('The vector holds %d bytes, not a whole number of %s' % (len(body), dtype))
+        vector = np.frombuffer(body, dtype=dtype)
+        if len(vector) != len(res.log_q):
+            raise ValueError('Expected %d values, got %d' % (len(res.log_q), len(vector)))
+        res.log_q = vector.astype(np.float64)
+        res.log_mass = log_mass
+        res.sources = sources
+        return res
+
+    def __repr__(self):
+        return 'FusionState(%r, sources=%d)' % (self.frame, self.sources)
+
+
+def _fuse_shard(frame, evs, dtype):
+    # The map step: fuses one shard into a serialized state.
+    return FusionState(frame).add_many(evs).to_bytes(dtype)
+
+
+@timed()
+def map_reduce(evs, frame, processes=None, shards=None, dtype=None):
+    """
+    Combines many evidences by fusing shards in worker processes and merging the serialized partial states.
+
+    Args:
+        - evs (list): The evidences, whose focal elements are subsets of the frame.
+        - frame (sequence): The atoms of the frame.
+        - processes (int, optional): The number of worker processes. Defaults to `os.cpu_count()`.
+        - shards (int, optional): The number of shards. Defaults to `processes`.
+        - dtype (dtype, optional): The type of the shipped vectors; float32 halves the traffic. Defaults to the
+                                   storage type of the precision policy of the calling process.
+
+    Returns:
+        FusionState: The merged state; call `finalize()` for the combined evidence.
+
+    Description:
+        A local stand-in for a distributed job: every shard is fused where it lives and only its state,
+        2 ** n numbers, travels back as bytes, exactly what a job over several machines would ship.
+    """
+    processes = processes or os.cpu_count() or 1
+    shards = max(1, min(shards or processes, len(evs)))
+    bounds = [len(evs) * i // shards for i in range(shards + 1)]
+    parts = [evs[start:stop] for start, stop in zip(bounds, bounds[1:])]
+    frame = tuple(frame)
+    dtype = np.dtype(dtype or storage_dtype())
+    with ProcessPoolExecutor(processes) as pool:
+        states = list(pool.map(_fuse_shard, [frame] * shards, parts, [dtype] * shards))
+    res = FusionState(frame)
+    for data in states:
+        res.merge(FusionState.from_bytes(data))
+    return res
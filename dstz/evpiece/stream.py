@@ -0,0 +1,260 @@
+import asyncio
+import time
+
+from dstz.core.instrument import count, enabled
+from dstz.core.lazy import lazy_import
+from dstz.element.generator import random_evidences
+from dstz.evpiece.kernel import combine_batch
+
+np = lazy_import('numpy')
+
+# Rules understood by `Pipeline`, as (set operation, normalize).
+RULES = {
+    'dempster': ('and', True),
+    'intersection': ('and', False),
+    'union': ('or', False),
+}
+
+_DONE = object()
+
+
+class LocalSource(object):
+    """
+    An in-process stand-in for a sensor feed, producing random evidences asynchronously.
+
+    Attributes:
+        - count (int): The number of evidences to produce.
+        - keys (list): The keys (targets or tracks) the evidences are about, used in turn.
+        - rate (float or None): The number of evidences per second, or None to produce as fast as possible.
+
+    Example Usage:
+        >>> async for key, ev in LocalSource(1000, frame='abcd', focal=3, keys=['t1', 't2'], seed=0):
+        ...     pass
+    """
+
+    def __init__(self, count, frame, focal, keys=(0,), rate=None, seed=None, chunk_size=1024, **kwargs):
+        """
+        Initializes a local source.
+
+        Args:
+            - count (int): The number of evidences to produce.
+            - frame (sequence): The atoms of the frame.
+            - focal (int): The number of focal elements of every evidence.
+            - keys (sequence, optional): The keys the evidences are about, used in turn. Defaults to (0,).
+            - rate (float, optional): The number of evidences per second. Defaults to None (no pacing).
+            - seed (int, optional): The seed of the evidences. Defaults to None.
+            - chunk_size (int, optional): The number of evidences generated at once. Defaults to 1024.
+            - \\*\\*kwargs: The remaining options of `random_bba`, e.g. `structure`.
+        """
+        self.count = count
+        self.frame = tuple(frame)
+        self.focal = focal
+        self.keys = list(keys)
+        self.rate = rate
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.kwargs = kwargs
+
+    async def __aiter__(self):
+        rng = np.random.default_rng(self.seed)
+        start = time.perf_counter()
+        produced = 0
+        while produced < self.count:
+            size = min(self.chunk_size, self.count - produced)
+            for ev in random_evidences(size, self.frame, self.focal, seed=rng, **self.kwargs):
+                if self.rate:
+                    delay = start + produced / self.rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                yield self.keys[produced % len(self.keys)], ev
+                produced += 1
+            await asyncio.sleep(0)
+
+
+class CollectSink(object):
+    """
+    An async sink that keeps every fused result, for tests and examples.
+
+    Attributes:
+        - results (list): The (key, evidence) pairs received, in order.
+    """
+
+    def __init__(self):
+        self.results = []
+
+    async def __call__(self, key, ev):
+        self.results.append((key, ev))
+
+
+class Pipeline(object):
+    """
+    An asyncio pipeline fusing a stream of keyed evidences into one running evidence per key.
+
+    Attributes:
+        - rule (str): The combination rule, one of `RULES`.
+        - batch_size (int): The largest number of evidences fused in one micro-batch.
+        - max_delay (float): The longest time in seconds a micro-batch waits to fill up.
+        - queue_size (int): The capacity of the input queue; a full queue makes the source wait.
+        - states (dict): The current fused evidence of every key.
+        - stats (dict): Counts of 'items' and 'batches' and the 'latency' of items in seconds, as
+                        'latency_total' and 'latency_max', from entering the queue to reaching the sink.
+
+    Methods:
+        - run(source, sink): Consumes a source until it is exhausted, feeding fused results to a sink.
+        - submit(key, ev): Puts one evidence into the pipeline, waiting while the queue is full.
+        - close(): Tells a running pipeline that no more evidence will be submitted.
+
+    Description:
+        Evidences wait in a bounded asyncio.Queue, which applies backpressure to the producers. The
+        consumer takes up to `batch_size` of them, waiting at most `max_delay` after the first, and fuses
+        the micro-batch in an executor so that the event loop stays responsive: the evidences of a batch
+        are combined with the states of their keys round by round, each round being one vectorized
+        `combine_batch` call over all keys. After each batch the sink receives the new state of every
+        key that changed, once, so slow sinks see coalesced updates instead of falling behind.
+
+    Example Usage:
+        >>> sink = CollectSink()
+        >>> pipeline = Pipeline(batch_size=256, max_delay=0.005)
+        >>> asyncio.run(pipeline.run(LocalSource(10000, 'abcde', 3, keys=range(8), seed=0), sink))
+    """
+
+    def __init__(self, rule='dempster', batch_size=256, max_delay=0.01, queue_size=1024, executor=None):
+        """
+        Initializes a pipeline.
+
+        Args:
+            - rule (str, optional): 'dempster', 'intersection' or 'union'. Defaults to 'dempster'.
+            - batch_size (int, optional): The largest micro-batch. Defaults to 256.
+            - max_delay (float, optional): The longest wait for a micro-batch to fill up. Defaults to 0.01.
+            - queue_size (int, optional): The capacity of the input queue. Defaults to 1024.
+            - executor (concurrent.futures.Executor, optional): Where the fusion runs. It must share memory
+                                                                with the pipeline, e.g. a thread pool.
+                                                                Defaults to None (the loop's default).
+
+        Raises:
+            ValueError: If the rule is unknown.
+        """
+        if rule not in RULES:
+            raise ValueError('Unknown rule %r, expected one of %s' % (rule, ', '.join(RULES)))
+        self.rule = rule
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue_size = queue_size
+        self.executor = executor
+        self.states = {}
+        self.stats = {'items': 0, 'batches': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+        self._queue = None
+
+    def _get_queue(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.queue_size)
+        return self._queue
+
+    async def submit(self, key, ev):
+        """
+        Puts one evidence into the pipeline, waiting while the queue is full.
+
+        Args:
+            - key (Hashable): What the evidence is about; evidences with the same key are fused together.
+            - ev (Evidence): The evidence.
+        """
+        await self._get_queue().put((key, ev, time.perf_counter()))
+
+    async def close(self):
+        """
+        Tells a running pipeline that no more evidence will be submitted.
+        """
+        await self._get_queue().put(_DONE)
+
+    def fuse(self, batch):
+        """
+        Fuses a micro-batch into the states, synchronously.
+
+        Args:
+            - batch (list): (key, evidence) pairs in arrival order.
+
+        Returns:
+            list: The keys whose state changed, in order of first appearance.
+        """
+        op, normalize = RULES[self.rule]
+        pending = {}
+        for key, ev in batch:
+            pending.setdefault(key, []).append(ev)
+        changed = list(pending)
+        depth = 0
+        while pending:
+            keys = [key for key in pending if key in self.states]
+            for key in pending:
+                if key not in self.states:
+                    self.states[key] = pending[key][0]
+            fused = combine_batch([self.states[key] for key in keys], [pending[key][0] for key in keys],
+                                  op, normalize)
+            self.states.update(zip(keys, fused))
+            pending = {key: evs[1:] for key, evs in pending.items() if len(evs) > 1}
+            depth += 1
+        if enabled():
+            count('evpiece.stream.rounds', depth)
+        return changed
+
+    async def _next_batch(self, queue):
+        item = await queue.get()
+        if item is _DONE:
+            return None, True
+        batch = [item]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.batch_size:
+            try:
+                timeout = deadline - time.perf_counter()
+                item = queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def consume(self, sink):
+        """
+        Fuses submitted evidences and feeds the results to a sink until `close` is called.
+
+        Args:
+            - sink (callable): An async callable taking (key, fused evidence).
+        """
+        loop = asyncio.get_running_loop()
+        queue = self._get_queue()
+        done = False
+        while not done:
+            batch, done = await self._next_batch(queue)
+            if not batch:
+                continue
+            changed = await loop.run_in_executor(self.executor, self.fuse, [(key, ev) for key, ev, _ in batch])
+            for key in changed:
+                await sink(key, self.states[key])
+            now = time.perf_counter()
+            latencies = [now - queued for _, _, queued in batch]
+            self.stats['items'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['latency_total'] += sum(latencies)
+            self.stats['latency_max'] = max(self.stats['latency_max'], max(latencies))
+            if enabled():
+                count('evpiece.stream.items', len(batch))
+                count('evpiece.stream.batches')
+
+    async def run(self, source, sink):
+        """
+        Consumes an async source until it is exhausted, feeding fused results to a sink.
+
+        Args:
+            - source (async iterable): Yields (key, evidence) pairs, e.g. a `LocalSource`.
+            - sink (callable): An async callable taking (key, fused evidence), e.g. a `CollectSink`.
+
+        Returns:
+            dict: The final state of every key.
+        """
+        async def produce():
+            async for key, ev in source:
+                await self.submit(key, ev)
+            await self.close()
+
+        await asyncio.gather(produce(), self.consume(sink))
+        return self.states
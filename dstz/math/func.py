@@ -1,3 +1,7 @@
+from dstz.core.instrument import count, timed
+
+
+@timed()
 def pl(element, ev):
     """
     Calculates the plausibility function value for a given element in an evidence distribution.
@@ -14,6 +18,7 @@ def pl(element, ev):
         that the actual state of affairs is included in set A. It is calculated as the sum of the masses
         assigned to all sets that intersect with A.
     """
+    count('math.func.pl.scanned', len(ev))
     res = 0
     for key in ev:
         if element.value.intersection(key.value):
@@ -21,6 +26,7 @@ def pl(element, ev):
     return res
 
 
+@timed()
 def q(element, ev):
     """
     Calculates the commonality function value for a given element in an evidence distribution.
@@ -37,6 +43,7 @@ def q(element, ev):
         that the actual state of affairs includes set A. It is calculated as the sum of the masses
         assigned to all sets that contain A.
     """
+    count('math.func.q.scanned', len(ev))
     res = 0
     for key in ev:
         if key.value and element.value.issubset(key.value):
@@ -44,6 +51,7 @@ def q(element, ev):
     return res
 
 
+@timed()
 def bel(element, ev):
     """
     Calculates the belief function value for a given element in an evidence distribution.
@@ -60,6 +68,7 @@ def bel(element, ev):
         that the actual state of affairs is contained in set A. It is calculated as the sum of the masses
         assigned to all sets that are subsets of A.
     """
+    count('math.func.bel.scanned', len(ev))
     res = 0
     for key in ev:
         if key.value and key.value.issubset(element.value):
@@ -1,12 +1,29 @@
-import numpy as np
+from dstz.core.cache import memoize_frame
+from dstz.core.lazy import lazy_import
 
-BFRM = np.array([
-    [1, 0],
-    [1, 1]])
+np = lazy_import('numpy')
 
-QFRM = np.array([
-    [1, 1],
-    [0, 1]])
+_CONSTANTS = {
+    'BFRM': [
+        [1, 0],
+        [1, 1]],
+    'QFRM': [
+        [1, 1],
+        [0, 1]],
+}
+
+
+def _constant(name):
+    # BFRM and QFRM are built on first use so that importing this module does not import NumPy.
+    if name not in globals():
+        globals()[name] = np.array(_CONSTANTS[name])
+    return globals()[name]
+
+
+def __getattr__(name):
+    if name in _CONSTANTS:
+        return _constant(name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 def matrix_self_kron(matrix, n):
@@ -16,9 +33,11 @@ def matrix_self_kron(matrix, n):
     return res
 
 
+@memoize_frame
 def get_qfrm(n):
-    return matrix_self_kron(QFRM, n)
+    return matrix_self_kron(_constant('QFRM'), n)
 
 
+@memoize_frame
 def get_bfrm(n):
-    return matrix_self_kron(BFRM, n)
+    return matrix_self_kron(_constant('BFRM'), n)
@@ -1,12 +1,15 @@
-import numpy as np
-
 from dstz.core.atom import Element
 from dstz.core.distribution import Evidence
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import lazy_import
 from dstz.evpiece.single import get_fod
 from dstz.math.matrix.const import get_qfrm, get_bfrm
 from dstz.math.matrix.func import get_ones_indices
 
+np = lazy_import('numpy')
+
 
+@timed()
 def matrix_rule(ev1, ev2, matrix, fod, mul=True, curItem=Element):
     ev = Evidence()
     events = []
@@ -36,24 +39,31 @@ def matrix_rule(ev1, ev2, matrix, fod, mul=True, curItem=Element):
     for i in range(len(events)):
         if ev_m[i] > 0:
             ev[events[i]] = ev_m[i]
+    if enabled():
+        count('math.matrix.dual.matrix_rule.states', len(events))
+        count('math.matrix.dual.matrix_rule.focal_created', len(ev))
     return ev
 
 
+@timed()
 def conjunctive_rule(ev1, ev2, curItem=Element):
     fod = list(get_fod(ev1).union(get_fod(ev2)))
     return matrix_rule(ev1, ev2, get_qfrm(len(fod)), fod)
 
 
+@timed()
 def de_conjunctive_rule(ev1, ev2, curItem=Element):
     fod = list(get_fod(ev1).union(get_fod(ev2)))
     return matrix_rule(ev1, ev2, get_qfrm(len(fod)), fod, False)
 
 
+@timed()
 def disjunctive_rule(ev1, ev2, curItem=Element):
     fod = list(get_fod(ev1).union(get_fod(ev2)))
     return matrix_rule(ev1, ev2, get_bfrm(len(fod)), fod)
 
 
+@timed()
 def de_disjunctive_rule(ev1, ev2, curItem=Element):
     fod = list(get_fod(ev1).union(get_fod(ev2)))
     return matrix_rule(ev1, ev2, get_bfrm(len(fod)), fod, False)
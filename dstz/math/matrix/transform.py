@@ -0,0 +1,124 @@
+import functools
+
+from dstz.core.lazy import lazy_import
+from dstz.element.encoding import encode_evidence, frame_of
+from dstz.element.shared import map_threads
+
+np = lazy_import('numpy')
+
+# Dense vectors have 2 ** n entries; frames larger than this are not handled densely.
+MAX_DENSE_FRAME = 24
+
+# Masses whose magnitude stays below this after an inverse transform are rounding noise.
+TOLERANCE = 1e-12
+
+
+def mass_vector(ev, frame):
+    """
+    Lays out an evidence distribution as a dense vector indexed by bitmask.
+
+    Args:
+        - ev (Evidence): An evidence distribution whose focal elements hold sets.
+        - frame (sequence): The atoms of the frame; bit i refers to the i-th atom.
+
+    Returns:
+        numpy.ndarray: A float64 vector of length 2 ** len(frame) whose entry at a bitmask is its mass.
+    """
+    if len(frame) > MAX_DENSE_FRAME:
+        raise ValueError('A dense vector over %d atoms is too large, the limit is %d' % (len(frame), MAX_DENSE_FRAME))
+    _, codes, masses = encode_evidence(ev, frame)
+    return np.bincount(codes.astype(np.int64), weights=masses, minlength=2 ** len(frame))
+
+
+def _butterfly(vector, upward, sign):
+    # Adds (sign = 1) or subtracts (sign = -1) every entry into its neighbour along each bit, in n passes.
+    res = np.array(vector, dtype=np.float64)
+    n = res.shape[-1].bit_length() - 1
+    for i in range(n):
+        view = res.reshape(-1, 2, 2 ** i)
+        if upward:
+            view[:, 1, :] += sign * view[:, 0, :]
+        else:
+            view[:, 0, :] += sign * view[:, 1, :]
+    return res
+
+
+def _transform(vector, upward, sign, threads):
+    vector = np.asarray(vector)
+    if threads is None or threads <= 1 or vector.ndim < 2:
+        return _butterfly(vector, upward, sign)
+    rows = vector.reshape(-1, vector.shape[-1])
+    res, = map_threads(functools.partial(_butterfly, upward=upward, sign=sign), [rows],
+                       [((vector.shape[-1],), np.float64)], threads)
+    return res.reshape(vector.shape)
+
+
+def superset_sum(vector, inverse=False, threads=None):
+    """
+    Computes the commonality function q(A) = sum of m(B) over B ⊇ A, or its inverse.
+
+    Args:
+        - vector (array): A dense vector of length 2 ** n indexed by bitmask, or a batch of such vectors
+                          along the last axis.
+        - inverse (bool, optional): Whether to apply the Möbius inverse instead. Defaults to False.
+        - threads (int, optional): The number of threads a batch is split across with `map_threads`.
+                                   Defaults to None (the calling thread only).
+
+    Returns:
+        numpy.ndarray: The transformed vector, computed in O(n · 2 ** n) instead of the O(4 ** n) of
+                       multiplying by `get_qfrm(n)`.
+    """
+    return _transform(vector, False, -1 if inverse else 1, threads)
+
+
+def subset_sum(vector, inverse=False, threads=None):
+    """
+    Computes the implicability function b(A) = sum of m(B) over B ⊆ A, or its inverse.
+
+    Args:
+        - vector (array): A dense vector of length 2 ** n indexed by bitmask, or a batch of such vectors
+                          along the last axis.
+        - inverse (bool, optional): Whether to apply the Möbius inverse instead. Defaults to False.
+        - threads (int, optional): The number of threads a batch is split across with `map_threads`.
+                                   Defaults to None (the calling thread only).
+
+    Returns:
+        numpy.ndarray: The transformed vector, computed in O(n · 2 ** n) instead of the O(4 ** n) of
+                       multiplying by `get_bfrm(n)`.
+    """
+    return _transform(vector, True, -1 if inverse else 1, threads)
+
+
+def transform_rule(ev1, ev2, op='and', mul=True, frame=None, tol=TOLERANCE):
+    """
+    Combines or decombines two evidence distributions in the commonality or implicability domain.
+
+    Args:
+        - ev1 (Evidence): The first evidence distribution.
+        - ev2 (Evidence): The second evidence distribution.
+        - op (str, optional): 'and' to multiply commonalities (unnormalized intersection rule) or 'or' to
+                              multiply implicabilities (union rule). Defaults to 'and'.
+        - mul (bool, optional): Whether to combine (multiply) or decombine (divide). Defaults to True.
+        - frame (sequence, optional): The common frame. Defaults to `frame_of(ev1, ev2)`.
+        - tol (float, optional): Masses of smaller magnitude are dropped as rounding noise. Defaults to 1e-12.
+
+    Returns:
+        tuple: (frame, codes, masses), with the bitmasks of the non-negligible masses in increasing order.
+
+    Description:
+        This is the fast counterpart of `matrix_rule`: both vectors are transformed with n butterfly
+        passes, multiplied or divided pointwise, and transformed back. Decombination may produce negative
+        masses, which are kept, as they tell that the second evidence was not a component of the first.
+    """
+    frame = tuple(frame) if frame is not None else frame_of(ev1, ev2)
+    transform = superset_sum if op == 'and' else subset_sum
+    values1 = transform(mass_vector(ev1, frame))
+    values2 = transform(mass_vector(ev2, frame))
+    if mul:
+        values = values1 * values2
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = values1 / values2
+    masses = transform(values, inverse=True)
+    codes = np.flatnonzero(np.abs(masses) > tol)
+    return frame, codes.astype(np.uint64), masses[codes]
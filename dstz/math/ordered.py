@@ -0,0 +1,282 @@
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.core.instrument import count, enabled, timed
+from dstz.element.encoding import frame_of
+
+# Relations between a focal event B and a query event A counted by `OrderedIndex.bel`.
+RELATIONS = ('subsequence', 'prefix')
+
+
+class _Node(object):
+    # A trie node: the events through it share the atoms of the path from the root.
+    __slots__ = ('children', 'mass', 'total', 'mask')
+
+    def __init__(self):
+        self.children = {}
+        self.mass = 0.0
+        self.total = 0.0
+        self.mask = 0
+
+
+class OrderedIndex(object):
+    """
+    A prefix trie over the ordered events (tuples) of a random permutation set.
+
+    Attributes:
+        - frame (tuple): The atoms of the evidence.
+        - root (_Node): The root of the trie, standing for the empty event.
+
+    Methods:
+        - mass(event): Returns the mass of one event.
+        - extensions(event): Returns the total mass of the events that start with an event.
+        - prefixes(event): Returns the total mass of the non-empty prefixes of an event.
+        - subsequences(event): Returns the total mass of the non-empty events ordered like an event.
+        - intersecting(event): Returns the total mass of the events sharing an atom with an event.
+        - bel(event, relation='subsequence'): Returns the ordered belief of an event.
+        - pl(event): Returns the ordered plausibility of an event.
+        - left_intersection(event, curItem=Element): Returns the distribution of B ∩← event.
+
+    Description:
+        Every event is a path from the root, keyed by its atoms in order. Every node keeps the mass of the
+        event ending there, the total mass of its subtree and the bitmask of the atoms in its subtree,
+        so queries prune whole subtrees: a subtree sharing no atom with the query is skipped (or counted
+        at once), and a subsequence query only follows the children named by the remaining query atoms.
+        A query thus visits the events it is about instead of every focal element.
+
+    Example Usage:
+        >>> index = OrderedIndex(Evidence({Element(('a', 'b')): 0.5, Element(('b', 'a')): 0.3, Element(('a',)): 0.2}))
+        >>> index.bel(Element(('a', 'b', 'c')))
+        0.7
+        >>> index.bel(Element(('a', 'c')), relation='prefix')
+        0.2
+    """
+
+    def __init__(self, ev):
+        """
+        Builds the index of an evidence over ordered events.
+
+        Args:
+            - ev (Evidence): An evidence whose focal elements hold tuples, as in `permutation_set`.
+        """
+        self.frame = frame_of(ev)
+        self._bits = {atom: 1 << i for i, atom in enumerate(self.frame)}
+        self.root = _Node()
+        for key, mass in ev.items():
+            mask = self._mask(key.value)
+            node = self.root
+            node.total += mass
+            node.mask |= mask
+            for atom in key.value:
+                node = node.children.setdefault(atom, _Node())
+                node.total += mass
+                node.mask |= mask
+            node.mass += mass
+
+    def _mask(self, atoms):
+        res = 0
+        for atom in atoms:
+            res |= self._bits.get(atom, 0)
+        return res
+
+    def _find(self, atoms):
+        node = self.root
+        for atom in atoms:
+            node = node.children.get(atom)
+            if node is None:
+                return None
+        return node
+
+    def mass(self, event):
+        """
+        Returns the mass of one event.
+
+        Args:
+            - event (Element): The event, holding a tuple.
+
+        Returns:
+            float: Its mass, 0 if it is not a focal element.
+        """
+        node = self._find(event.value)
+        return node.mass if node is not None else 0.0
+
+    def extensions(self, event):
+        """
+        Returns the total mass of the events that start with an event, the event itself included.
+
+        Args:
+            - event (Element): The event, holding a tuple.
+
+        Returns:
+            float: The mass of the subtree of the event.
+        """
+        node = self._find(event.value)
+        return node.total if node is not None else 0.0
+
+    def prefixes(self, event):
+        """
+        Returns the total mass of the non-empty prefixes of an event, the event itself included.
+
+        Args:
+            - event (Element): The event, holding a tuple.
+
+        Returns:
+            float: The mass along the path of the event.
+        """
+        res = 0.0
+        node = self.root
+        for atom in event.value:
+            node = node.children.get(atom)
+            if node is None:
+                break
+            res += node.mass
+        return res
+
+    def subsequences(self, event):
+        """
+        Returns the total mass of the non-empty events whose atoms all belong to an event, in the same order.
+
+        Args:
+            - event (Element): The event, holding a tuple.
+
+        Returns:
+            float: The mass of the ordered subsets of the event.
+        """
+        atoms = tuple(event.value)
+        res = 0.0
+        stack = [(self.root, 0)]
+        while stack:
+            node, start = stack.pop()
+            for position in range(start, len(atoms)):
+                child = node.children.get(atoms[position])
+                if child is not None:
+                    res += child.mass
+                    stack.append((child, position + 1))
+        return res
+
+    def intersecting(self, event):
+        """
+        Returns the total mass of the events sharing at least one atom with an event.
+
+        Args:
+            - event (Element): The event, holding a tuple.
+
+        Returns:
+            float: The mass of the events whose left intersection with the event is not empty.
+        """
+        atoms = set(event.value)
+        mask = self._mask(atoms)
+        res = 0.0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for atom, child in node.children.items():
+                if atom in atoms:
+                    res += child.total
+                elif child.mask & mask:
+                    stack.append(child)
+        return res
+
+    def bel(self, event, relation='subsequence'):
+        """
+        Returns the ordered belief of an event.
+
+        Args:
+            - event (Element): The event, holding a tuple.
+            - relation (str, optional): 'subsequence' counts the events B ⊆ A whose order agrees with A;
+                                        'prefix' counts the non-empty prefixes of A. Defaults to 'subsequence'.
+
+        Returns:
+            float: The belief.
+
+        Raises:
+            ValueError: If the relation is unknown.
+        """
+        if relation == 'subsequence':
+            return self.subsequences(event)
+        if relation == 'prefix':
+            return self.prefixes(event)
+        raise ValueError('Unknown relation %r, expected one of %s' % (relation, ', '.join(RELATIONS)))
+
+    def pl(self, event):
+        """
+        Returns the ordered plausibility of an event.
+
+        Args:
+            - event (Element): The event, holding a tuple.
+
+        Returns:
+            float: The mass of the events B such that B ∩← A is not empty.
+        """
+        return self.intersecting(event)
+
+    def left_intersection(self, event, curItem=Element):
+        """
+        Returns the distribution of the left intersections of all focal events with one event.
+
+        Args:
+            - event (Element): The event A, holding a tuple.
+            - curItem (callable, optional): A callable that takes a tuple and returns an instance of Item.
+                                          Defaults to the Element class.
+
+        Returns:
+            Evidence: The masses of B ∩← A, the atoms of every focal event B that belong to A in the order
+                      of B, as `rps_left_rule(ev, Evidence({A: 1}))` returns them.
+        """
+        atoms = set(event.value)
+        mask = self._mask(atoms)
+        sums = {}
+        stack = [(self.root, ())]
+        if self.root.mass:
+            sums[()] = self.root.mass
+        while stack:
+            node, path = stack.pop()
+            for atom, child in node.children.items():
+                if not child.mask & mask:
+                    sums[path] = sums.get(path, 0.0) + child.total
+                    continue
+                kept = path + (atom,) if atom in atoms else path
+                if child.mass:
+                    sums[kept] = sums.get(kept, 0.0) + child.mass
+                stack.append((child, kept))
+        res = Evidence()
+        for path, mass in sums.items():
+            key = curItem(path)
+            res[key] = res[key] + mass if key in res else mass
+        return res
+
+
+@timed()
+def ordered_bel(ev, events, relation='subsequence'):
+    """
+    Computes the ordered belief of many events of one evidence.
+
+    Args:
+        - ev (Evidence or OrderedIndex): The evidence over ordered events, or its index.
+        - events (list): The query events, as Element instances holding tuples.
+        - relation (str, optional): 'subsequence' or 'prefix', see `OrderedIndex.bel`. Defaults to 'subsequence'.
+
+    Returns:
+        list: The belief of every event.
+    """
+    index = ev if isinstance(ev, OrderedIndex) else OrderedIndex(ev)
+    if enabled():
+        count('math.ordered.bel.queries', len(events))
+    return [index.bel(event, relation) for event in events]
+
+
+@timed()
+def ordered_pl(ev, events):
+    """
+    Computes the ordered plausibility of many events of one evidence.
+
+    Args:
+        - ev (Evidence or OrderedIndex): The evidence over ordered events, or its index.
+        - events (list): The query events, as Element instances holding tuples.
+
+    Returns:
+        list: The plausibility of every event.
+    """
+    index = ev if isinstance(ev, OrderedIndex) else OrderedIndex(ev)
+    if enabled():
+        count('math.ordered.pl.queries', len(events))
+    return [index.pl(event) for event in events]
@@ -0,0 +1,149 @@
+import functools
+
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import lazy_import
+from dstz.element.encoding import encode_batch, popcount
+from dstz.element.shared import map_threads
+
+np = lazy_import('numpy')
+
+# Measures computed by `measure_batch`, all in bits.
+MEASURES = ('deng_entropy', 'information_var', 'nonspecificity', 'discord', 'strife', 'pignistic_entropy')
+
+# Measures that compare every pair of focal elements, costing O(F²) per evidence instead of O(F).
+PAIRWISE = ('discord', 'strife')
+
+
+def _xlog2(values):
+    # values·log2(values), with 0·log2(0) = 0.
+    return np.where(values > 0, values * np.log2(np.where(values > 0, values, 1.0)), 0.0)
+
+
+def measure_batch(codes, masses, measures=MEASURES, threads=None):
+    """
+    Computes several uncertainty measures of a padded batch of encoded evidences in one pass.
+
+    Args:
+        - codes (array): The bitmasks, one row per evidence, as returned by `encode_batch`.
+        - masses (array): The masses, one row per evidence.
+        - measures (sequence, optional): The measures to compute, among `MEASURES`. Defaults to all of them.
+        - threads (int, optional): The number of threads the rows are split across with `map_threads`.
+                                   Defaults to None (the calling thread only).
+
+    Returns:
+        dict: An array with one value per row for every requested measure.
+
+    Raises:
+        ValueError: If a measure is unknown.
+
+    Description:
+        The cardinalities |A|, the logarithms log2(2^|A| - 1), log2 m(A) and, when needed, the pignistic
+        probability and the pairwise overlaps |A ∩ B| are computed once per batch and shared by all the
+        requested measures:
+
+        - deng_entropy: Σ m(A)·log2((2^|A| - 1) / m(A)), as `dstz.math.stat.moment.deng_entropy`.
+        - information_var: Σ m(A)·(log2((2^|A| - 1) / m(A)) - deng_entropy)², as `information_var`.
+        - nonspecificity: Σ m(A)·log2|A|, the Dubois-Prade measure.
+        - discord: -Σ_A m(A)·log2 Σ_B m(B)·|A ∩ B| / |B|, after Klir and Ramer.
+        - strife: -Σ_A m(A)·log2 Σ_B m(B)·|A ∩ B| / |A|, after Klir and Parviz.
+        - pignistic_entropy: the Shannon entropy of the pignistic probability.
+
+        Padding and mass on the empty set are ignored, so evidences should be normalized.
+    """
+    unknown = [measure for measure in measures if measure not in MEASURES]
+    if unknown:
+        raise ValueError('Unknown measures %s, expected some of %s' % (unknown, ', '.join(MEASURES)))
+    codes = np.asarray(codes, dtype=np.uint64)
+    masses = np.asarray(masses, dtype=np.float64)
+    if threads is not None and threads > 1 and codes.ndim == 2:
+        measures = [measure for measure in MEASURES if measure in measures]
+        values = map_threads(functools.partial(_measure_tuple, measures=measures), [codes, masses],
+                             [((), np.float64)] * len(measures), threads)
+        return dict(zip(measures, values))
+    focal = (codes != 0) & (masses > 0)
+    masses = np.where(focal, masses, 0.0)
+    card = np.where(focal, popcount(codes), 1)
+    res = {}
+
+    if 'deng_entropy' in measures or 'information_var' in measures:
+        # log2(2^|A| - 1), the number of non-empty subsets of every focal element.
+        log_events = np.log2(np.expm1(card * np.log(2.0)))
+        content = np.where(focal, log_events - np.log2(np.where(focal, masses, 1.0)), 0.0)
+        entropy = (masses * content).sum(axis=-1)
+        if 'deng_entropy' in measures:
+            res['deng_entropy'] = entropy
+        if 'information_var' in measures:
+            res['information_var'] = (masses * (content - entropy[..., None]) ** 2).sum(axis=-1)
+
+    if 'nonspecificity' in measures:
+        res['nonspecificity'] = (masses * np.log2(card)).sum(axis=-1)
+
+    if any(measure in measures for measure in PAIRWISE):
+        overlap = popcount(codes[..., :, None] & codes[..., None, :]).astype(np.float64)
+        if 'discord' in measures:
+            agreement = (overlap / card[..., None, :]) @ masses[..., :, None]
+            res['discord'] = -(masses * np.log2(np.where(focal, agreement[..., 0], 1.0))).sum(axis=-1)
+        if 'strife' in measures:
+            agreement = (overlap @ masses[..., :, None])[..., 0] / card
+            res['strife'] = -(masses * np.log2(np.where(focal, agreement, 1.0))).sum(axis=-1)
+
+    if 'pignistic_entropy' in measures:
+        res['pignistic_entropy'] = -_xlog2(pignistic_batch(codes, masses)).sum(axis=-1)
+
+    if enabled():
+        count('math.stat.measures.rows', int(np.prod(codes.shape[:-1])))
+    return res
+
+
+def pignistic_batch(codes, masses, n=None):
+    """
+    Computes the pignistic probability of every row of a padded batch.
+
+    Args:
+        - codes (array): The bitmasks, one row per evidence.
+        - masses (array): The masses.
+        - n (int, optional): The frame size. Defaults to the highest bit set in the batch.
+
+    Returns:
+        numpy.ndarray: The (rows, n) probabilities, BetP(x) = Σ_{A ∋ x} m(A) / |A|, column i for atom i.
+                       Padding and mass on the empty set are ignored, so evidences should be normalized.
+    """
+    codes = np.asarray(codes, dtype=np.uint64)
+    masses = np.where(codes != 0, np.asarray(masses, dtype=np.float64), 0.0)
+    if n is None:
+        n = max(int(codes.max()).bit_length(), 1) if codes.size else 1
+    bits = ((codes[..., None] >> np.arange(n, dtype=np.uint64)) & np.uint64(1)).astype(np.float64)
+    card = np.maximum(bits.sum(axis=-1), 1)
+    return ((masses / card)[..., None] * bits).sum(axis=-2)
+
+
+def _measure_tuple(codes, masses, measures):
+    # `measure_batch` on a slice of rows, with its results in the order of `measures`.
+    res = measure_batch(codes, masses, measures)
+    return tuple(res[measure] for measure in measures)
+
+
+@timed()
+def measures(evs, names=MEASURES, frame=None, threads=None):
+    """
+    Computes several uncertainty measures of one or many evidences in one pass.
+
+    Args:
+        - evs (Evidence or list): An evidence, or a list of evidences whose focal elements hold sets.
+        - names (sequence, optional): The measures to compute, among `MEASURES`. Defaults to all of them.
+        - frame (sequence, optional): The common frame. Defaults to `frame_of(*evs)`.
+        - threads (int, optional): See `measure_batch`. Defaults to None.
+
+    Returns:
+        dict: For every measure, a float for a single evidence or an array with one value per evidence.
+
+    Example Usage:
+        >>> measures(ev, ['deng_entropy', 'pignistic_entropy'])
+        {'deng_entropy': 2.08, 'pignistic_entropy': 1.52}
+    """
+    single = not isinstance(evs, (list, tuple))
+    _, codes, masses = encode_batch([evs] if single else list(evs), frame)
+    res = measure_batch(codes, masses, names, threads)
+    if single:
+        return {name: float(values[0]) for name, values in res.items()}
+    return res
@@ -0,0 +1,233 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dstz.core.instrument import count, enabled, timed
+from dstz.core.lazy import lazy_import
+from dstz.element.encoding import encode_evidence, frame_index, frame_of, popcount
+
+np = lazy_import('numpy')
+
+METHODS = ('rejection', 'importance')
+
+MEASURES = ('bel', 'pl', 'betp')
+
+# Number of draws simulated at once; rows of (chunk, focal) matrices are built per source.
+CHUNK_SIZE = 8192
+
+# Sample budget used when neither a sample nor a time budget is given.
+DEFAULT_SAMPLES = 10 ** 5
+
+
+def _normal_quantile(confidence):
+    # The z such that a standard normal falls in [-z, z] with the given probability, found by bisection.
+    low, high = 0.0, 40.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if math.erf(mid / math.sqrt(2)) < confidence:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def _encode_sources(evs):
+    frame = frame_of(*evs)
+    frame_index(frame)
+    sources = []
+    for ev in evs:
+        _, codes, masses = encode_evidence(ev, frame)
+        keep = masses > 0
+        sources.append((codes[keep], masses[keep]))
+    return frame, sources
+
+
+def _encode_queries(queries, frame):
+    index = {atom: i for i, atom in enumerate(frame)}
+    codes = [sum(1 << index[atom] for atom in query.value if atom in index) for query in queries]
+    return np.array(codes, dtype=np.uint64)
+
+
+def draw(sources, size, method='importance', rng=None):
+    """
+    Draws random intersections of one focal element per source.
+
+    Args:
+        - sources (list): (codes, masses) arrays of every source, as returned by `encode_evidence`.
+        - size (int): The number of draws.
+        - method (str, optional): 'rejection' draws every source independently and gives weight 0 to empty
+                                  intersections; 'importance' draws every source among the focal elements
+                                  compatible with the intersection so far and weights the draw by their
+                                  total mass. Defaults to 'importance'.
+        - rng (numpy.random.Generator, optional): The random generator. Defaults to a fresh one.
+
+    Returns:
+        tuple: (codes, weights), the bitmasks of the intersections and their importance weights. Under
+               both methods, the weighted draws follow Dempster's combination of the sources, and the
+               mean weight estimates 1 - K, K being the conflict.
+
+    Description:
+        Importance sampling (the sequential scheme of Moral and Wilson) never produces an empty
+        intersection, so it stays efficient when the conflict is high, where rejection wastes almost
+        every draw. It costs O(size · |F|) per source instead of O(size · log |F|).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    codes = np.full(size, np.iinfo(np.uint64).max, dtype=np.uint64)
+    weights = np.ones(size)
+    for focal, masses in sources:
+        if method == 'rejection':
+            cumulative = np.cumsum(masses)
+            picks = np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side='right')
+            codes &= focal[np.minimum(picks, len(focal) - 1)]
+            weights *= cumulative[-1]
+            continue
+        allowed = np.where((codes[:, None] & focal[None, :]) != 0, masses[None, :], 0.0)
+        cumulative = np.cumsum(allowed, axis=1)
+        totals = cumulative[:, -1]
+        picks = (cumulative < (rng.random(size) * totals)[:, None]).sum(axis=1)
+        codes &= focal[np.minimum(picks, len(focal) - 1)]
+        weights *= totals
+    weights[codes == 0] = 0.0
+    return codes, weights
+
+
+def _indicators(codes, queries, measure):
+    # The (draws, queries) values of one measure at every drawn focal set.
+    if measure == 'bel':
+        return ((codes[:, None] & ~queries[None, :]) == 0).astype(np.float64)
+    if measure == 'pl':
+        return ((codes[:, None] & queries[None, :]) != 0).astype(np.float64)
+    overlap = popcount(codes[:, None] & queries[None, :])
+    return overlap / np.maximum(popcount(codes), 1)[:, None]
+
+
+def _accumulate(sources, queries, measures, method, samples, seconds, chunk_size, seed):
+    """
+    Draws chunks until the sample or time budget is spent and accumulates the weighted sums.
+
+    Args:
+        - sources (list): The encoded sources.
+        - queries (array): The bitmasks of the query sets.
+        - measures (tuple): The measures to estimate, among `MEASURES`.
+        - method (str): One of `METHODS`.
+        - samples (int or None): The sample budget.
+        - seconds (float or None): The time budget.
+        - chunk_size (int): The number of draws per chunk.
+        - seed (int or numpy.random.SeedSequence): The seed of this worker.
+
+    Returns:
+        dict: 'n', 'w', 'w2' (the number of draws, the sum of weights and of squared weights), and for
+              every measure the sums of w·f, w²·f and w²·f² per query.
+    """
+    rng = np.random.default_rng(seed)
+    sums = {'n': 0, 'w': 0.0, 'w2': 0.0}
+    for measure in measures:
+        sums[measure] = np.zeros((3, len(queries)))
+    start = time.perf_counter()
+    while True:
+        size = chunk_size if samples is None else min(chunk_size, samples - sums['n'])
+        if size <= 0 or (seconds is not None and sums['n'] and time.perf_counter() - start > seconds):
+            break
+        codes, weights = draw(sources, size, method, rng)
+        squared = weights ** 2
+        sums['n'] += size
+        sums['w'] += float(weights.sum())
+        sums['w2'] += float(squared.sum())
+        for measure in measures:
+            values = _indicators(codes, queries, measure)
+            sums[measure] += np.stack([weights @ values, squared @ values, squared @ values ** 2])
+    return sums
+
+
+def _merge(parts):
+    res = parts[0]
+    for part in parts[1:]:
+        for key, value in part.items():
+            res[key] = res[key] + value
+    return res
+
+
+def _interval(estimate, stderr, z):
+    return float(estimate), float(estimate - z * stderr), float(estimate + z * stderr)
+
+
+@timed()
+def estimate(evs, queries, measures=MEASURES, method='importance', samples=None, seconds=None,
+             chunk_size=CHUNK_SIZE, confidence=0.95, seed=None, processes=None):
+    """
+    Estimates belief measures of Dempster's combination of several evidences by Monte Carlo sampling.
+
+    Args:
+        - evs (list): The evidence distributions to combine, whose focal elements hold sets.
+        - queries (list): The query sets, as Element instances.
+        - measures (tuple, optional): The measures to estimate among 'bel', 'pl' and 'betp' (the pignistic
+                                      probability of the query set). Defaults to all of them.
+        - method (str, optional): 'importance' or 'rejection', see `draw`. Defaults to 'importance'.
+        - samples (int, optional): The sample budget. Defaults to 100000 unless `seconds` is given.
+        - seconds (float, optional): The time budget; drawing stops after the first chunk that exceeds it.
+        - chunk_size (int, optional): The number of draws simulated at once. Defaults to 8192.
+        - confidence (float, optional): The level of the confidence intervals. Defaults to 0.95.
+        - seed (int, optional): The seed, making the estimate reproducible for a given sample budget,
+                                chunk size and number of processes. Defaults to None.
+        - processes (int, optional): The number of worker processes, which share the sample budget and
+                                     each get the full time budget. Defaults to None (no pool).
+
+    Returns:
+        dict: 'samples' (the number of draws), 'ess' (the effective sample size), 'conflict' and one
+              dict per measure mapping every query to an (estimate, low, high) triple, low and high being
+              the bounds of the normal confidence interval.
+
+    Raises:
+        ValueError: If the method or a measure is unknown, or the frame exceeds 64 atoms.
+
+    Description:
+        Every source is encoded once as bitmasks, and draws are simulated a chunk at a time with NumPy.
+        The estimates are self-normalized importance sampling ratios, whose standard errors come from
+        the delta method; with rejection sampling they reduce to plain proportions among accepted draws.
+        Queries may hold atoms outside the frame, which carry no mass.
+
+    Example Usage:
+        >>> res = estimate([ev1, ev2, ev3], [Element({'a'}), Element({'a', 'b'})], samples=10 ** 6, seed=0)
+        >>> res['bel'][Element({'a', 'b'})]
+        (0.41, 0.408, 0.412)
+    """
+    if method not in METHODS:
+        raise ValueError('Unknown method %r, expected one of %s' % (method, ', '.join(METHODS)))
+    unknown = [measure for measure in measures if measure not in MEASURES]
+    if unknown:
+        raise ValueError('Unknown measures %s, expected some of %s' % (unknown, ', '.join(MEASURES)))
+    if samples is None and seconds is None:
+        samples = DEFAULT_SAMPLES
+    measures = tuple(measures)
+    frame, sources = _encode_sources(evs)
+    query_codes = _encode_queries(queries, frame)
+
+    if processes:
+        seeds = np.random.SeedSequence(seed).spawn(processes)
+        budgets = [None if samples is None else samples // processes + (i < samples % processes)
+                   for i in range(processes)]
+        with ProcessPoolExecutor(processes) as pool:
+            parts = list(pool.map(_accumulate, *zip(*[(sources, query_codes, measures, method, budget,
+                                                       seconds, chunk_size, child)
+                                                      for budget, child in zip(budgets, seeds)])))
+        sums = _merge(parts)
+    else:
+        sums = _accumulate(sources, query_codes, measures, method, samples, seconds, chunk_size, seed)
+
+    z = _normal_quantile(confidence)
+    n, total, squared = sums['n'], sums['w'], sums['w2']
+    mean = total / n
+    res = {
+        'samples': n,
+        'ess': total ** 2 / squared if squared else 0.0,
+        'conflict': _interval(1 - mean, math.sqrt(max(squared / n - mean ** 2, 0.0) / n), z),
+    }
+    for measure in measures:
+        wf, w2f, w2f2 = sums[measure]
+        ratio = wf / total if total else np.full(len(queries), np.nan)
+        variance = (w2f2 - 2 * ratio * w2f + ratio ** 2 * squared) / total ** 2 if total else ratio
+        stderr = np.sqrt(np.maximum(variance, 0.0))
+        res[measure] = {query: _interval(r, e, z) for query, r, e in zip(queries, ratio, stderr)}
+    if enabled():
+        count('math.stat.montecarlo.estimate.samples', n)
+    return res
@@ -0,0 +1,179 @@
+from dstz.core.instrument import count, enabled, timed
+from dstz.element.encoding import sort_frame
+from dstz.evpiece.dual import ds_rule
+from dstz.network.valuation import Valuation
+
+
+def _size(variables, domains):
+    res = 1
+    for variable in variables:
+        res *= len(domains[variable])
+    return res
+
+
+def elimination_order(domain_sets, domains):
+    """
+    Chooses a variable elimination order with the greedy minimum-weight heuristic.
+
+    Args:
+        - domain_sets (list): The variable sets of the valuations.
+        - domains (dict): The states of every variable.
+
+    Returns:
+        list: The variables, in the order in which eliminating them creates the smallest cliques, where
+              the weight of a clique is the number of its configurations.
+    """
+    neighbours = {}
+    for variables in domain_sets:
+        for variable in variables:
+            neighbours.setdefault(variable, set()).update(set(variables) - {variable})
+    order = []
+    while neighbours:
+        variable = min(sort_frame(neighbours),
+                       key=lambda v: _size(neighbours[v] | {v}, domains))
+        for other in neighbours[variable]:
+            neighbours[other].update(neighbours[variable] - {other})
+            neighbours[other].discard(variable)
+        del neighbours[variable]
+        order.append(variable)
+    return order
+
+
+class JoinTree(object):
+    """
+    A Shenoy-Shafer join tree that answers marginal queries on a network of local valuations.
+
+    Attributes:
+        - cliques (list): The variables of every node of the tree, as sorted tuples.
+        - adjacent (list): The neighbouring nodes of every node.
+        - potentials (list): The combination of the valuations assigned to every node, or None.
+        - rule (callable): The local combination rule.
+
+    Methods:
+        - query(variables): Returns the marginal of the combination of all valuations on some variables.
+        - clear(): Forgets the cached messages.
+
+    Description:
+        The tree is built by variable elimination: eliminating a variable creates a node holding it and
+        its current neighbours, linked to the node of the next of them to be eliminated. Every valuation
+        is assigned to a node that covers it. A query combines the potential of a node covering the query
+        with the messages of its neighbours, where the message from i to j is the combination of the
+        potential of i with the messages i receives from its other neighbours, marginalized onto the
+        variables shared by i and j. Messages are cached, so a second query reuses most of the first.
+        The cost is driven by the largest node instead of the joint frame of all variables.
+
+    Example Usage:
+        >>> tree = JoinTree([v1, v2, v3], queries=[('X',)])
+        >>> tree.query(('X',)).to_evidence()
+    """
+
+    def __init__(self, valuations, rule=ds_rule, order=None, queries=()):
+        """
+        Builds a join tree for a list of valuations.
+
+        Args:
+            - valuations (list): The Valuation instances, sharing one `domains` dict.
+            - rule (callable, optional): The combination rule used locally, e.g. `ds_rule` or
+                                         `dstz.math.matrix.dual.conjunctive_rule`. Defaults to `ds_rule`.
+            - order (list, optional): The variable elimination order. Defaults to `elimination_order`.
+            - queries (list, optional): Variable sets that will be queried jointly, for which a covering
+                                        node is guaranteed. Single variables are always covered.
+        """
+        self.rule = rule
+        self.domains = valuations[0].domains if valuations else {}
+        domain_sets = [valuation.variables for valuation in valuations] + [tuple(query) for query in queries]
+        order = list(order) if order is not None else elimination_order(domain_sets, self.domains)
+        position = {variable: i for i, variable in enumerate(order)}
+
+        neighbours = {variable: set() for variable in order}
+        for variables in domain_sets:
+            for variable in variables:
+                neighbours[variable].update(set(variables) - {variable})
+        self.cliques = []
+        for variable in order:
+            self.cliques.append(sort_frame(neighbours[variable] | {variable}))
+            for other in neighbours[variable]:
+                neighbours[other].update(neighbours[variable] - {other})
+                neighbours[other].discard(variable)
+            del neighbours[variable]
+
+        self.adjacent = [[] for _ in self.cliques]
+        for i, variable in enumerate(order):
+            rest = [position[other] for other in self.cliques[i] if other != variable]
+            if rest:
+                parent = min(rest)
+                self.adjacent[i].append(parent)
+                self.adjacent[parent].append(i)
+
+        self.potentials = [None] * len(self.cliques)
+        for valuation in valuations:
+            node = min(position[variable] for variable in valuation.variables) if valuation.variables else 0
+            self.potentials[node] = self._combine(self.potentials[node], valuation)
+        self._messages = {}
+
+    def _combine(self, first, second):
+        if first is None or second is None:
+            return second if first is None else first
+        if enabled():
+            count('network.jointree.combinations')
+        return first.combine(second, self.rule)
+
+    def _message(self, source, target):
+        # The message from `source` to `target`; the messages it depends on are already cached.
+        valuation = self.potentials[source]
+        for other in self.adjacent[source]:
+            if other != target:
+                valuation = self._combine(valuation, self._messages[(other, source)])
+        if valuation is None:
+            return None
+        shared = set(self.cliques[source]) & set(self.cliques[target]) & set(valuation.variables)
+        return valuation.marginal(shared) if shared else None
+
+    def _collect(self, root):
+        # Computes the missing messages towards `root`, leaves first, without recursion.
+        parents, stack, visit = {root: None}, [root], []
+        while stack:
+            node = stack.pop()
+            visit.append(node)
+            for other in self.adjacent[node]:
+                if other not in parents:
+                    parents[other] = node
+                    stack.append(other)
+        for node in reversed(visit):
+            parent = parents[node]
+            if parent is not None and (node, parent) not in self._messages:
+                self._messages[(node, parent)] = self._message(node, parent)
+
+    @timed()
+    def query(self, variables):
+        """
+        Returns the marginal of the combination of all valuations on some variables.
+
+        Args:
+            - variables (sequence): The query variables, which must be covered by one node: single
+                                    variables always are, joint queries should be declared in `queries`.
+
+        Returns:
+            Valuation: The marginal on the query variables; use `to_evidence()` for a single variable.
+
+        Raises:
+            ValueError: If no node covers the query variables.
+        """
+        variables = set(variables)
+        nodes = [i for i, clique in enumerate(self.cliques) if variables.issubset(clique)]
+        if not nodes:
+            raise ValueError('No node covers %r; declare it in `queries`' % (sort_frame(variables),))
+        root = min(nodes, key=lambda i: _size(self.cliques[i], self.domains))
+        self._collect(root)
+        valuation = self.potentials[root]
+        for other in self.adjacent[root]:
+            valuation = self._combine(valuation, self._messages[(other, root)])
+        if valuation is None:
+            return Valuation.vacuous(variables, self.domains)
+        return valuation.extend(variables).marginal(variables)
+
+    def clear(self):
+        """
+        Forgets the cached messages, e.g. after changing a potential.
+        """
+        self._messages = {}
@@ -0,0 +1,172 @@
+import itertools
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.element.encoding import sort_frame
+from dstz.evpiece.dual import ds_rule
+
+
+class Valuation(object):
+    """
+    A belief function on a subset of the variables of a multivariate model.
+
+    Attributes:
+        - variables (tuple): The variables of the valuation, in canonical (sorted) order.
+        - domains (dict): The states of every variable of the model.
+        - ev (Evidence): The mass function, whose focal elements are sets of configurations, i.e. tuples
+                         holding one state per variable of `variables`.
+
+    Methods:
+        - single(variable, ev, domains): Builds a valuation on one variable from an Evidence over its states.
+        - vacuous(variables, domains): Builds the valuation that carries no information.
+        - marginal(variables): Marginalizes onto a subset of the variables.
+        - extend(variables): Vacuously extends to a superset of the variables.
+        - combine(other, rule=ds_rule): Combines with another valuation on the union of their variables.
+        - to_evidence(): Returns a one-variable valuation as an Evidence over the states of the variable.
+
+    Description:
+        A valuation only ever materializes the configurations of its own variables, so combining local
+        valuations costs in the product of the few domains involved instead of the whole joint frame.
+    """
+
+    def __init__(self, variables, ev, domains):
+        """
+        Initializes a valuation.
+
+        Args:
+            - variables (sequence): The variables, in the order of the states in the configurations of `ev`.
+            - ev (Evidence): The mass function over sets of configurations.
+            - domains (dict): The states of every variable; it may hold more variables than `variables`.
+
+        Raises:
+            ValueError: If a variable has no domain.
+        """
+        missing = [variable for variable in variables if variable not in domains]
+        if missing:
+            raise ValueError('Variables %r have no domain' % (missing,))
+        self.domains = domains
+        self.variables = sort_frame(variables)
+        if tuple(variables) == self.variables:
+            self.ev = ev
+        else:
+            order = [list(variables).index(variable) for variable in self.variables]
+            self.ev = _remap(ev, lambda config: tuple(config[i] for i in order))
+
+    @classmethod
+    def single(cls, variable, ev, domains):
+        """
+        Builds a valuation on one variable from an Evidence over its states.
+
+        Args:
+            - variable (Any): The variable.
+            - ev (Evidence): An evidence whose focal elements are sets of states of the variable.
+            - domains (dict): The states of every variable.
+
+        Returns:
+            Valuation: The valuation on (variable,).
+        """
+        return cls((variable,), _remap(ev, lambda state: (state,)), domains)
+
+    @classmethod
+    def vacuous(cls, variables, domains):
+        """
+        Builds the valuation that carries no information on some variables.
+
+        Args:
+            - variables (sequence): The variables.
+            - domains (dict): The states of every variable.
+
+        Returns:
+            Valuation: The valuation with all the mass on the set of all configurations.
+        """
+        variables = sort_frame(variables)
+        configs = set(itertools.product(*[domains[variable] for variable in variables]))
+        return cls(variables, Evidence({Element(configs): 1.0}), domains)
+
+    def marginal(self, variables):
+        """
+        Marginalizes the valuation onto a subset of its variables.
+
+        Args:
+            - variables (sequence): The variables to keep.
+
+        Returns:
+            Valuation: The valuation where every focal set is replaced by its projection.
+
+        Raises:
+            ValueError: If a variable does not belong to the valuation.
+        """
+        variables = sort_frame(variables)
+        if not set(variables).issubset(self.variables):
+            raise ValueError('Cannot marginalize %r onto %r' % (self.variables, variables))
+        if variables == self.variables:
+            return self
+        positions = [self.variables.index(variable) for variable in variables]
+        return Valuation(variables, _remap(self.ev, lambda config: tuple(config[i] for i in positions)), self.domains)
+
+    def extend(self, variables):
+        """
+        Vacuously extends the valuation to a superset of its variables.
+
+        Args:
+            - variables (sequence): The variables of the extension, a superset of `self.variables`.
+
+        Returns:
+            Valuation: The valuation where every focal set is replaced by its cylinder, i.e. all the
+                       configurations of the new variables that project onto it.
+        """
+        variables = sort_frame(set(variables) | set(self.variables))
+        if variables == self.variables:
+            return self
+        new = [variable for variable in variables if variable not in self.variables]
+        slots = [(True, self.variables.index(variable)) if variable in self.variables else
+                 (False, new.index(variable)) for variable in variables]
+        rest = list(itertools.product(*[self.domains[variable] for variable in new]))
+        res = Evidence()
+        for key, mass in self.ev.items():
+            value = {tuple(config[i] if own else extra[i] for own, i in slots) for config in key.value
+                     for extra in rest}
+            item = Element(value)
+            res[item] = res[item] + mass if item in res else mass
+        return Valuation(variables, res, self.domains)
+
+    def combine(self, other, rule=ds_rule):
+        """
+        Combines two valuations on the union of their variables.
+
+        Args:
+            - other (Valuation): The other valuation.
+            - rule (callable, optional): A combination rule of `dstz.evpiece.dual` or `dstz.math.matrix.dual`
+                                         taking two evidences. Defaults to `ds_rule`.
+
+        Returns:
+            Valuation: The combined valuation.
+        """
+        variables = sort_frame(set(self.variables) | set(other.variables))
+        return Valuation(variables, rule(self.extend(variables).ev, other.extend(variables).ev), self.domains)
+
+    def to_evidence(self):
+        """
+        Returns a one-variable valuation as an Evidence over the states of the variable.
+
+        Returns:
+            Evidence: The mass function over sets of states.
+
+        Raises:
+            ValueError: If the valuation does not have exactly one variable.
+        """
+        if len(self.variables) != 1:
+            raise ValueError('Expected a valuation on one variable, got %r' % (self.variables,))
+        return _remap(self.ev, lambda config: config[0])
+
+    def __repr__(self):
+        return 'Valuation(%r, %r)' % (self.variables, self.ev)
+
+
+def _remap(ev, func):
+    # Applies `func` to every configuration of every focal set, summing the masses of equal images.
+    res = Evidence()
+    for key, mass in ev.items():
+        item = Element({func(config) for config in key.value})
+        res[item] = res[item] + mass if item in res else mass
+    return res
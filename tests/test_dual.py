@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.core.instrument import instrument
+from dstz.evpiece.dual import disjunctive_rule, ds_rule
+
+
+def _zero_conflict_pairs(count=500, seed=0):
+    # A Bayesian evidence on {0, 1, 2} and evidences whose focal sets all contain {0, 1, 2}.
+    rng = random.Random(seed)
+    for _ in range(count):
+        probs = [rng.random() for _ in range(3)]
+        weights = [rng.random() for _ in range(4)]
+        bayesian = Evidence({Element({i}): prob / sum(probs) for i, prob in enumerate(probs)})
+        other = Evidence({Element({0, 1, 2, 10 + i} | {atom for atom in range(3, 8) if rng.random() < 0.5}):
+                          weight / sum(weights) for i, weight in enumerate(weights)})
+        yield bayesian, other
+
+
+def test_bayesian_zero_conflict_has_no_empty_set():
+    for bayesian, other in _zero_conflict_pairs():
+        assert Element(set()) not in disjunctive_rule(bayesian, other)
+        assert Element(set()) not in disjunctive_rule(other, bayesian)
+
+
+def test_bayesian_zero_conflict_counter():
+    with instrument() as recorder:
+        for bayesian, other in _zero_conflict_pairs(100):
+            ds_rule(bayesian, other)
+    assert recorder.stats()['evpiece.dual.ds_rule.conflict_mass'] == 0
+
+
+def test_bayesian_matches_general():
+    rng = random.Random(1)
+    for _ in range(100):
+        probs = [rng.random() for _ in range(5)]
+        bayesian = Evidence({Element({i}): prob / sum(probs) for i, prob in enumerate(probs)})
+        other = Evidence({Element({atom for atom in range(7) if rng.random() < 0.5} | {6}): 0.3,
+                          Element({1, 2}): 0.7})
+        for rule in (ds_rule, disjunctive_rule):
+            fast = rule(bayesian, other, structure='bayesian')
+            slow = rule(bayesian, other, structure='general')
+            assert set(fast) == set(slow)
+            assert all(abs(fast[key] - slow[key]) < 1e-12 for key in slow)
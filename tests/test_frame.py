@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.element.frame import extension, vacuous_extension
+
+
+def test_extension_is_built_once():
+    assert extension('ab', 'abc') is extension(['a', 'b'], ('a', 'b', 'c'))
+
+
+def test_vacuous_extension():
+    ev = Evidence({Element({'a'}): 0.7, Element({'a', 'b'}): 0.3})
+    res = vacuous_extension(ev, ['a', 'b', 'c'])
+    assert res == {Element({'a', 'c'}): 0.7, Element({'a', 'b', 'c'}): 0.3}
+    assert vacuous_extension(Evidence(), ['a']) == {}
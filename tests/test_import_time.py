@@ -0,0 +1,9 @@
+from benchmark.import_time import check, LAZY_MODULES, PURE_MODULES
+
+
+def test_pure_modules_import_cleanly():
+    assert check(PURE_MODULES) == []
+
+
+def test_lazy_modules_defer_numpy():
+    assert check(LAZY_MODULES) == []
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from dstz.core.atom import Element
+from dstz.core.distribution import Evidence
+from dstz.math.matrix.lattice import conjunctive_rule, de_conjunctive_rule
+
+
+def test_decombination_inverts_combination():
+    ev1 = Evidence({Element({'a'}): 0.3, Element({'a', 'b'}): 0.2, Element({'a', 'b', 'c'}): 0.5})
+    ev2 = Evidence({Element({'b', 'c'}): 0.4, Element({'a', 'b', 'c'}): 0.6})
+    res = de_conjunctive_rule(conjunctive_rule(ev1, ev2), ev2)
+    assert set(res) == set(ev1)
+    assert all(abs(res[key] - ev1[key]) < 1e-12 for key in ev1)
+
+
+def test_decombination_with_zero_transform_raises():
+    # {'c'} is a lattice element where both commonalities are 0, so the quotient is 0 / 0.
+    ev1 = Evidence({Element({'a', 'b'}): 1.0, Element({'c'}): 0.0})
+    ev2 = Evidence({Element({'a', 'b'}): 1.0, Element({'c'}): 0.0})
+    with pytest.raises(ValueError):
+        de_conjunctive_rule(ev1, ev2)
+    with pytest.raises(ValueError):
+        de_conjunctive_rule(ev1, Evidence({Element({'a'}): 1.0}))
@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from benchmark.precision import chain_error, storage_error, BOUNDS
+from dstz.core.precision import group_fsum, precision
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'python'])
+def test_compensated_chain(engine):
+    errors = chain_error(engine=engine)
+    assert errors['naive'] > 0
+    for mode in ('kahan', 'exact'):
+        assert errors[mode] <= BOUNDS['chain']
+        assert errors[mode] < errors['naive']
+
+
+def test_float32_storage():
+    for mode, error in storage_error(count=100).items():
+        assert error <= BOUNDS['float32'], mode
+
+
+@pytest.mark.parametrize('mode', ['kahan', 'exact'])
+def test_group_fsum(mode):
+    values = np.array([1.0, 1e-16, 1e-16, 2.0, 3.0, 1e-16])
+    starts = np.array([0, 3, 4])
+    with precision(accumulation=mode):
+        sums = group_fsum(values, starts)
+        empty = group_fsum(values, np.zeros(0, dtype=np.int64))
+    assert len(empty) == 0
+    assert sums[1:].tolist() == [2.0, 3.0 + 1e-16]
+    assert sums[0] == 1.0 + 2e-16